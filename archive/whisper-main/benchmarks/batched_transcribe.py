@@ -0,0 +1,104 @@
+"""
+Compare the throughput of `transcribe_batched()` against the sequential `transcribe()` loop.
+
+Usage:
+
+    python benchmarks/batched_transcribe.py --model tiny --audio path/to/audio.wav
+    python benchmarks/batched_transcribe.py --random --duration 300 --batch_size 1 4 8
+
+With `--random`, a randomly initialized model of the tiny shape is used on random noise, which
+measures the cost of the inference loop without downloading a checkpoint.
+"""
+
+import argparse
+import time
+
+import numpy as np
+import torch
+
+import whisper
+from whisper.audio import SAMPLE_RATE
+from whisper.model import ModelDimensions, Whisper
+
+TINY_DIMS = ModelDimensions(
+    n_mels=80,
+    n_audio_ctx=1500,
+    n_audio_state=384,
+    n_audio_head=6,
+    n_audio_layer=4,
+    n_vocab=51865,
+    n_text_ctx=448,
+    n_text_state=384,
+    n_text_head=6,
+    n_text_layer=4,
+)
+
+
+def measure(fn, audio_duration: float) -> dict:
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    return dict(
+        seconds=elapsed,
+        rtf=elapsed / audio_duration,
+        segments=len(result["segments"]),
+    )
+
+
+def main():
+    # fmt: off
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--model", default="tiny", help="name of the Whisper model to load")
+    parser.add_argument("--random", action="store_true", help="use a randomly initialized tiny-shaped model and random audio")
+    parser.add_argument("--audio", type=str, default=None, help="audio file to transcribe")
+    parser.add_argument("--duration", type=float, default=300.0, help="length of the random audio in seconds")
+    parser.add_argument("--batch_size", type=int, nargs="+", default=[1, 4, 8], help="batch sizes to measure")
+    parser.add_argument("--language", type=str, default="en", help="language passed to the decoder")
+    parser.add_argument("--sample_len", type=int, default=None, help="maximum number of tokens per window")
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    # fmt: on
+    args = parser.parse_args()
+
+    if args.random:
+        torch.manual_seed(0)
+        model = Whisper(TINY_DIMS).to(args.device).eval()
+        rng = np.random.default_rng(0)
+        n_samples = int(args.duration * SAMPLE_RATE)
+        audio = rng.standard_normal(n_samples).astype(np.float32) * 0.1
+        # random weights rarely emit <|endoftext|>; bound the work per window
+        sample_len = args.sample_len or 32
+    else:
+        if args.audio is None:
+            parser.error("--audio is required unless --random is given")
+        model = whisper.load_model(args.model, device=args.device)
+        audio = whisper.load_audio(args.audio)
+        sample_len = args.sample_len
+
+    audio_duration = len(audio) / SAMPLE_RATE
+    options = dict(
+        language=args.language,
+        temperature=0.0,
+        fp16=args.device != "cpu",
+        sample_len=sample_len,
+    )
+
+    print(f"audio: {audio_duration:.1f}s, device: {args.device}")
+    baseline = measure(lambda: model.transcribe(audio, **options), audio_duration)
+    print(
+        f"sequential       {baseline['seconds']:8.2f}s  RTF {baseline['rtf']:.3f}"
+        f"  ({baseline['segments']} segments)"
+    )
+    for batch_size in args.batch_size:
+        stats = measure(
+            lambda: model.transcribe_batched(audio, batch_size=batch_size, **options),
+            audio_duration,
+        )
+        speedup = baseline["seconds"] / stats["seconds"]
+        print(
+            f"batched (B={batch_size:<3d}) {stats['seconds']:8.2f}s  RTF {stats['rtf']:.3f}"
+            f"  ({stats['segments']} segments, {speedup:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Measure the CPU alignment used for word-level timestamps: `dtw_cpu`, which `dtw` used to call,
+against the wavefront implementation with and without a band around the segment timestamps,
+and the alignment of all windows of a file with `dtw_batch`.
+
+Usage:
+
+    python benchmarks/dtw.py --tokens 40 120 250 --windows 20 --band 1.0
+
+The matrices are synthetic but have the shape of a 30-second window (1500 audio frames) and
+the structure of the alignment heads' weights: a low-cost monotonic path through noise, split
+into segments whose timestamps are taken from the path.
+"""
+
+import argparse
+import time
+from typing import List, Tuple
+
+import numpy as np
+import torch
+
+from whisper.audio import TOKENS_PER_SECOND
+from whisper.timing import Band, dtw_batch, dtw_cpu, dtw_wavefront, normalize_band
+
+
+def synthetic_window(
+    rng: np.random.Generator, n_tokens: int, n_frames: int, n_segments: int
+) -> Tuple[np.ndarray, Band]:
+    """A (tokens x frames) DTW input, and the frames spanned by the segment of each token"""
+    # token boundaries spread over the speech, with pauses between the segments
+    boundaries = np.sort(rng.integers(0, n_frames, n_tokens + 1))
+    centers = (boundaries[:-1] + boundaries[1:]) / 2
+    columns = np.arange(n_frames)
+    distance = (columns[None, :] - centers[:, None]) / 10
+    x = -np.exp(-(distance**2)) + 0.3 * rng.standard_normal((n_tokens, n_frames))
+
+    segments = np.array_split(np.arange(n_tokens), n_segments)
+    lower = np.concatenate([np.full(len(s), boundaries[s[0]]) for s in segments])
+    upper = np.concatenate([np.full(len(s), boundaries[s[-1] + 1]) for s in segments])
+    return x.astype(np.float32), (lower, upper)
+
+
+def widen(band: Band, margin: float, n_frames: int) -> Band:
+    frames = round(margin * TOKENS_PER_SECOND)
+    return normalize_band(band[0] - frames, band[1] + frames, n_frames)
+
+
+def milliseconds(fn, repeat: int) -> float:
+    fn()  # compile and warm up
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    # fmt: off
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--tokens", type=int, nargs="+", default=[40, 120, 250], help="numbers of text tokens per window")
+    parser.add_argument("--frames", type=int, default=1500, help="number of audio frames per window")
+    parser.add_argument("--segments", type=int, default=6, help="number of segments per window")
+    parser.add_argument("--band", type=float, default=1.0, help="margin of the band around the segment timestamps, in seconds")
+    parser.add_argument("--windows", type=int, default=20, help="number of windows aligned together with dtw_batch")
+    parser.add_argument("--workers", type=int, default=None, help="number of threads used by dtw_batch (default: all CPUs)")
+    parser.add_argument("--repeat", type=int, default=5, help="number of runs; the fastest is reported")
+    # fmt: on
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for n_tokens in args.tokens:
+        x, segment_band = synthetic_window(rng, n_tokens, args.frames, args.segments)
+        band = widen(segment_band, args.band, args.frames)
+        reference = dtw_cpu(x.astype(np.float64))
+        same = np.array_equal(dtw_wavefront(x, band), reference)
+
+        baseline = milliseconds(lambda: dtw_cpu(x.astype(np.float64)), args.repeat)
+        wavefront = milliseconds(lambda: dtw_wavefront(x), args.repeat)
+        banded = milliseconds(lambda: dtw_wavefront(x, band), args.repeat)
+        cells = (band[1] - band[0] + 1).sum() / x.size
+        print(
+            f"{n_tokens:4d} x {args.frames} dtw_cpu {baseline:7.2f} ms"
+            f"  wavefront {wavefront:7.2f} ms ({baseline / wavefront:.2f}x)"
+            f"  band {banded:7.2f} ms ({baseline / banded:.2f}x, {cells:.0%} of cells,"
+            f" {'same' if same else 'different'} path)"
+        )
+
+    windows = [
+        synthetic_window(rng, int(n), args.frames, args.segments)
+        for n in rng.choice(args.tokens, args.windows)
+    ]
+    xs: List[torch.Tensor] = [torch.from_numpy(x) for x, _ in windows]
+    bands = [widen(band, args.band, args.frames) for _, band in windows]
+
+    baseline = milliseconds(
+        lambda: [dtw_cpu(x.double().numpy()) for x in xs], args.repeat
+    )
+    batched = milliseconds(lambda: dtw_batch(xs, num_workers=args.workers), args.repeat)
+    banded = milliseconds(
+        lambda: dtw_batch(xs, bands, num_workers=args.workers), args.repeat
+    )
+    print(
+        f"{args.windows} windows  dtw_cpu {baseline:7.2f} ms"
+        f"  dtw_batch {batched:7.2f} ms ({baseline / batched:.2f}x)"
+        f"  with band {banded:7.2f} ms ({baseline / banded:.2f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Measure the decoding speed in tokens per second with the preallocated key-value cache, against
+the previous implementation that concatenated the new keys and values on every step.
+
+Usage:
+
+    python benchmarks/kv_cache.py --models tiny base small --sample_len 224 --beam_size 5
+
+Randomly initialized models of the given shapes are decoded for a fixed number of steps on
+random audio features, so that no checkpoint is downloaded and every run does the same work.
+"""
+
+import argparse
+import time
+
+import torch
+
+from whisper.decoding import PyTorchInference
+from whisper.model import ModelDimensions, Whisper
+
+# (n_state, n_head, n_layer) of the text decoder of the released models
+MODEL_SHAPES = {
+    "tiny": (384, 6, 4),
+    "base": (512, 8, 6),
+    "small": (768, 12, 12),
+    "medium": (1024, 16, 24),
+}
+
+INITIAL_TOKENS = [50258, 50259, 50359]  # <|startoftranscript|><|en|><|transcribe|>
+
+
+def random_model(name: str, device: str) -> Whisper:
+    n_state, n_head, n_layer = MODEL_SHAPES[name]
+    dims = ModelDimensions(
+        n_mels=80,
+        n_audio_ctx=1500,
+        n_audio_state=n_state,
+        n_audio_head=n_head,
+        n_audio_layer=n_layer,
+        n_vocab=51865,
+        n_text_ctx=448,
+        n_text_state=n_state,
+        n_text_head=n_head,
+        n_text_layer=n_layer,
+    )
+    return Whisper(dims).to(device).eval()
+
+
+def concat_kv_cache_hooks(model: Whisper):
+    """The previous `install_kv_cache_hooks`, which grows the cache with `torch.cat`"""
+
+    def install_kv_cache_hooks(cache=None, max_length=None):
+        cache = {**cache} if cache is not None else {}
+        hooks = []
+
+        def save_to_cache(module, _, output):
+            if module not in cache or output.shape[1] > model.dims.n_text_ctx:
+                cache[module] = output
+            else:
+                cache[module] = torch.cat([cache[module], output], dim=1).detach()
+            return cache[module]
+
+        for block in model.decoder.blocks:
+            for layer in (block.attn, block.cross_attn):
+                hooks.append(layer.key.register_forward_hook(save_to_cache))
+                hooks.append(layer.value.register_forward_hook(save_to_cache))
+        return cache, hooks
+
+    return install_kv_cache_hooks
+
+
+class ConcatInference(PyTorchInference):
+    """`PyTorchInference` with the previous cache and its gather-based `rearrange_kv_cache`"""
+
+    def __init__(self, model: Whisper, initial_token_length: int, max_length: int):
+        super().__init__(model, initial_token_length, max_length)
+        self.install_hooks = concat_kv_cache_hooks(model)
+
+    def logits(self, tokens, audio_features):
+        if not self.kv_cache:
+            self.kv_cache, self.hooks = self.install_hooks()
+        if tokens.shape[-1] > self.initial_token_length:
+            tokens = tokens[:, -1:]
+        return self.model.decoder(tokens, audio_features, kv_cache=self.kv_cache)
+
+    def rearrange_kv_cache(self, source_indices):
+        if source_indices != list(range(len(source_indices))):
+            for module in self.kv_modules:
+                self.kv_cache[module] = self.kv_cache[module][source_indices].detach()
+
+
+@torch.no_grad()
+def tokens_per_second(
+    model: Whisper, inference_class, n_batch: int, sample_len: int
+) -> float:
+    device = model.device
+    n_state = model.dims.n_audio_state
+    audio_features = torch.randn(1, model.dims.n_audio_ctx, n_state, device=device)
+    audio_features = audio_features.repeat(n_batch, 1, 1)
+    tokens = torch.tensor([INITIAL_TOKENS], device=device).repeat(n_batch, 1)
+    generator = torch.Generator().manual_seed(0)
+
+    inference = inference_class(
+        model, len(INITIAL_TOKENS), len(INITIAL_TOKENS) + sample_len
+    )
+    start = time.perf_counter()
+    try:
+        for _ in range(sample_len):
+            logits = inference.logits(tokens, audio_features)
+            # shuffle the sequences like a beam search that keeps changing its best beams
+            source_indices = torch.randint(0, n_batch, (n_batch,), generator=generator)
+            source_indices = source_indices.tolist()
+            inference.rearrange_kv_cache(source_indices)
+            next_tokens = logits[source_indices, -1].argmax(dim=-1, keepdim=True)
+            tokens = torch.cat([tokens[source_indices], next_tokens], dim=-1)
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+    finally:
+        inference.cleanup_caching()
+    return n_batch * sample_len / (time.perf_counter() - start)
+
+
+def main():
+    # fmt: off
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--models", nargs="+", default=["tiny", "base", "small"], choices=sorted(MODEL_SHAPES), help="model shapes to measure")
+    parser.add_argument("--sample_len", type=int, default=224, help="number of tokens to decode per sequence")
+    parser.add_argument("--beam_size", type=int, default=5, help="number of sequences decoded together")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs; the fastest is reported")
+    parser.add_argument("--threads", type=int, default=0, help="number of threads used by torch on CPU (0 = default)")
+    parser.add_argument("--device", default="cpu")
+    # fmt: on
+    args = parser.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+
+    print(
+        f"device: {args.device}, beam_size: {args.beam_size}, sample_len: {args.sample_len}"
+    )
+    for name in args.models:
+        torch.manual_seed(0)
+        model = random_model(name, args.device)
+        before, after = (
+            max(
+                tokens_per_second(model, cls, args.beam_size, args.sample_len)
+                for _ in range(args.repeat)
+            )
+            for cls in (ConcatInference, PyTorchInference)
+        )
+        print(
+            f"{name:<8s} torch.cat {before:8.1f} tokens/s"
+            f"  static {after:8.1f} tokens/s  ({after / before:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Measure the time and the peak memory of `whisper.load_model` for each model size, with the
+memory-mapped checkpoint assigned to a model built on the meta device, against the previous
+implementation that read the whole checkpoint and copied it into a randomly initialized model.
+
+Usage:
+
+    python benchmarks/load_model.py --models tiny base small --checkpoint_dir /tmp/whisper
+
+Checkpoints with random fp16 weights and the dimensions of the released models are written to
+`--checkpoint_dir` once, so that nothing is downloaded. Each load runs in a new process, and
+the peak RSS is reported above the process' RSS before loading.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import torch
+
+import whisper
+from whisper.model import ModelDimensions, Whisper
+
+# (n_mels, n_vocab, n_state, n_head, n_layer) of the released models
+MODEL_SHAPES = {
+    "tiny": (80, 51865, 384, 6, 4),
+    "base": (80, 51865, 512, 8, 6),
+    "small": (80, 51865, 768, 12, 12),
+    "medium": (80, 51865, 1024, 16, 24),
+    "large-v3": (128, 51866, 1280, 20, 32),
+}
+
+
+def model_dims(name: str) -> ModelDimensions:
+    n_mels, n_vocab, n_state, n_head, n_layer = MODEL_SHAPES[name]
+    return ModelDimensions(
+        n_mels=n_mels,
+        n_audio_ctx=1500,
+        n_audio_state=n_state,
+        n_audio_head=n_head,
+        n_audio_layer=n_layer,
+        n_vocab=n_vocab,
+        n_text_ctx=448,
+        n_text_state=n_state,
+        n_text_head=n_head,
+        n_text_layer=n_layer,
+    )
+
+
+def write_checkpoint(name: str, directory: str) -> str:
+    path = os.path.join(directory, f"random-{name}.pt")
+    if not os.path.exists(path):
+        dims = model_dims(name)
+        with torch.device("meta"):
+            shapes = {k: v.shape for k, v in Whisper(dims).state_dict().items()}
+        state_dict = {k: torch.randn(shape).half() for k, shape in shapes.items()}
+        checkpoint = {"dims": dims.__dict__, "model_state_dict": state_dict}
+        os.makedirs(directory, exist_ok=True)
+        torch.save(checkpoint, path + ".tmp")
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def legacy_load_model(path: str, device: str) -> Whisper:
+    """The previous `load_model` for a checkpoint file"""
+    with open(path, "rb") as fp:
+        checkpoint = torch.load(fp, map_location=device)
+    dims = ModelDimensions(**checkpoint["dims"])
+    model = Whisper(dims)
+    model.load_state_dict(checkpoint["model_state_dict"])
+    return model.to(device)
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def measure(path: str, method: str, device: str):
+    """Load the checkpoint once in this process and print the measurements as JSON"""
+    before = rss_bytes()
+    start = time.perf_counter()
+    if method == "legacy":
+        model = legacy_load_model(path, device)
+    else:
+        model = whisper.load_model(path, device, mmap=method == "mmap")
+    # touch every weight, so that lazily mapped pages are counted as well
+    checksum = sum(p.float().sum().item() for p in model.parameters())
+    seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print(json.dumps(dict(seconds=seconds, peak=peak - before, checksum=checksum)))
+
+
+def run(path: str, method: str, device: str) -> dict:
+    command = [sys.executable, __file__, "--measure", path, "--method", method]
+    output = subprocess.check_output(command + ["--device", device])
+    return json.loads(output.decode().splitlines()[-1])
+
+
+def main():
+    # fmt: off
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--models", nargs="+", default=["tiny", "base", "small"], choices=list(MODEL_SHAPES), help="model sizes to measure")
+    parser.add_argument("--checkpoint_dir", default=os.path.join(os.path.expanduser("~"), ".cache", "whisper-benchmark"), help="directory for the random checkpoints")
+    parser.add_argument("--methods", nargs="+", default=["legacy", "read", "mmap"], choices=["legacy", "read", "mmap"], help="previous implementation, meta-device load without and with mmap")
+    parser.add_argument("--repeat", type=int, default=3, help="number of loads per method; the fastest is reported")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    parser.add_argument("--method", help=argparse.SUPPRESS)
+    # fmt: on
+    args = parser.parse_args()
+
+    if args.measure:
+        return measure(args.measure, args.method, args.device)
+
+    for name in args.models:
+        path = write_checkpoint(name, args.checkpoint_dir)
+        fp32_size = os.path.getsize(path) * 2
+        line = f"{name:<9s} fp32 weights {fp32_size / 2**20:7.0f} MiB"
+        for method in args.methods:
+            results = [run(path, method, args.device) for _ in range(args.repeat)]
+            seconds = min(r["seconds"] for r in results)
+            peak = max(r["peak"] for r in results)
+            line += f"  {method} {seconds:6.2f} s {peak / fp32_size:4.2f}x"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
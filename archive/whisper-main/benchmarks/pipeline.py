@@ -0,0 +1,340 @@
+"""
+Measure the real-time factor of the whole transcription pipeline and the time spent in each of
+its stages, and compare the measurements against an earlier run to catch slowdowns.
+
+Usage:
+
+    python benchmarks/pipeline.py --models tiny base small --output results.json
+    python benchmarks/pipeline.py --models tiny --baseline results.json --threshold 0.1
+    python benchmarks/pipeline.py --results new.json --baseline results.json
+
+Everything runs offline: the models are randomly initialized with the shapes of the released
+ones, and the audio is `tests/jfk.flac` plus synthetic noise bursts written to a WAV file, so
+that the ffmpeg decoding is measured as well. Random weights rarely emit <|endoftext|> and fail
+the fallback thresholds, so every window decodes `--sample_len` tokens at each temperature,
+which makes the work the same from one run to the next.
+
+The stages are timed with forward hooks and wrappers around the functions that `transcribe`
+calls, without changing them:
+
+    decode_audio   reading the file with ffmpeg (`whisper.load_audio`)
+    mel            `log_mel_spectrogram`
+    encoder        forward passes of the audio encoder
+    decoder        forward passes of the text decoder while decoding, including the retries
+    fallback       the part of the decoding spent on retries at a higher temperature
+    alignment      `add_word_timestamps`, i.e. the cross-attention pass and the DTW
+    write          writing the result in every output format
+
+The JSON output records the git revision, the versions and the options, with one entry per
+model and audio. With `--baseline`, stages that are slower than the baseline by more than
+`--threshold` (and by more than `--min_seconds`) are reported, and the exit status is 1.
+"""
+
+import argparse
+import datetime
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from collections import defaultdict
+from typing import Dict, Optional
+
+import numpy as np
+import torch
+
+import whisper
+from whisper.audio import SAMPLE_RATE
+from whisper.model import ModelDimensions, Whisper
+from whisper.timing import dtw
+from whisper.utils import get_writer
+
+# (n_mels, n_vocab, n_state, n_head, n_layer) of the released models
+MODEL_SHAPES = {
+    "tiny": (80, 51865, 384, 6, 4),
+    "base": (80, 51865, 512, 8, 6),
+    "small": (80, 51865, 768, 12, 12),
+    "medium": (80, 51865, 1024, 16, 24),
+}
+
+STAGES = ["decode_audio", "mel", "encoder", "decoder", "fallback", "alignment", "write"]
+
+# the module, which `whisper.transcribe` (the function) shadows
+transcribe_module = importlib.import_module("whisper.transcribe")
+
+JFK_PATH = os.path.join(os.path.dirname(__file__), "..", "tests", "jfk.flac")
+
+
+def random_model(name: str, device: str) -> Whisper:
+    n_mels, n_vocab, n_state, n_head, n_layer = MODEL_SHAPES[name]
+    dims = ModelDimensions(
+        n_mels=n_mels,
+        n_audio_ctx=1500,
+        n_audio_state=n_state,
+        n_audio_head=n_head,
+        n_audio_layer=n_layer,
+        n_vocab=n_vocab,
+        n_text_ctx=448,
+        n_text_state=n_state,
+        n_text_head=n_head,
+        n_text_layer=n_layer,
+    )
+    torch.manual_seed(0)
+    model = Whisper(dims)
+    torch.nn.init.normal_(model.decoder.positional_embedding, std=0.01)
+    return model.to(device).eval()
+
+
+def write_synthetic_audio(path: str, duration: float, seed: int = 0):
+    """Bursts of noise with a speech-like envelope and short pauses, as 16-bit mono WAV"""
+    rng = np.random.default_rng(seed)
+    n_samples = int(duration * SAMPLE_RATE)
+    audio = rng.standard_normal(n_samples) * 0.1
+    seconds = np.arange(n_samples) / SAMPLE_RATE
+    envelope = np.clip(np.sin(2 * np.pi * seconds / 7) + 0.6, 0, 1)
+    pcm = (audio * envelope * 32767).clip(-32768, 32767).astype(np.int16)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(pcm.tobytes())
+
+
+class StageTimer:
+    """Accumulates the time spent in each stage of `transcribe` while installed"""
+
+    def __init__(self, model: Whisper):
+        self.model = model
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.aligning = False
+        self._starts = {}
+        self._hooks = []
+        self._patched = {}
+
+    def _now(self) -> float:
+        if self.model.device.type == "cuda":
+            torch.cuda.synchronize()
+        return time.perf_counter()
+
+    def timed(self, stage: str, fn):
+        def wrapper(*args, **kwargs):
+            start = self._now()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.seconds[stage] += self._now() - start
+                self.counts[stage] += 1
+
+        return wrapper
+
+    def _install_module(self, module: torch.nn.Module, stage: str):
+        def pre_hook(module, args):
+            self._starts[stage] = self._now()
+
+        def hook(module, args, output):
+            if stage == "decoder" and self.aligning:
+                return  # the decoder pass of the alignment is counted there
+            self.seconds[stage] += self._now() - self._starts[stage]
+            self.counts[stage] += 1
+
+        self._hooks.append(module.register_forward_pre_hook(pre_hook))
+        self._hooks.append(module.register_forward_hook(hook))
+
+    def __enter__(self):
+        self._install_module(self.model.encoder, "encoder")
+        self._install_module(self.model.decoder, "decoder")
+
+        def aligning(fn):
+            def wrapper(*args, **kwargs):
+                self.aligning = True
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.aligning = False
+
+            return wrapper
+
+        decode = self.model.decode
+        retry = self.timed("fallback", decode)
+
+        def decode_with_retries(segment, options=whisper.DecodingOptions()):
+            # the first temperature of `transcribe`'s fallback schedule is 0
+            if options.temperature > 0:
+                return retry(segment, options)
+            return decode(segment, options)
+
+        self.model.decode = decode_with_retries
+        module = transcribe_module
+        self._patched = {
+            "log_mel_spectrogram": module.log_mel_spectrogram,
+            "add_word_timestamps": module.add_word_timestamps,
+        }
+        module.log_mel_spectrogram = self.timed("mel", module.log_mel_spectrogram)
+        module.add_word_timestamps = aligning(
+            self.timed("alignment", module.add_word_timestamps)
+        )
+        return self
+
+    def __exit__(self, *exc):
+        for hook in self._hooks:
+            hook.remove()
+        del self.model.decode
+        for name, fn in self._patched.items():
+            setattr(transcribe_module, name, fn)
+
+
+def compile_kernels():
+    """Run the numba DTW once, so that its compilation is not counted in the alignment"""
+    dtw(torch.rand(8, 16))
+
+
+def measure(model: Whisper, audio_path: str, output_dir: str, options: dict) -> dict:
+    """Decode, transcribe and write one file, and return the time of each stage"""
+    torch.manual_seed(0)
+    with StageTimer(model) as timer:
+        start = time.perf_counter()
+        audio = timer.timed("decode_audio", whisper.load_audio)(audio_path)
+        result = whisper.transcribe(model, audio, **options)
+        writer = get_writer("all", output_dir)
+        timer.timed("write", writer)(result, audio_path)
+        total = time.perf_counter() - start
+
+    duration = len(audio) / SAMPLE_RATE
+    return dict(
+        duration=duration,
+        total=total,
+        rtf=total / duration,
+        stages={stage: timer.seconds[stage] for stage in STAGES},
+        counts=dict(
+            encoder_passes=timer.counts["encoder"],
+            decoder_steps=timer.counts["decoder"],
+            fallback_retries=timer.counts["fallback"],
+            segments=len(result["segments"]),
+        ),
+    )
+
+
+def fastest(runs: list) -> dict:
+    """The measurements of the fastest run, with each stage's minimum over all runs"""
+    best = dict(min(runs, key=lambda r: r["total"]))
+    best["stages"] = {s: min(r["stages"][s] for r in runs) for s in STAGES}
+    return best
+
+
+def git_revision() -> Optional[dict]:
+    root = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=root, stderr=subprocess.DEVNULL
+        )
+        status = subprocess.check_output(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=root
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return dict(commit=commit.decode().strip(), dirty=bool(status.strip()))
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_seconds: float):
+    """Print the ratio of every stage to the baseline and return the number of slowdowns"""
+    print(f"baseline: {baseline.get('git')}, current: {results.get('git')}")
+    slowdowns = 0
+    for key, current in results["results"].items():
+        previous = baseline["results"].get(key)
+        if previous is None:
+            print(f"{key}: not in the baseline")
+            continue
+        line = f"{key:<16s}"
+        for stage in ["total"] + STAGES:
+            if stage == "total":
+                new, old = current["total"], previous["total"]
+            else:
+                new, old = current["stages"][stage], previous["stages"].get(stage, 0.0)
+            slower = old > 0 and new / old > 1 + threshold and new - old >= min_seconds
+            slowdowns += slower
+            ratio = f"{new / old:.2f}x" if old > 0 else "-"
+            mark = " SLOWER" if slower else ""
+            line += f"  {stage} {ratio}{mark}"
+        print(line)
+    return slowdowns
+
+
+def main():
+    # fmt: off
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--models", nargs="+", default=["tiny", "base", "small"], choices=list(MODEL_SHAPES), help="model shapes to measure")
+    parser.add_argument("--audio", nargs="+", default=["jfk", "synthetic"], choices=["jfk", "synthetic"], help="bundled and synthetic audio to transcribe")
+    parser.add_argument("--duration", type=float, default=120.0, help="length of the synthetic audio in seconds")
+    parser.add_argument("--sample_len", type=int, default=32, help="number of tokens decoded per window and temperature")
+    parser.add_argument("--repeat", type=int, default=1, help="number of runs; the minimum of each stage is reported")
+    parser.add_argument("--threads", type=int, default=0, help="number of threads used by torch on CPU (0 = default)")
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--output", help="JSON file to write the measurements to")
+    parser.add_argument("--results", help="JSON file of earlier measurements to compare instead of running")
+    parser.add_argument("--baseline", help="JSON file of measurements to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown reported as a regression")
+    parser.add_argument("--min_seconds", type=float, default=0.05, help="slowdowns shorter than this are ignored as noise")
+    # fmt: on
+    args = parser.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+
+    if args.results:
+        with open(args.results) as f:
+            results = json.load(f)
+    else:
+        options = dict(
+            language="en", word_timestamps=True, sample_len=args.sample_len, fp16=False
+        )
+        results = dict(
+            git=git_revision(),
+            date=datetime.datetime.now().astimezone().isoformat(timespec="seconds"),
+            python=platform.python_version(),
+            torch=torch.__version__,
+            device=args.device,
+            threads=torch.get_num_threads(),
+            options=dict(options, duration=args.duration, repeat=args.repeat),
+            results={},
+        )
+        compile_kernels()
+        with tempfile.TemporaryDirectory() as directory:
+            paths = {"jfk": JFK_PATH, "synthetic": os.path.join(directory, "noise.wav")}
+            write_synthetic_audio(paths["synthetic"], args.duration)
+            for name in args.models:
+                model = random_model(name, args.device)
+                for audio in args.audio:
+                    runs = [
+                        measure(model, paths[audio], directory, options)
+                        for _ in range(args.repeat)
+                    ]
+                    entry = results["results"][f"{name}/{audio}"] = fastest(runs)
+                    stages = "  ".join(f"{s} {entry['stages'][s]:.2f}" for s in STAGES)
+                    print(
+                        f"{name}/{audio}: {entry['duration']:.1f} s of audio"
+                        f" in {entry['total']:.2f} s (RTF {entry['rtf']:.3f})  {stages}"
+                    )
+                del model
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        slowdowns = compare(results, baseline, args.threshold, args.min_seconds)
+        if slowdowns:
+            print(
+                f"{slowdowns} stage(s) slower than the baseline by more than {args.threshold:.0%}"
+            )
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Measure the real-time factor (processing time / audio duration) of `transcribe` on CPU with the
+dynamically quantized int8 model, against the fp32 model, and the change in word error rate.
+
+Usage:
+
+    python benchmarks/quantization.py --models tiny base small --threads 4
+
+The fixtures are `tests/jfk.flac` and longer recordings made from it: the speech repeated with
+pauses in between, the same with background noise, and a long repetition spanning several
+30-second windows. The released checkpoints are downloaded unless they are already in
+`--download_root`; the quantized models are saved there as well, and the first (quantizing)
+and the cached load times are reported.
+"""
+
+import argparse
+import glob
+import os
+import time
+from typing import Dict, List
+
+import numpy as np
+import torch
+
+import whisper
+from whisper.audio import SAMPLE_RATE
+from whisper.normalizers import EnglishTextNormalizer
+
+JFK_PATH = os.path.join(os.path.dirname(__file__), "..", "tests", "jfk.flac")
+JFK_TEXT = (
+    "And so, my fellow Americans, ask not what your country can do for you, "
+    "ask what you can do for your country."
+)
+
+
+def fixtures(seed: int = 0) -> Dict[str, tuple]:
+    """(audio, reference transcript) of each fixture"""
+    rng = np.random.default_rng(seed)
+    jfk = whisper.load_audio(JFK_PATH)
+    pause = np.zeros(SAMPLE_RATE, dtype=np.float32)
+
+    def repeat(n: int) -> np.ndarray:
+        return np.concatenate([jfk, pause] * n)
+
+    speech = repeat(4)
+    noise = rng.standard_normal(len(speech)).astype(np.float32)
+    noise *= np.sqrt(np.mean(speech**2) / np.mean(noise**2) / 10 ** (20 / 10))
+    return {
+        "jfk": (jfk, JFK_TEXT),
+        "jfk x4": (speech, " ".join([JFK_TEXT] * 4)),
+        "jfk x4 noisy": (speech + noise, " ".join([JFK_TEXT] * 4)),
+        "jfk x12": (repeat(12), " ".join([JFK_TEXT] * 12)),
+    }
+
+
+def word_error_rate(reference: str, hypothesis: str, normalizer) -> float:
+    ref = normalizer(reference).split()
+    hyp = normalizer(hypothesis).split()
+    distance = np.arange(len(hyp) + 1)
+    for i, word in enumerate(ref, 1):
+        previous, distance = distance, np.empty_like(distance)
+        distance[0] = i
+        for j, other in enumerate(hyp, 1):
+            distance[j] = min(
+                previous[j] + 1, distance[j - 1] + 1, previous[j - 1] + (word != other)
+            )
+    return distance[-1] / max(len(ref), 1)
+
+
+def run(model, audio: np.ndarray, repeat: int) -> tuple:
+    """The best real-time factor over `repeat` runs, and the transcript"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = whisper.transcribe(model, audio, language="en", temperature=0.0)
+        best = min(best, time.perf_counter() - start)
+    return best / (len(audio) / SAMPLE_RATE), result["text"]
+
+
+def load_quantized(name: str, download_root: str) -> tuple:
+    start = time.perf_counter()
+    model = whisper.load_model(name, "cpu", download_root=download_root, quantize=True)
+    return model, time.perf_counter() - start
+
+
+def remove_quantized(name: str, download_root: str):
+    """Delete the saved quantized model, so that the next load quantizes the weights"""
+    if name not in whisper.available_models():
+        name = os.path.splitext(os.path.basename(name))[0] + "-*"
+    for path in glob.glob(os.path.join(download_root, f"{name}.int8.pt")):
+        os.remove(path)
+
+
+def main():
+    default = os.path.join(os.path.expanduser("~"), ".cache")
+    default_root = os.path.join(os.getenv("XDG_CACHE_HOME", default), "whisper")
+
+    # fmt: off
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--models", nargs="+", default=["tiny", "base", "small"], help="model names or checkpoint paths")
+    parser.add_argument("--fixtures", nargs="+", default=None, help="fixtures to transcribe (default: all)")
+    parser.add_argument("--download_root", default=default_root, help="directory of the checkpoints and the quantized models")
+    parser.add_argument("--repeat", type=int, default=1, help="number of runs per fixture; the fastest is reported")
+    parser.add_argument("--threads", type=int, default=0, help="number of threads used by torch on CPU (0 = default)")
+    # fmt: on
+    args = parser.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+
+    normalizer = EnglishTextNormalizer()
+    audios = fixtures()
+    names: List[str] = args.fixtures or list(audios)
+    for name in args.models:
+        fp32 = whisper.load_model(name, "cpu", download_root=args.download_root)
+        remove_quantized(name, args.download_root)
+        _, first = load_quantized(name, args.download_root)
+        int8, cached = load_quantized(name, args.download_root)
+        print(f"{name}: int8 load {first:.2f} s (quantizing), {cached:.2f} s (cached)")
+
+        for fixture in names:
+            audio, reference = audios[fixture]
+            rtf_fp32, text_fp32 = run(fp32, audio, args.repeat)
+            rtf_int8, text_int8 = run(int8, audio, args.repeat)
+            wer_fp32 = word_error_rate(reference, text_fp32, normalizer)
+            wer_int8 = word_error_rate(reference, text_int8, normalizer)
+            print(
+                f"  {fixture:<13s} {len(audio) / SAMPLE_RATE:6.1f} s"
+                f"  RTF fp32 {rtf_fp32:.3f} int8 {rtf_int8:.3f} ({rtf_fp32 / rtf_int8:.2f}x)"
+                f"  WER fp32 {wer_fp32:6.2%} int8 {wer_int8:6.2%}"
+                f" ({(wer_int8 - wer_fp32) * 100:+.2f} points)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,9 @@ import random as rand
 
 import numpy
 import pytest
+import torch
+
+import whisper
 
 
 def pytest_configure(config):
@@ -12,3 +15,32 @@ def pytest_configure(config):
 def random():
     rand.seed(42)
     numpy.random.seed(42)
+
+
+@pytest.fixture(scope="session")
+def tiny_model():
+    """
+    Build a small, randomly initialized model; keyword arguments override the dimensions
+    """
+
+    def make(**overrides) -> whisper.Whisper:
+        dims = dict(
+            n_mels=80,
+            n_audio_ctx=1500,
+            n_audio_state=64,
+            n_audio_head=2,
+            n_audio_layer=2,
+            n_vocab=51865,
+            n_text_ctx=448,
+            n_text_state=64,
+            n_text_head=2,
+            n_text_layer=2,
+        )
+        dims.update(overrides)
+        torch.manual_seed(0)
+        model = whisper.Whisper(whisper.ModelDimensions(**dims)).eval()
+        # the positional embedding is otherwise left uninitialized until a checkpoint is loaded
+        torch.nn.init.normal_(model.decoder.positional_embedding, std=0.01)
+        return model
+
+    return make
@@ -2,7 +2,14 @@ import os.path
 
 import numpy as np
 
-from whisper.audio import SAMPLE_RATE, load_audio, log_mel_spectrogram
+from whisper.audio import (
+    N_FRAMES,
+    N_SAMPLES,
+    SAMPLE_RATE,
+    LogMelStream,
+    load_audio,
+    log_mel_spectrogram,
+)
 
 
 def test_audio():
@@ -17,3 +24,26 @@ def test_audio():
 
     assert np.allclose(mel_from_audio, mel_from_file)
     assert mel_from_audio.max() - mel_from_audio.min() <= 2.0
+
+
+def test_log_mel_stream():
+    audio_path = os.path.join(os.path.dirname(__file__), "jfk.flac")
+    audio = load_audio(audio_path)
+    mel = log_mel_spectrogram(audio, padding=N_SAMPLES)
+
+    # chunk boundaries that do not line up with the hop length
+    chunks = [audio[i : i + 12345] for i in range(0, len(audio), 12345)]
+    stream = LogMelStream(chunks, padding=N_SAMPLES)
+    windows = []
+    while stream.fill(len(windows) * N_FRAMES + 1) > len(windows) * N_FRAMES:
+        start = len(windows) * N_FRAMES
+        windows.append(stream.frames(start, start + N_FRAMES))
+        stream.release(start + N_FRAMES)
+        assert stream.num_frames - start <= 2 * N_FRAMES
+
+    mel_from_stream = np.concatenate(windows, axis=-1)
+    assert mel_from_stream.shape == mel.shape
+    assert np.allclose(mel_from_stream, mel, atol=1e-5)
+
+    mel_from_file = LogMelStream(audio_path, padding=N_SAMPLES).frames(0, mel.shape[-1])
+    assert np.allclose(mel_from_file, mel, atol=1e-5)
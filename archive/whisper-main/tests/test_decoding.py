@@ -0,0 +1,321 @@
+import copy
+from typing import List, Tuple
+
+import numpy as np
+import pytest
+import torch
+import torch.nn.functional as F
+from torch import Tensor
+
+import whisper
+from whisper.decoding import (
+    ApplyTimestampRules,
+    BeamSearchDecoder,
+    Inference,
+    PyTorchInference,
+)
+from whisper.tokenizer import get_tokenizer
+
+
+@pytest.fixture(scope="module")
+def model(tiny_model):
+    return tiny_model()
+
+
+@pytest.mark.parametrize("max_length", [None, 8])
+@torch.no_grad()
+def test_kv_cache(model, max_length):
+    torch.manual_seed(1)
+    n_batch, initial_length, n_steps = 4, 3, 12
+    # the sequences of a beam search group attend to the same audio
+    audio_features = torch.randn(1, 1500, 64).repeat(n_batch, 1, 1)
+    tokens = torch.randint(0, 50000, (n_batch, initial_length))
+
+    # a copy without the cache hooks, to compute the logits from scratch
+    reference = copy.deepcopy(model)
+    inference = PyTorchInference(model, initial_length, max_length=max_length)
+    try:
+        for step in range(n_steps):
+            logits = inference.logits(tokens, audio_features)
+            expected = reference.decoder(tokens, audio_features)
+            assert torch.allclose(logits, expected[:, -logits.shape[1] :], atol=1e-4)
+
+            # reorder the sequences like a beam search would, and append a token to each
+            source_indices = torch.randint(0, n_batch, (n_batch,)).tolist()
+            if step % 3 == 0:
+                source_indices = list(range(n_batch))
+            inference.rearrange_kv_cache(source_indices)
+            next_tokens = logits[source_indices, -1].argmax(dim=-1, keepdim=True)
+            tokens = torch.cat([tokens[source_indices], next_tokens], dim=-1)
+
+        # the buffers grow past max_length and are otherwise written in place
+        cached = inference.kv_cache[model.decoder.blocks[0].attn.key]
+        assert cached.shape[:2] == (n_batch, initial_length + n_steps - 1)
+    finally:
+        inference.cleanup_caching()
+
+    assert inference.kv_cache == {}
+    assert all(not block.attn.key._forward_hooks for block in model.decoder.blocks)
+
+
+class ReferenceBeamSearchDecoder(BeamSearchDecoder):
+    """The previous implementation of the beam search, which loops over the candidates"""
+
+    def reset(self):
+        self.finished_sequences = None
+
+    def update(
+        self, tokens: Tensor, logits: Tensor, sum_logprobs: Tensor
+    ) -> Tuple[Tensor, bool]:
+        if tokens.shape[0] % self.beam_size != 0:
+            raise ValueError(f"{tokens.shape}[0] % {self.beam_size} != 0")
+
+        n_audio = tokens.shape[0] // self.beam_size
+        if self.finished_sequences is None:  # for the first update
+            self.finished_sequences = [{} for _ in range(n_audio)]
+
+        logprobs = F.log_softmax(logits.float(), dim=-1)
+        next_tokens, source_indices, finished_sequences = [], [], []
+        for i in range(n_audio):
+            scores, sources, finished = {}, {}, {}
+
+            # STEP 1: calculate the cumulative log probabilities for possible candidates
+            for j in range(self.beam_size):
+                idx = i * self.beam_size + j
+                prefix = tokens[idx].tolist()
+                for logprob, token in zip(*logprobs[idx].topk(self.beam_size + 1)):
+                    new_logprob = (sum_logprobs[idx] + logprob).item()
+                    sequence = tuple(prefix + [token.item()])
+                    scores[sequence] = new_logprob
+                    sources[sequence] = idx
+
+            # STEP 2: rank the candidates and keep the top beam_size sequences for each audio
+            saved = 0
+            for sequence in sorted(scores, key=scores.get, reverse=True):
+                if sequence[-1] == self.eot:
+                    finished[sequence] = scores[sequence]
+                else:
+                    sum_logprobs[len(next_tokens)] = scores[sequence]
+                    next_tokens.append(sequence)
+                    source_indices.append(sources[sequence])
+
+                    saved += 1
+                    if saved == self.beam_size:
+                        break
+
+            finished_sequences.append(finished)
+
+        tokens = torch.tensor(next_tokens, device=tokens.device)
+        self.inference.rearrange_kv_cache(source_indices)
+
+        # add newly finished sequences to self.finished_sequences
+        assert len(self.finished_sequences) == len(finished_sequences)
+        for previously_finished, newly_finished in zip(
+            self.finished_sequences, finished_sequences
+        ):
+            for seq in sorted(newly_finished, key=newly_finished.get, reverse=True):
+                if len(previously_finished) >= self.max_candidates:
+                    break  # the candidate list is full
+                previously_finished[seq] = newly_finished[seq]
+
+        # mark as completed if all audio has enough number of samples
+        completed = all(
+            len(sequences) >= self.max_candidates
+            for sequences in self.finished_sequences
+        )
+        return tokens, completed
+
+    def finalize(self, preceding_tokens: Tensor, sum_logprobs: Tensor):
+        # collect all finished sequences, including patience, and add unfinished ones if not enough
+        sum_logprobs = sum_logprobs.cpu()
+        for i, sequences in enumerate(self.finished_sequences):
+            if (
+                len(sequences) < self.beam_size
+            ):  # when not enough sequences are finished
+                for j in list(np.argsort(sum_logprobs[i]))[::-1]:
+                    sequence = preceding_tokens[i, j].tolist() + [self.eot]
+                    sequences[tuple(sequence)] = sum_logprobs[i][j].item()
+                    if len(sequences) >= self.beam_size:
+                        break
+
+        tokens: List[List[Tensor]] = [
+            [torch.tensor(seq) for seq in sequences.keys()]
+            for sequences in self.finished_sequences
+        ]
+        sum_logprobs: List[List[float]] = [
+            list(sequences.values()) for sequences in self.finished_sequences
+        ]
+        return tokens, sum_logprobs
+
+
+class RecordingInference(Inference):
+    def __init__(self):
+        self.source_indices = []
+
+    def rearrange_kv_cache(self, source_indices):
+        self.source_indices.append(list(source_indices))
+
+
+def prefix_logits(tokens: Tensor, n_vocab: int, eot: int, seed: int) -> Tensor:
+    """Random logits that depend only on the seed and the token prefix, rounded to make ties"""
+    logits = []
+    for prefix in tokens.tolist():
+        generator = torch.Generator().manual_seed(hash((seed, *prefix)) % 2**31)
+        row = torch.randn(n_vocab, generator=generator).mul(2).round().div(2)
+        row[eot] += seed % 4 * 0.2 * len(prefix)  # make most sequences finish over time
+        if prefix[-1] % 4 == 0:
+            row[:eot:2] = -np.inf
+        logits.append(row)
+    return torch.stack(logits)
+
+
+@pytest.mark.parametrize(
+    "beam_size, patience, n_audio",
+    [(2, None, 1), (5, None, 1), (5, 2.0, 3), (3, 0.5, 2)],
+)
+def test_beam_search(beam_size, patience, n_audio):
+    n_vocab, eot, sample_len = 12, 11, 12
+
+    for seed in range(20):
+        decoders = [
+            decoder_class(beam_size, eot, RecordingInference(), patience)
+            for decoder_class in (ReferenceBeamSearchDecoder, BeamSearchDecoder)
+        ]
+        results = []
+        for decoder in decoders:
+            decoder.reset()
+            initial = torch.tensor([[eot - 1, seed % 3]] * n_audio)
+            tokens = initial.repeat_interleave(beam_size, dim=0)
+            sum_logprobs = torch.zeros(n_audio * beam_size)
+            steps = []
+            for _ in range(sample_len):
+                logits = prefix_logits(tokens, n_vocab, eot, seed)
+                tokens, completed = decoder.update(tokens, logits, sum_logprobs)
+                steps.append((tokens.tolist(), sum_logprobs.tolist(), completed))
+                if completed:
+                    break
+            final_tokens, final_logprobs = decoder.finalize(
+                tokens.reshape(n_audio, beam_size, -1),
+                sum_logprobs.reshape(n_audio, beam_size),
+            )
+            final_tokens = [[t.tolist() for t in group] for group in final_tokens]
+            results.append(
+                (steps, decoder.inference.source_indices, final_tokens, final_logprobs)
+            )
+
+        assert results[0] == results[1], f"mismatch with seed {seed}"
+
+
+@pytest.mark.parametrize("beam_size", [None, 3])
+def test_decode_batch(model, beam_size):
+    torch.manual_seed(2)
+    mel = torch.randn(3, 80, 3000)
+    options = whisper.DecodingOptions(
+        language="en", beam_size=beam_size, sample_len=8, fp16=False
+    )
+
+    batched = whisper.decode(model, mel, options)
+    assert len(batched) == 3
+    for i, result in enumerate(batched):
+        single = whisper.decode(model, mel[i], options)
+        assert result.tokens == single.tokens
+        assert result.avg_logprob == pytest.approx(single.avg_logprob, abs=1e-4)
+
+
+class ReferenceApplyTimestampRules(ApplyTimestampRules):
+    """The previous implementation of the timestamp rules, which loops over the rows"""
+
+    def apply(self, logits: Tensor, tokens: Tensor):
+        # suppress <|notimestamps|> which is handled by without_timestamps
+        if self.tokenizer.no_timestamps is not None:
+            logits[:, self.tokenizer.no_timestamps] = -np.inf
+
+        # timestamps have to appear in pairs, except directly before EOT; mask logits accordingly
+        for k in range(tokens.shape[0]):
+            sampled_tokens = tokens[k, self.sample_begin :]
+            seq = [t for t in sampled_tokens.tolist()]
+            last_was_timestamp = (
+                len(seq) >= 1 and seq[-1] >= self.tokenizer.timestamp_begin
+            )
+            penultimate_was_timestamp = (
+                len(seq) < 2 or seq[-2] >= self.tokenizer.timestamp_begin
+            )
+
+            if last_was_timestamp:
+                if penultimate_was_timestamp:  # has to be non-timestamp
+                    logits[k, self.tokenizer.timestamp_begin :] = -np.inf
+                else:  # cannot be normal text tokens
+                    logits[k, : self.tokenizer.eot] = -np.inf
+
+            timestamps = sampled_tokens[
+                sampled_tokens.ge(self.tokenizer.timestamp_begin)
+            ]
+            if timestamps.numel() > 0:
+                # timestamps shouldn't decrease; forbid timestamp tokens smaller than the last
+                # also force each segment to have a nonzero length, to prevent infinite looping
+                if last_was_timestamp and not penultimate_was_timestamp:
+                    timestamp_last = timestamps[-1]
+                else:
+                    timestamp_last = timestamps[-1] + 1
+                logits[k, self.tokenizer.timestamp_begin : timestamp_last] = -np.inf
+
+        if tokens.shape[1] == self.sample_begin:
+            # suppress generating non-timestamp tokens at the beginning
+            logits[:, : self.tokenizer.timestamp_begin] = -np.inf
+
+            # apply the `max_initial_timestamp` option
+            if self.max_initial_timestamp_index is not None:
+                last_allowed = (
+                    self.tokenizer.timestamp_begin + self.max_initial_timestamp_index
+                )
+                logits[:, last_allowed + 1 :] = -np.inf
+
+        # if sum of probability over timestamps is above any other token, sample timestamp
+        logprobs = F.log_softmax(logits.float(), dim=-1)
+        for k in range(tokens.shape[0]):
+            timestamp_logprob = logprobs[k, self.tokenizer.timestamp_begin :].logsumexp(
+                dim=-1
+            )
+            max_text_token_logprob = logprobs[k, : self.tokenizer.timestamp_begin].max()
+            if timestamp_logprob > max_text_token_logprob:
+                logits[k, : self.tokenizer.timestamp_begin] = -np.inf
+
+
+@pytest.mark.parametrize("max_initial_timestamp_index", [None, 50])
+def test_apply_timestamp_rules(max_initial_timestamp_index):
+    tokenizer = get_tokenizer(multilingual=True, language="en", task="transcribe")
+    sample_begin = len(tokenizer.sot_sequence)
+    timestamp_begin = tokenizer.timestamp_begin
+    n_vocab = timestamp_begin + 1501
+    filters = [
+        rules_class(tokenizer, sample_begin, max_initial_timestamp_index)
+        for rules_class in (ReferenceApplyTimestampRules, ApplyTimestampRules)
+    ]
+
+    generator = torch.Generator().manual_seed(0)
+    for _ in range(200):
+        n_batch = int(torch.randint(1, 8, (1,), generator=generator))
+        n_sampled = int(torch.randint(0, 6, (1,), generator=generator))
+
+        # random histories of text tokens and timestamps, mostly increasing
+        text = torch.randint(
+            0, tokenizer.eot, (n_batch, n_sampled), generator=generator
+        )
+        steps = torch.randint(-2, 30, (n_batch, n_sampled), generator=generator)
+        timestamps = timestamp_begin + steps.cumsum(dim=-1).clamp(0, 1500)
+        is_timestamp = torch.rand(n_batch, n_sampled, generator=generator) < 0.5
+        sampled = torch.where(is_timestamp, timestamps, text)
+        prefix = torch.tensor([tokenizer.sot_sequence] * n_batch)
+        tokens = torch.cat([prefix, sampled], dim=-1)
+
+        # make the timestamps more likely than any text token in some of the rows
+        logits = torch.randn(n_batch, n_vocab, generator=generator) * 3
+        boost = torch.rand(n_batch, 1, generator=generator) * 16 - 8
+        logits[:, timestamp_begin:] += boost
+
+        results = []
+        for rules in filters:
+            filtered = logits.clone()
+            rules.apply(filtered, tokens)
+            results.append(filtered)
+        assert torch.equal(results[0], results[1]), tokens
@@ -0,0 +1,82 @@
+import pytest
+import torch
+
+import whisper
+
+
+@pytest.mark.parametrize(
+    "mmap, in_memory, zipfile",
+    [
+        (True, False, True),
+        (False, False, True),
+        (True, True, True),
+        (True, False, False),
+    ],
+)
+def test_load_model(tiny_model, tmp_path, mmap: bool, in_memory: bool, zipfile: bool):
+    model = tiny_model()
+    dims = model.dims
+
+    # the released checkpoints hold the weights in fp16
+    state_dict = {k: v.half() for k, v in model.state_dict().items()}
+    path = tmp_path / "model.pt"
+    checkpoint = {"dims": dims.__dict__, "model_state_dict": state_dict}
+    # checkpoints in the legacy format cannot be memory-mapped
+    torch.save(checkpoint, path, _use_new_zipfile_serialization=zipfile)
+
+    loaded = whisper.load_model(str(path), "cpu", mmap=mmap, in_memory=in_memory)
+    assert loaded.dims == dims
+    for key, tensor in loaded.state_dict().items():
+        assert tensor.dtype == torch.float32
+        assert torch.equal(tensor, state_dict[key].float())
+    for name, buffer in loaded.named_buffers():
+        assert not buffer.is_meta, name
+    assert torch.equal(loaded.decoder.mask, model.decoder.mask)
+    assert torch.equal(
+        loaded.alignment_heads.to_dense(), model.alignment_heads.to_dense()
+    )
+    assert all(p.requires_grad for p in loaded.parameters())
+
+    mel = torch.randn(1, 80, 3000)
+    tokens = torch.tensor([[50258, 50259, 50359]])
+    with torch.no_grad():
+        model.load_state_dict(state_dict)
+        assert torch.allclose(loaded(mel, tokens), model(mel, tokens), atol=1e-5)
+
+
+def test_load_quantized_model(tiny_model, tmp_path):
+    model = tiny_model()
+    dims = model.dims
+    path = tmp_path / "model.pt"
+    torch.save({"dims": dims.__dict__, "model_state_dict": model.state_dict()}, path)
+
+    cache_dir = tmp_path / "cache"
+    quantized = whisper.load_model(
+        str(path), "cpu", download_root=str(cache_dir), quantize=True
+    )
+    (cache_file,) = cache_dir.glob("*.int8.pt")
+    cached = whisper.load_model(
+        str(path), "cpu", download_root=str(cache_dir), quantize=True
+    )
+
+    for loaded in (quantized, cached):
+        assert not any(isinstance(m, torch.nn.Linear) for m in loaded.modules())
+        assert not any(p.is_meta for p in loaded.parameters())
+
+    mel = torch.randn(1, 80, 3000)
+    tokens = torch.tensor([[50258, 50259, 50359]])
+    with torch.no_grad():
+        expected = model(mel, tokens)
+        actual = quantized(mel, tokens)
+        assert torch.equal(cached(mel, tokens), actual)
+    error = (actual - expected).pow(2).mean() / expected.pow(2).mean()
+    assert error < 1e-3
+
+    # a modified checkpoint is quantized again
+    torch.save({"dims": dims.__dict__, "model_state_dict": model.state_dict()}, path)
+    modified = cache_file.stat().st_mtime_ns
+    whisper.load_model(str(path), "cpu", download_root=str(cache_dir), quantize=True)
+    assert cache_file.stat().st_mtime_ns != modified
+
+    with pytest.raises(ValueError):
+        whisper.load_model(str(path), "meta", quantize=True)
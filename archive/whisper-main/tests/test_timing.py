@@ -3,7 +3,18 @@ import pytest
 import scipy.ndimage
 import torch
 
-from whisper.timing import dtw_cpu, dtw_cuda, median_filter
+from whisper.model import disable_sdpa
+from whisper.timing import (
+    alignment_matrices,
+    dtw,
+    dtw_batch,
+    dtw_cpu,
+    dtw_cuda,
+    dtw_wavefront,
+    median_filter,
+    normalize_band,
+)
+from whisper.tokenizer import get_tokenizer
 
 sizes = [
     (10, 20),
@@ -52,6 +63,121 @@ def test_dtw(N: int, M: int):
     assert np.allclose(trace, dtw_trace)
 
 
+@pytest.mark.parametrize("N, M", sizes + [(1, 7), (7, 1), (50, 50)])
+def test_dtw_wavefront_equivalence(N: int, M: int):
+    for seed in range(5):
+        x = np.random.default_rng(seed).standard_normal((N, M)).astype(np.float32)
+        assert np.array_equal(dtw_wavefront(x), dtw_cpu(x))
+
+    # ties are broken in the same order
+    x = np.random.default_rng(0).integers(0, 3, (N, M)).astype(np.float32)
+    assert np.array_equal(dtw_wavefront(x), dtw_cpu(x))
+
+
+def is_warping_path(path: np.ndarray, N: int, M: int) -> bool:
+    steps = np.diff(path, axis=1)
+    return (
+        tuple(path[:, 0]) == (0, 0)
+        and tuple(path[:, -1]) == (N - 1, M - 1)
+        and ((steps == 0) | (steps == 1)).all()
+        and steps.any(axis=0).all()
+    )
+
+
+@pytest.mark.parametrize("N, M", sizes)
+def test_dtw_band(N: int, M: int):
+    rng = np.random.default_rng(N * M)
+    x = rng.standard_normal((N, M)).astype(np.float32)
+    rows, columns = dtw_cpu(x)
+
+    # a band that contains the optimal path does not change it
+    margin = int(rng.integers(0, 5))
+    lower = [columns[rows == i].min() - margin for i in range(N)]
+    upper = [columns[rows == i].max() + margin for i in range(N)]
+    assert np.array_equal(dtw_wavefront(x, (lower, upper)), np.stack([rows, columns]))
+
+    # otherwise, the path stays within the band, which always contains one
+    for _ in range(10):
+        centers = np.sort(rng.integers(0, M, N))
+        width = rng.integers(0, M // 4 + 1, N)
+        lower, upper = normalize_band(centers - width, centers + width, M)
+        path = dtw_wavefront(x, (lower, upper))
+        assert is_warping_path(path, N, M)
+        assert (lower[path[0]] <= path[1]).all() and (path[1] <= upper[path[0]]).all()
+
+        # the cost is the lowest among the paths within the band
+        full = x.copy()
+        outside = np.arange(M) < lower[:, None]
+        outside |= np.arange(M) > upper[:, None]
+        full[outside] = 1e6
+        assert x[tuple(path)].sum() == pytest.approx(x[tuple(dtw_cpu(full))].sum())
+
+
+def test_dtw_batch():
+    xs = [torch.randn(N, M) for N, M in sizes]
+    bands = [None, None, (np.zeros(123), np.arange(123) * 12), None]
+    paths = dtw_batch(xs, bands, num_workers=2)
+    assert len(paths) == len(xs)
+    for x, band, path in zip(xs, bands, paths):
+        assert np.array_equal(path, dtw(x, band))
+    assert dtw_batch([]) == []
+
+
+def reference_alignment_matrix(model, tokenizer, text_tokens, mel, num_frames):
+    """The previous computation, running the whole model and keeping every head's weights"""
+    tokens = [*tokenizer.sot_sequence, tokenizer.no_timestamps, *text_tokens]
+    tokens = torch.tensor(tokens + [tokenizer.eot])
+
+    QKs = [None] * model.dims.n_text_layer
+    hooks = [
+        block.cross_attn.register_forward_hook(
+            lambda _, ins, outs, index=i: QKs.__setitem__(index, outs[-1][0])
+        )
+        for i, block in enumerate(model.decoder.blocks)
+    ]
+    with torch.no_grad(), disable_sdpa():
+        logits = model(mel.unsqueeze(0), tokens.unsqueeze(0))[0]
+    for hook in hooks:
+        hook.remove()
+
+    token_probs = logits[len(tokenizer.sot_sequence) :, : tokenizer.eot].softmax(-1)
+    text_token_probs = token_probs[np.arange(len(text_tokens)), text_tokens]
+
+    weights = torch.stack([QKs[_l][_h] for _l, _h in model.alignment_heads.indices().T])
+    weights = weights[:, :, : num_frames // 2].softmax(dim=-1)
+    std, mean = torch.std_mean(weights, dim=-2, keepdim=True, unbiased=False)
+    weights = median_filter((weights - mean) / std, 7)
+    matrix = weights.mean(axis=0)[len(tokenizer.sot_sequence) : -1]
+    return matrix, text_token_probs.tolist()
+
+
+def test_alignment_matrices(tiny_model):
+    model = tiny_model(n_audio_head=4, n_text_head=4, n_text_layer=3)
+    heads = torch.zeros(3, 4, dtype=torch.bool)
+    heads[0, 2] = heads[2, 0] = heads[2, 3] = True
+    model.register_buffer("alignment_heads", heads.to_sparse(), persistent=False)
+    tokenizer = get_tokenizer(multilingual=True)
+
+    windows = [(5, 3000), (17, 1234), (1, 800)]
+    mel = torch.randn(len(windows), 80, 3000)
+    text_tokens = [torch.randint(0, 50000, (n,)).tolist() for n, _ in windows]
+    num_frames = [frames for _, frames in windows]
+
+    with torch.no_grad():
+        audio_features = model.embed_audio(mel)
+    matrices = alignment_matrices(
+        model, tokenizer, text_tokens, audio_features, num_frames
+    )
+
+    for i, (matrix, text_token_probs) in enumerate(matrices):
+        expected, expected_probs = reference_alignment_matrix(
+            model, tokenizer, text_tokens[i], mel[i], num_frames[i]
+        )
+        assert matrix.shape == (len(text_tokens[i]) + 1, num_frames[i] // 2)
+        assert torch.allclose(matrix, expected, atol=1e-4)
+        assert np.allclose(text_token_probs, expected_probs, atol=1e-6)
+
+
 @pytest.mark.requires_cuda
 @pytest.mark.parametrize("N, M", sizes)
 def test_dtw_cuda_equivalence(N: int, M: int):
@@ -1,5 +1,8 @@
+import contextlib
 import os
+from functools import partial
 
+import numpy as np
 import pytest
 import torch
 
@@ -40,3 +43,166 @@ def test_transcribe(model_name: str):
                 timing_checked = True
 
     assert timing_checked
+
+
+def test_transcribe_batched(tiny_model, random):
+    model = tiny_model()
+    audio = np.random.randn(whisper.audio.SAMPLE_RATE * 75).astype(np.float32) * 0.1
+    options = dict(language="en", temperature=0.0, sample_len=8, fp16=False)
+
+    sequential = model.transcribe_batched(audio, batch_size=1, **options)
+    batched = model.transcribe_batched(audio, batch_size=2, **options)
+
+    assert batched["text"] == sequential["text"]
+    assert batched["text"] == "".join([s["text"] for s in batched["segments"]])
+    assert [s["tokens"] for s in batched["segments"]] == [
+        s["tokens"] for s in sequential["segments"]
+    ]
+    # windows are laid out at fixed 30-second boundaries
+    assert {s["seek"] for s in batched["segments"]} <= {0, 3000, 6000}
+    for segment in batched["segments"]:
+        assert segment["seek"] / 100 <= segment["start"] <= segment["end"]
+        assert segment["end"] <= segment["seek"] / 100 + 30
+
+    # the streaming frontend gives the same windows
+    chunks = np.array_split(audio, 5)
+    stream = whisper.audio.LogMelStream(iter(chunks), padding=whisper.audio.N_SAMPLES)
+    streamed = model.transcribe_batched(stream, batch_size=2, **options)
+    assert streamed["text"] == batched["text"]
+
+    # the word alignments of a batch are searched together
+    options["word_timestamps"] = True
+    sequential = model.transcribe_batched(audio, batch_size=1, **options)
+    batched = model.transcribe_batched(audio, batch_size=2, **options)
+    assert [s["words"] for s in batched["segments"]] == [
+        s["words"] for s in sequential["segments"]
+    ]
+
+
+def test_transcribe_vad(tiny_model):
+    model = tiny_model()
+    speech = whisper.load_audio(os.path.join(os.path.dirname(__file__), "jfk.flac"))
+    noise = np.random.default_rng(0).standard_normal(40 * whisper.audio.SAMPLE_RATE)
+    audio = np.concatenate([(noise * 0.002).astype(np.float32), speech])
+    options = dict(language="en", temperature=0.0, sample_len=8, fp16=False)
+
+    for transcribe in (model.transcribe, model.transcribe_batched):
+        result = transcribe(audio, vad=True, **options)
+        assert 38.0 < result["vad"]["skipped"] < 42.0
+        assert result["vad"]["duration"] == pytest.approx(51.0, abs=0.1)
+        # the encoder never sees the leading silence
+        assert all(segment["seek"] >= 3800 for segment in result["segments"])
+
+        assert "vad" not in transcribe(audio, **options)
+
+
+def test_transcribe_span(tiny_model):
+    model = tiny_model()
+    audio = np.random.default_rng(0).standard_normal(45 * whisper.audio.SAMPLE_RATE)
+    audio = (audio * 0.1).astype(np.float32)
+    options = dict(
+        language="en",
+        temperature=(0.0, 0.5),
+        sample_len=8,
+        fp16=False,
+        word_timestamps=True,
+    )
+
+    for transcribe in (model.transcribe, model.transcribe_batched):
+        spans = []
+
+        @contextlib.contextmanager
+        def span(name, **attributes):
+            spans.append((name, attributes))
+            yield
+
+        torch.manual_seed(0)
+        result = transcribe(audio, span=span, **options)
+        torch.manual_seed(0)
+        assert transcribe(audio, **options)["text"] == result["text"]
+
+        names = [name for name, _ in spans]
+        assert names[0] == "mel"
+        encodes = [a for name, a in spans if name == "encode"]
+        decodes = [a for name, a in spans if name == "decode"]
+        assert "alignment" in names
+        assert {a["temperature"] for a in decodes} <= {0.0, 0.5}
+        if transcribe == model.transcribe:
+            # every window is encoded once and decoded at least at the first temperature
+            seeks = [a["seek"] for a in encodes]
+            assert len(seeks) >= 2
+            assert sorted(seeks) == sorted(
+                a["seek"] for a in decodes if a["temperature"] == 0.0
+            )
+            assert {a["seek"] for a in decodes} == set(seeks)
+        else:
+            assert sum(a["windows"] for a in encodes) == 2
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_transcribe_progress(tiny_model, streaming: bool):
+    model = tiny_model()
+    audio = np.random.default_rng(0).standard_normal(75 * whisper.audio.SAMPLE_RATE)
+    audio = (audio * 0.1).astype(np.float32)
+    options = dict(language="en", temperature=0.0, sample_len=8, fp16=False)
+
+    # two windows per batch, so that the batched path reports more than once
+    batched = partial(model.transcribe_batched, batch_size=2)
+    for transcribe in (model.transcribe, batched):
+        reports = []
+        if streaming:
+            chunks = iter(np.array_split(audio, 10))
+            padding = whisper.audio.N_SAMPLES
+            source = whisper.audio.LogMelStream(chunks, padding=padding)
+        else:
+            source = audio
+        result = transcribe(source, progress=reports.append, **options)
+
+        assert len(reports) >= 2
+        frames = [r.frames for r in reports]
+        assert frames == sorted(frames)
+        assert [r.segments for r in reports] == sorted(r.segments for r in reports)
+        last = reports[-1]
+        assert last.frames == last.total_frames == 7500
+        assert last.fraction == 1.0 and last.eta == 0.0
+        assert last.segments == len(result["segments"])
+        assert last.realtime_factor == pytest.approx(last.elapsed / 75)
+        # the last window's report is not repeated when the transcription finishes
+        assert sum(r.frames == r.total_frames for r in reports) == 1
+        if not streaming:
+            assert all(r.total_frames == 7500 for r in reports)
+            assert reports[0].eta is not None
+
+
+def test_transcribe_iter(tiny_model):
+    model = tiny_model()
+    audio = np.random.default_rng(0).standard_normal(75 * whisper.audio.SAMPLE_RATE)
+    audio = (audio * 0.1).astype(np.float32)
+    options = dict(language="en", temperature=0.0, sample_len=8, fp16=False)
+
+    for batch_size in (1, 2):
+        windows = []
+        if batch_size > 1:
+            expected = model.transcribe_batched(
+                audio, batch_size=batch_size, on_segments=windows.append, **options
+            )
+        else:
+            expected = model.transcribe(audio, on_segments=windows.append, **options)
+        assert len(windows) >= 2
+        assert [s for window in windows for s in window] == expected["segments"]
+
+        segments = []
+        iterator = model.transcribe_iter(audio, batch_size=batch_size, **options)
+        with pytest.raises(StopIteration) as stop:
+            while True:
+                segments.append(next(iterator))
+        assert segments == expected["segments"]
+        assert stop.value.value["text"] == expected["text"]
+
+        # closing the generator stops the transcription
+        iterator = model.transcribe_iter(audio, batch_size=batch_size, **options)
+        next(iterator)
+        iterator.close()
+
+    with pytest.raises(TypeError):
+        next(model.transcribe_iter(audio, on_segments=print, **options))
@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+import pytest
+
+from whisper.audio import (
+    FRAMES_PER_SECOND,
+    SAMPLE_RATE,
+    load_audio,
+    log_mel_spectrogram,
+)
+from whisper.vad import SpeechDetector, VadOptions
+
+
+@pytest.fixture
+def audio_with_silence():
+    audio_path = os.path.join(os.path.dirname(__file__), "jfk.flac")
+    speech = load_audio(audio_path)
+    rng = np.random.default_rng(0)
+
+    def noise(seconds: float) -> np.ndarray:
+        samples = rng.standard_normal(int(seconds * SAMPLE_RATE)) * 0.002
+        return samples.astype(np.float32)
+
+    return np.concatenate([noise(10), speech, noise(15), speech, noise(5)])
+
+
+def test_speech_mask(audio_with_silence):
+    mel = log_mel_spectrogram(audio_with_silence)
+    mask = SpeechDetector().speech_mask(mel)
+    seconds = np.arange(mask.shape[-1]) / FRAMES_PER_SECOND
+
+    speech = seconds[mask.numpy()]
+    assert 9.5 < speech[0] < 10.5
+    # the 15 seconds of silence between the two utterances is not speech
+    assert not ((speech > 24.0) & (speech < 30.0)).any()
+    assert speech[-1] < 48.0
+
+
+def test_leading_silence(audio_with_silence):
+    mel = log_mel_spectrogram(audio_with_silence)
+
+    detector = SpeechDetector(VadOptions(speech_pad=0.5))
+    skip = detector.leading_silence(mel[:, :3000])
+    assert 940 < skip < 1010
+
+    # short pauses are kept in the window
+    detector = SpeechDetector(VadOptions(min_silence_duration=20.0))
+    assert detector.leading_silence(mel[:, :3000]) == 0
+
+    # a window without speech is skipped entirely
+    silent = log_mel_spectrogram(audio_with_silence[: 8 * SAMPLE_RATE])
+    assert SpeechDetector().leading_silence(silent) == silent.shape[-1]
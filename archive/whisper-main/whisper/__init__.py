@@ -6,12 +6,14 @@ import warnings
 from typing import List, Optional, Union
 
 import torch
+from torch.overrides import TorchFunctionMode
 from tqdm import tqdm
 
 from .audio import load_audio, log_mel_spectrogram, pad_or_trim
 from .decoding import DecodingOptions, DecodingResult, decode, detect_language
 from .model import ModelDimensions, Whisper
-from .transcribe import transcribe
+from .quantization import quantize_dynamic
+from .transcribe import transcribe, transcribe_batched, transcribe_iter
 from .version import __version__
 
 _MODELS = {
@@ -50,6 +52,9 @@ _ALIGNMENT_HEADS = {
     "turbo": b"ABzY8j^C+e0{>%RARaKHP%t(lGR*)0g!tONPyhe`",
 }
 
+# bumped when the format of the quantized models saved by `load_model(quantize=True)` changes
+_QUANTIZED_VERSION = 1
+
 
 def _download(url: str, root: str, in_memory: bool) -> Union[bytes, str]:
     os.makedirs(root, exist_ok=True)
@@ -61,10 +66,8 @@ def _download(url: str, root: str, in_memory: bool) -> Union[bytes, str]:
         raise RuntimeError(f"{download_target} exists and is not a regular file")
 
     if os.path.isfile(download_target):
-        with open(download_target, "rb") as f:
-            model_bytes = f.read()
-        if hashlib.sha256(model_bytes).hexdigest() == expected_sha256:
-            return model_bytes if in_memory else download_target
+        if _sha256(download_target) == expected_sha256:
+            return open(download_target, "rb").read() if in_memory else download_target
         else:
             warnings.warn(
                 f"{download_target} exists, but the SHA256 checksum does not match; re-downloading the file"
@@ -86,13 +89,103 @@ def _download(url: str, root: str, in_memory: bool) -> Union[bytes, str]:
                 output.write(buffer)
                 loop.update(len(buffer))
 
-    model_bytes = open(download_target, "rb").read()
-    if hashlib.sha256(model_bytes).hexdigest() != expected_sha256:
+    if _sha256(download_target) != expected_sha256:
         raise RuntimeError(
             "Model has been downloaded but the SHA256 checksum does not not match. Please retry loading the model."
         )
 
-    return model_bytes if in_memory else download_target
+    return open(download_target, "rb").read() if in_memory else download_target
+
+
+def _sha256(path: str) -> str:
+    """Hash the file in chunks, so that the checkpoint is not read into memory at once"""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class _SkipInit(TorchFunctionMode):
+    """Skip the random initialization of embeddings, which is slow on the meta device"""
+
+    def __torch_function__(self, func, types, args=(), kwargs=None):
+        kwargs = kwargs or {}
+        if getattr(func, "__name__", None) == "normal_":
+            # `torch.nn.init.normal_(tensor, ...)` or `Tensor.normal_(self, ...)`
+            return args[0] if args else kwargs["tensor"]
+        return func(*args, **kwargs)
+
+
+def _load_checkpoint(path: str, mmap: bool) -> dict:
+    if mmap:
+        try:
+            return torch.load(path, map_location="cpu", mmap=True)
+        except RuntimeError:
+            # only checkpoints in the zip format introduced in PyTorch 1.6 can be memory-mapped
+            pass
+    with open(path, "rb") as fp:
+        return torch.load(fp, map_location="cpu")
+
+
+def _load_quantized_model(
+    name: str, download_root: str, in_memory: bool, mmap: bool
+) -> Whisper:
+    """
+    `load_model(name, "cpu", quantize=True)`: the quantized model is saved in `download_root`
+    and reused as long as it comes from the same checkpoint and PyTorch version
+    """
+    if name in _MODELS:
+        source = _MODELS[name]  # the URL contains the checkpoint's SHA256
+        cache_name = name
+    elif os.path.isfile(name):
+        path = os.path.abspath(name)
+        stat = os.stat(path)
+        source = f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+        digest = hashlib.sha256(path.encode()).hexdigest()[:16]
+        cache_name = f"{os.path.splitext(os.path.basename(path))[0]}-{digest}"
+    else:
+        raise RuntimeError(
+            f"Model {name} not found; available models = {available_models()}"
+        )
+    cache_file = os.path.join(download_root, f"{cache_name}.int8.pt")
+    version = f"{_QUANTIZED_VERSION}:{torch.__version__}"
+
+    model = None
+    try:
+        checkpoint = torch.load(cache_file, map_location="cpu")
+        if checkpoint["source"] == source and checkpoint["version"] == version:
+            with torch.device("meta"), _SkipInit():
+                model = Whisper(ModelDimensions(**checkpoint["dims"]))
+            quantize_dynamic(model)
+            model.load_state_dict(checkpoint["model_state_dict"], assign=True)
+        del checkpoint
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        warnings.warn(f"Ignoring the quantized model {cache_file}: {e}")
+        model = None
+
+    if model is None:
+        model = quantize_dynamic(
+            load_model(name, "cpu", download_root, in_memory, mmap)
+        )
+        checkpoint = {
+            "source": source,
+            "version": version,
+            "dims": model.dims.__dict__,
+            "model_state_dict": model.state_dict(),
+        }
+        try:
+            os.makedirs(download_root, exist_ok=True)
+            torch.save(checkpoint, cache_file + ".tmp")
+            os.replace(cache_file + ".tmp", cache_file)
+        except OSError as e:
+            warnings.warn(f"Could not save the quantized model to {cache_file}: {e}")
+    elif name in _ALIGNMENT_HEADS:
+        model.set_alignment_heads(_ALIGNMENT_HEADS[name])
+
+    return model
 
 
 def available_models() -> List[str]:
@@ -105,6 +198,8 @@ def load_model(
     device: Optional[Union[str, torch.device]] = None,
     download_root: str = None,
     in_memory: bool = False,
+    mmap: bool = False,
+    quantize: bool = False,
 ) -> Whisper:
     """
     Load a Whisper ASR model
@@ -120,6 +215,14 @@ def load_model(
         path to download the model files; by default, it uses "~/.cache/whisper"
     in_memory: bool
         whether to preload the model weights into host memory
+    mmap: bool
+        whether to memory-map the checkpoint file instead of reading it. The weights are then
+        used in place when their dtype matches the model's (e.g. fp32 checkpoints on CPU), or
+        copied from the page cache otherwise. Has no effect with `in_memory`.
+    quantize: bool
+        whether to replace the linear layers of the encoder and the decoder by dynamically
+        quantized int8 layers, for faster inference on CPU. The quantized model is saved in
+        `download_root`, so that the weights are only quantized on the first load.
 
     Returns
     -------
@@ -133,6 +236,11 @@ def load_model(
         default = os.path.join(os.path.expanduser("~"), ".cache")
         download_root = os.path.join(os.getenv("XDG_CACHE_HOME", default), "whisper")
 
+    if quantize:
+        if torch.device(device).type != "cpu":
+            raise ValueError("int8 quantization is only supported on CPU")
+        return _load_quantized_model(name, download_root, in_memory, mmap)
+
     if name in _MODELS:
         checkpoint_file = _download(_MODELS[name], download_root, in_memory)
         alignment_heads = _ALIGNMENT_HEADS[name]
@@ -144,15 +252,26 @@ def load_model(
             f"Model {name} not found; available models = {available_models()}"
         )
 
-    with (
-        io.BytesIO(checkpoint_file) if in_memory else open(checkpoint_file, "rb")
-    ) as fp:
-        checkpoint = torch.load(fp, map_location=device)
+    if in_memory:
+        with io.BytesIO(checkpoint_file) as fp:
+            checkpoint = torch.load(fp, map_location="cpu")
+    else:
+        checkpoint = _load_checkpoint(checkpoint_file, mmap)
     del checkpoint_file
 
     dims = ModelDimensions(**checkpoint["dims"])
-    model = Whisper(dims)
-    model.load_state_dict(checkpoint["model_state_dict"])
+    # build the modules without allocating or initializing the weights, then use the
+    # checkpoint's tensors as the parameters, converted to their dtype and device if needed;
+    # each converted tensor replaces its entry, so the original can be freed right away
+    with torch.device("meta"), _SkipInit():
+        model = Whisper(dims)
+    expected = model.state_dict()
+    state_dict = checkpoint.pop("model_state_dict")
+    for key, tensor in state_dict.items():
+        if key in expected:
+            state_dict[key] = tensor.to(device, expected[key].dtype)
+    model.load_state_dict(state_dict, assign=True)
+    del checkpoint, state_dict
 
     if alignment_heads is not None:
         model.set_alignment_heads(alignment_heads)
@@ -1,7 +1,8 @@
 import os
+import tempfile
 from functools import lru_cache
-from subprocess import CalledProcessError, run
-from typing import Optional, Union
+from subprocess import PIPE, CalledProcessError, Popen, run
+from typing import Iterable, Iterator, Optional, Union
 
 import numpy as np
 import torch
@@ -62,6 +63,63 @@ def load_audio(file: str, sr: int = SAMPLE_RATE):
     return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
 
 
+def load_audio_stream(
+    file: str, sr: int = SAMPLE_RATE, chunk_samples: int = N_SAMPLES
+) -> Iterator[np.ndarray]:
+    """
+    Open an audio file and incrementally read it as mono waveform chunks
+
+    Parameters
+    ----------
+    file: str
+        The audio file to open
+
+    sr: int
+        The sample rate to resample the audio if necessary
+
+    chunk_samples: int
+        The number of samples in each yielded chunk, except possibly the last one
+
+    Returns
+    -------
+    An iterator of NumPy arrays containing the audio waveform, in float32 dtype.
+    """
+
+    # fmt: off
+    cmd = [
+        "ffmpeg",
+        "-nostdin",
+        "-threads", "0",
+        "-i", file,
+        "-f", "s16le",
+        "-ac", "1",
+        "-acodec", "pcm_s16le",
+        "-ar", str(sr),
+        "-"
+    ]
+    # fmt: on
+
+    # stderr goes to a file so that a chatty ffmpeg cannot block on a full pipe
+    with tempfile.TemporaryFile() as stderr:
+        process = Popen(cmd, stdout=PIPE, stderr=stderr)
+        try:
+            while True:
+                data = process.stdout.read(chunk_samples * 2)
+                if not data:
+                    break
+                data = data[: len(data) - len(data) % 2]
+                yield np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            returncode = process.wait()
+
+        if returncode != 0:
+            stderr.seek(0)
+            raise RuntimeError(f"Failed to load audio: {stderr.read().decode()}")
+
+
 def pad_or_trim(array, length: int = N_SAMPLES, *, axis: int = -1):
     """
     Pad or trim the audio array to N_SAMPLES, as expected by the encoder.
@@ -155,3 +213,140 @@ def log_mel_spectrogram(
     log_spec = torch.maximum(log_spec, log_spec.max() - 8.0)
     log_spec = (log_spec + 4.0) / 4.0
     return log_spec
+
+
+class LogMelStream:
+    """
+    Incrementally computes the log-Mel spectrogram of an audio stream, so that only a few
+    30-second windows of audio and Mel frames are held in memory at a time.
+
+    The frames are identical to `log_mel_spectrogram(audio, n_mels, padding)`, including the
+    reflection padding at both ends of the STFT, except that the dynamic range clamp uses the
+    running maximum of the frames read so far instead of the maximum over the whole recording.
+    The two only differ for frames more than 80 dB quieter than the loudest frame seen so far.
+    """
+
+    def __init__(
+        self,
+        audio: Union[str, Iterable[Union[np.ndarray, torch.Tensor]]],
+        n_mels: int = 80,
+        padding: int = 0,
+        device: Optional[Union[str, torch.device]] = None,
+    ):
+        """
+        Parameters
+        ----------
+        audio: Union[str, Iterable[Union[np.ndarray, torch.Tensor]]]
+            The path to audio, or an iterable of waveform chunks in 16 kHz
+
+        n_mels: int
+            The number of Mel-frequency filters, only 80 and 128 are supported
+
+        padding: int
+            Number of zero samples to pad to the right
+
+        device: Optional[Union[str, torch.device]]
+            If given, the STFT is computed on this device
+        """
+        if isinstance(audio, str):
+            audio = load_audio_stream(audio)
+        self.n_mels = n_mels
+        self.padding = padding
+        self.device = (
+            torch.device(device) if device is not None else torch.device("cpu")
+        )
+        self._chunks = iter(audio)
+        self._window = torch.hann_window(N_FFT).to(self.device)
+        self._filters = mel_filters(self.device, n_mels)
+
+        self._samples = torch.zeros(0, device=self.device)  # reflect-padded, unconsumed
+        self._started = False
+        self._mel = torch.zeros(n_mels, 0, device=self.device)  # raw log10 Mel frames
+        self._offset = 0  # index of the first frame in self._mel
+        self._max = float("-inf")
+        self.finished = False
+
+    @property
+    def num_frames(self) -> int:
+        """The number of frames computed so far; the total once `finished` is True"""
+        return self._offset + self._mel.shape[-1]
+
+    def _compute(self, samples: torch.Tensor) -> torch.Tensor:
+        stft = torch.stft(
+            samples,
+            N_FFT,
+            HOP_LENGTH,
+            window=self._window,
+            center=False,
+            return_complex=True,
+        )
+        magnitudes = stft.abs() ** 2
+        log_spec = torch.clamp(self._filters @ magnitudes, min=1e-10).log10()
+        if log_spec.shape[-1] > 0:
+            self._max = max(self._max, log_spec.max().item())
+        return log_spec
+
+    def _push(self, chunk: torch.Tensor, final: bool = False):
+        pad = N_FFT // 2
+        samples = torch.cat([self._samples, chunk])
+        if not self._started:
+            if len(samples) <= pad and not final:
+                self._samples = samples
+                return
+            samples = torch.cat([samples[1 : pad + 1].flip(0), samples])
+            self._started = True
+        if final:
+            samples = torch.cat([samples, samples[-pad - 1 : -1].flip(0)])
+
+        if len(samples) >= N_FFT:
+            n_frames = 1 + (len(samples) - N_FFT) // HOP_LENGTH
+            frames = self._compute(samples[: (n_frames - 1) * HOP_LENGTH + N_FFT])
+            if final:
+                # same as `stft[..., :-1]` in log_mel_spectrogram
+                frames = frames[:, :-1]
+            self._mel = torch.cat([self._mel, frames], dim=-1)
+            samples = samples[n_frames * HOP_LENGTH :]
+        self._samples = samples
+
+    def fill(self, end: int) -> int:
+        """
+        Read the stream until at least `end` frames are computed or the stream is exhausted
+
+        Returns
+        -------
+        The number of frames computed so far
+        """
+        while not self.finished and self.num_frames < end:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                tail = torch.zeros(self.padding, device=self.device)
+                self._push(tail, final=True)
+                self.finished = True
+                break
+            if not torch.is_tensor(chunk):
+                chunk = torch.from_numpy(np.ascontiguousarray(chunk))
+            self._push(chunk.to(self.device, torch.float32))
+        return self.num_frames
+
+    def release(self, start: int):
+        """Drop the frames before `start`; they can no longer be requested"""
+        if start > self._offset:
+            drop = min(start - self._offset, self._mel.shape[-1])
+            self._mel = self._mel[:, drop:]
+            self._offset += drop
+
+    def frames(self, start: int, end: int) -> torch.Tensor:
+        """
+        Returns the normalized log-Mel frames in [start, end), reading more audio as needed
+
+        Returns
+        -------
+        torch.Tensor, shape = (n_mels, n_frames)
+            The frames, which may be fewer than requested at the end of the stream
+        """
+        if start < self._offset:
+            raise ValueError(f"Frame {start} has already been released")
+        self.fill(end)
+        log_spec = self._mel[:, start - self._offset : end - self._offset]
+        log_spec = torch.clamp(log_spec, min=self._max - 8.0)
+        return (log_spec + 4.0) / 4.0
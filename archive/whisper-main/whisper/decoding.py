@@ -142,9 +142,15 @@ class Inference:
 
 
 class PyTorchInference(Inference):
-    def __init__(self, model: "Whisper", initial_token_length: int):
+    def __init__(
+        self,
+        model: "Whisper",
+        initial_token_length: int,
+        max_length: Optional[int] = None,
+    ):
         self.model: "Whisper" = model
         self.initial_token_length = initial_token_length
+        self.max_length = max_length
         self.kv_cache = {}
         self.hooks = []
 
@@ -154,7 +160,9 @@ class PyTorchInference(Inference):
 
     def logits(self, tokens: Tensor, audio_features: Tensor) -> Tensor:
         if not self.kv_cache:
-            self.kv_cache, self.hooks = self.model.install_kv_cache_hooks()
+            self.kv_cache, self.hooks = self.model.install_kv_cache_hooks(
+                max_length=self.max_length
+            )
 
         if tokens.shape[-1] > self.initial_token_length:
             # only need to use the last token except in the first forward pass
@@ -171,9 +179,14 @@ class PyTorchInference(Inference):
 
     def rearrange_kv_cache(self, source_indices):
         if source_indices != list(range(len(source_indices))):
+            indices = None
             for module in self.kv_modules:
-                # update the key/value cache to contain the selected sequences
-                self.kv_cache[module] = self.kv_cache[module][source_indices].detach()
+                # update the key/value cache to contain the selected sequences, in place so
+                # that the cached tensors keep pointing into the preallocated buffers
+                cached = self.kv_cache[module]
+                if indices is None:
+                    indices = torch.tensor(source_indices, device=cached.device)
+                cached.copy_(cached.index_select(0, indices))
 
 
 class SequenceRanker:
@@ -312,6 +325,8 @@ class BeamSearchDecoder(TokenDecoder):
         self.patience = patience or 1.0
         self.max_candidates: int = round(beam_size * self.patience)
         self.finished_sequences = None
+        self.finished_logprobs = None
+        self.num_finished = None
 
         assert (
             self.max_candidates > 0
@@ -319,6 +334,8 @@ class BeamSearchDecoder(TokenDecoder):
 
     def reset(self):
         self.finished_sequences = None
+        self.finished_logprobs = None
+        self.num_finished = None
 
     def update(
         self, tokens: Tensor, logits: Tensor, sum_logprobs: Tensor
@@ -328,79 +345,101 @@ class BeamSearchDecoder(TokenDecoder):
 
         n_audio = tokens.shape[0] // self.beam_size
         if self.finished_sequences is None:  # for the first update
-            self.finished_sequences = [{} for _ in range(n_audio)]
-
-        logprobs = F.log_softmax(logits.float(), dim=-1)
-        next_tokens, source_indices, finished_sequences = [], [], []
-        for i in range(n_audio):
-            scores, sources, finished = {}, {}, {}
-
-            # STEP 1: calculate the cumulative log probabilities for possible candidates
-            for j in range(self.beam_size):
-                idx = i * self.beam_size + j
-                prefix = tokens[idx].tolist()
-                for logprob, token in zip(*logprobs[idx].topk(self.beam_size + 1)):
-                    new_logprob = (sum_logprobs[idx] + logprob).item()
-                    sequence = tuple(prefix + [token.item()])
-                    scores[sequence] = new_logprob
-                    sources[sequence] = idx
-
-            # STEP 2: rank the candidates and keep the top beam_size sequences for each audio
-            saved = 0
-            for sequence in sorted(scores, key=scores.get, reverse=True):
-                if sequence[-1] == self.eot:
-                    finished[sequence] = scores[sequence]
-                else:
-                    sum_logprobs[len(next_tokens)] = scores[sequence]
-                    next_tokens.append(sequence)
-                    source_indices.append(sources[sequence])
+            self.finished_sequences = [[] for _ in range(n_audio)]
+            self.finished_logprobs = [[] for _ in range(n_audio)]
+            self.num_finished = torch.zeros(
+                n_audio, dtype=torch.long, device=tokens.device
+            )
 
-                    saved += 1
-                    if saved == self.beam_size:
-                        break
+        device = tokens.device
+        n_candidates = self.beam_size + 1
+        beams = torch.arange(self.beam_size, device=device)
 
-            finished_sequences.append(finished)
+        # STEP 1: calculate the cumulative log probabilities for possible candidates,
+        # which are the top (beam_size + 1) tokens of each beam in the order of the beams
+        logprobs = F.log_softmax(logits.float(), dim=-1)
+        top_logprobs, top_tokens = logprobs.topk(n_candidates)
+        scores = (sum_logprobs[:, None] + top_logprobs).view(n_audio, -1)
+        next_tokens = top_tokens.view(n_audio, -1)
+
+        # beams with the same prefix propose the same sequences; count each sequence once,
+        # at the position of its first occurrence and continuing from the last such beam
+        grouped = tokens.view(n_audio, self.beam_size, -1)
+        same_prefix = (grouped[:, :, None] == grouped[:, None]).all(dim=-1)
+        first_beam = same_prefix.int().argmax(dim=-1)
+        last_beam = self.beam_size - 1 - same_prefix.flip(-1).int().argmax(dim=-1)
+        offsets = torch.arange(n_audio, device=device)[:, None] * self.beam_size
+        valid = (first_beam == beams).repeat_interleave(n_candidates, dim=1)
+        sources = (last_beam + offsets).repeat_interleave(n_candidates, dim=1)
+
+        # STEP 2: rank the candidates and keep the top beam_size sequences for each audio;
+        # the sorts are stable so that ties keep the order of the candidates
+        order = scores.masked_fill(~valid, -np.inf).argsort(
+            dim=-1, descending=True, stable=True
+        )
+        order = order.gather(
+            -1,
+            valid.gather(-1, order).int().argsort(dim=-1, descending=True, stable=True),
+        )
+        scores, next_tokens, sources, valid = (
+            x.gather(-1, order) for x in (scores, next_tokens, sources, valid)
+        )
 
-        tokens = torch.tensor(next_tokens, device=tokens.device)
-        self.inference.rearrange_kv_cache(source_indices)
+        is_eot = next_tokens == self.eot
+        unfinished = valid & ~is_eot
+        # finished sequences count only if ranked above the last of the kept sequences
+        n_unfinished_before = unfinished.cumsum(dim=-1) - unfinished.long()
+        ranked_above = n_unfinished_before < self.beam_size
+        finished = valid & is_eot & ranked_above
+        kept = (
+            (unfinished & ranked_above)
+            .int()
+            .argsort(dim=-1, descending=True, stable=True)[:, : self.beam_size]
+        )
 
-        # add newly finished sequences to self.finished_sequences
-        assert len(self.finished_sequences) == len(finished_sequences)
-        for previously_finished, newly_finished in zip(
-            self.finished_sequences, finished_sequences
-        ):
-            for seq in sorted(newly_finished, key=newly_finished.get, reverse=True):
-                if len(previously_finished) >= self.max_candidates:
-                    break  # the candidate list is full
-                previously_finished[seq] = newly_finished[seq]
+        # add newly finished sequences, in the order of their scores, until the candidate
+        # list of each audio is full
+        capacity = self.max_candidates - self.num_finished
+        accepted = finished & (finished.cumsum(dim=-1) <= capacity[:, None])
+        if accepted.any():
+            audio_indices, positions = accepted.nonzero(as_tuple=True)
+            prefixes = tokens[sources[audio_indices, positions]]
+            sequences = F.pad(prefixes, (0, 1), value=self.eot).cpu()
+            logprobs = scores[audio_indices, positions].tolist()
+            for i, sequence, logprob in zip(
+                audio_indices.tolist(), sequences, logprobs
+            ):
+                self.finished_sequences[i].append(sequence)
+                self.finished_logprobs[i].append(logprob)
+            self.num_finished += accepted.sum(dim=-1)
+
+        source_indices = sources.gather(-1, kept).flatten()
+        sum_logprobs[:] = scores.gather(-1, kept).flatten()
+        tokens = torch.cat(
+            [tokens[source_indices], next_tokens.gather(-1, kept).view(-1, 1)], dim=-1
+        )
+        self.inference.rearrange_kv_cache(source_indices.tolist())
 
         # mark as completed if all audio has enough number of samples
-        completed = all(
-            len(sequences) >= self.max_candidates
-            for sequences in self.finished_sequences
-        )
+        completed = bool((self.num_finished >= self.max_candidates).all())
         return tokens, completed
 
     def finalize(self, preceding_tokens: Tensor, sum_logprobs: Tensor):
         # collect all finished sequences, including patience, and add unfinished ones if not enough
         sum_logprobs = sum_logprobs.cpu()
-        for i, sequences in enumerate(self.finished_sequences):
-            if (
-                len(sequences) < self.beam_size
-            ):  # when not enough sequences are finished
-                for j in list(np.argsort(sum_logprobs[i]))[::-1]:
-                    sequence = preceding_tokens[i, j].tolist() + [self.eot]
-                    sequences[tuple(sequence)] = sum_logprobs[i][j].item()
+        preceding_tokens = F.pad(preceding_tokens, (0, 1), value=self.eot).cpu()
+        for i, (sequences, logprobs) in enumerate(
+            zip(self.finished_sequences, self.finished_logprobs)
+        ):
+            if len(sequences) < self.beam_size:  # when not enough are finished
+                for j in list(np.argsort(sum_logprobs[i].numpy()))[::-1]:
+                    sequences.append(preceding_tokens[i, j])
+                    logprobs.append(sum_logprobs[i][j].item())
                     if len(sequences) >= self.beam_size:
                         break
 
-        tokens: List[List[Tensor]] = [
-            [torch.tensor(seq) for seq in sequences.keys()]
-            for sequences in self.finished_sequences
-        ]
-        sum_logprobs: List[List[float]] = [
-            list(sequences.values()) for sequences in self.finished_sequences
-        ]
+        tokens: List[List[Tensor]] = self.finished_sequences
+        sum_logprobs: List[List[float]] = self.finished_logprobs
         return tokens, sum_logprobs
 
 
@@ -454,55 +493,62 @@ class ApplyTimestampRules(LogitFilter):
         if self.tokenizer.no_timestamps is not None:
             logits[:, self.tokenizer.no_timestamps] = -np.inf
 
-        # timestamps have to appear in pairs, except directly before EOT; mask logits accordingly
-        for k in range(tokens.shape[0]):
-            sampled_tokens = tokens[k, self.sample_begin :]
-            seq = [t for t in sampled_tokens.tolist()]
-            last_was_timestamp = (
-                len(seq) >= 1 and seq[-1] >= self.tokenizer.timestamp_begin
-            )
-            penultimate_was_timestamp = (
-                len(seq) < 2 or seq[-2] >= self.tokenizer.timestamp_begin
-            )
-
-            if last_was_timestamp:
-                if penultimate_was_timestamp:  # has to be non-timestamp
-                    logits[k, self.tokenizer.timestamp_begin :] = -np.inf
-                else:  # cannot be normal text tokens
-                    logits[k, : self.tokenizer.eot] = -np.inf
-
-            timestamps = sampled_tokens[
-                sampled_tokens.ge(self.tokenizer.timestamp_begin)
-            ]
-            if timestamps.numel() > 0:
-                # timestamps shouldn't decrease; forbid timestamp tokens smaller than the last
-                # also force each segment to have a nonzero length, to prevent infinite looping
-                if last_was_timestamp and not penultimate_was_timestamp:
-                    timestamp_last = timestamps[-1]
-                else:
-                    timestamp_last = timestamps[-1] + 1
-                logits[k, self.tokenizer.timestamp_begin : timestamp_last] = -np.inf
+        eot = self.tokenizer.eot
+        timestamp_begin = self.tokenizer.timestamp_begin
 
         if tokens.shape[1] == self.sample_begin:
             # suppress generating non-timestamp tokens at the beginning
-            logits[:, : self.tokenizer.timestamp_begin] = -np.inf
+            logits[:, :timestamp_begin] = -np.inf
 
             # apply the `max_initial_timestamp` option
             if self.max_initial_timestamp_index is not None:
-                last_allowed = (
-                    self.tokenizer.timestamp_begin + self.max_initial_timestamp_index
-                )
+                last_allowed = timestamp_begin + self.max_initial_timestamp_index
                 logits[:, last_allowed + 1 :] = -np.inf
+            return
 
-        # if sum of probability over timestamps is above any other token, sample timestamp
-        logprobs = F.log_softmax(logits.float(), dim=-1)
-        for k in range(tokens.shape[0]):
-            timestamp_logprob = logprobs[k, self.tokenizer.timestamp_begin :].logsumexp(
-                dim=-1
-            )
-            max_text_token_logprob = logprobs[k, : self.tokenizer.timestamp_begin].max()
-            if timestamp_logprob > max_text_token_logprob:
-                logits[k, : self.tokenizer.timestamp_begin] = -np.inf
+        sampled_tokens = tokens[:, self.sample_begin :]
+        is_timestamp = sampled_tokens >= timestamp_begin
+        last_was_timestamp = is_timestamp[:, -1]
+        if sampled_tokens.shape[1] >= 2:
+            penultimate_was_timestamp = is_timestamp[:, -2]
+        else:
+            penultimate_was_timestamp = torch.ones_like(last_was_timestamp)
+
+        # timestamps have to appear in pairs, except directly before EOT: after a pair the
+        # next token has to be non-timestamp, and after a single one it cannot be normal text
+        pair_closed = last_was_timestamp & penultimate_was_timestamp
+        pair_opened = last_was_timestamp & ~penultimate_was_timestamp
+
+        # timestamps shouldn't decrease; forbid timestamp tokens smaller than the last
+        # also force each segment to have a nonzero length, to prevent infinite looping
+        positions = torch.arange(sampled_tokens.shape[1], device=tokens.device)
+        last_index = torch.where(is_timestamp, positions, -1).amax(dim=-1)
+        timestamp_last = sampled_tokens.gather(-1, last_index.clamp(min=0)[:, None])
+        timestamp_end = torch.where(
+            last_index >= 0,
+            timestamp_last[:, 0] + (~pair_opened).long() - timestamp_begin,
+            0,
+        )
+        timestamp_end.masked_fill_(pair_closed, logits.shape[-1])
+
+        timestamp_logits = logits[:, timestamp_begin:]
+        offsets = torch.arange(timestamp_logits.shape[-1], device=logits.device)
+        timestamp_logits.masked_fill_(offsets < timestamp_end[:, None], -np.inf)
+
+        # if sum of probability over timestamps is above any other token, sample timestamp;
+        # both sides share the normalizer of the log-softmax, so compare the logits directly
+        timestamp_logit = timestamp_logits.float().logsumexp(dim=-1)
+        max_special_token_logit = logits[:, eot:timestamp_begin].amax(dim=-1).float()
+        max_text_token_logit = torch.where(
+            pair_opened,
+            max_special_token_logit,
+            logits[:, :eot].amax(dim=-1).float().maximum(max_special_token_logit),
+        )
+        text_suppressed = timestamp_logit > max_text_token_logit
+
+        # mask the normal text tokens with a single pass over the vocabulary
+        logits[:, :eot].masked_fill_((pair_opened | text_suppressed)[:, None], -np.inf)
+        logits[:, eot:timestamp_begin].masked_fill_(text_suppressed[:, None], -np.inf)
 
 
 class DecodingTask:
@@ -537,7 +583,11 @@ class DecodingTask:
         self.sot_index: int = self.initial_tokens.index(tokenizer.sot)
 
         # inference: implements the forward pass through the decoder, including kv caching
-        self.inference = PyTorchInference(model, len(self.initial_tokens))
+        self.inference = PyTorchInference(
+            model,
+            len(self.initial_tokens),
+            max_length=len(self.initial_tokens) + self.sample_len,
+        )
 
         # sequence ranker: implements how to rank a group of sampled sequences
         self.sequence_ranker = MaximumLikelihoodRanker(options.length_penalty)
@@ -732,6 +782,9 @@ class DecodingTask:
 
         # repeat text tensors by the group size, for beam search or best-of-n sampling
         tokens = tokens.repeat_interleave(self.n_group, dim=0).to(audio_features.device)
+        if n_audio > 1:
+            # a single audio is broadcast over its group in the cross attention
+            audio_features = audio_features.repeat_interleave(self.n_group, dim=0)
 
         # call the main sampling loop
         tokens, sum_logprobs, no_speech_probs = self._main_loop(audio_features, tokens)
@@ -12,6 +12,8 @@ from torch import Tensor, nn
 from .decoding import decode as decode_function
 from .decoding import detect_language as detect_language_function
 from .transcribe import transcribe as transcribe_function
+from .transcribe import transcribe_batched as transcribe_batched_function
+from .transcribe import transcribe_iter as transcribe_iter_function
 
 try:
     from torch.nn.functional import scaled_dot_product_attention
@@ -178,7 +180,11 @@ class AudioEncoder(nn.Module):
         super().__init__()
         self.conv1 = Conv1d(n_mels, n_state, kernel_size=3, padding=1)
         self.conv2 = Conv1d(n_state, n_state, kernel_size=3, stride=2, padding=1)
-        self.register_buffer("positional_embedding", sinusoids(n_ctx, n_state))
+        # computed on the CPU even when the model is built on the meta device by `load_model`,
+        # where these ops would go through a much slower decomposition
+        with torch.device("cpu"):
+            positional_embedding = sinusoids(n_ctx, n_state)
+        self.register_buffer("positional_embedding", positional_embedding)
 
         self.blocks: Iterable[ResidualAttentionBlock] = nn.ModuleList(
             [ResidualAttentionBlock(n_state, n_head) for _ in range(n_layer)]
@@ -221,7 +227,10 @@ class TextDecoder(nn.Module):
         )
         self.ln = LayerNorm(n_state)
 
-        mask = torch.empty(n_ctx, n_ctx).fill_(-np.inf).triu_(1)
+        # buffers that are not saved in checkpoints are made on the CPU, even when the model is
+        # built on the meta device by `load_model`
+        with torch.device("cpu"):
+            mask = torch.empty(n_ctx, n_ctx).fill_(-np.inf).triu_(1)
         self.register_buffer("mask", mask, persistent=False)
 
     def forward(self, x: Tensor, xa: Tensor, kv_cache: Optional[dict] = None):
@@ -269,11 +278,13 @@ class Whisper(nn.Module):
         )
         # use the last half among the decoder layers for time alignment by default;
         # to use a specific set of heads, see `set_alignment_heads()` below.
-        all_heads = torch.zeros(
-            self.dims.n_text_layer, self.dims.n_text_head, dtype=torch.bool
-        )
-        all_heads[self.dims.n_text_layer // 2 :] = True
-        self.register_buffer("alignment_heads", all_heads.to_sparse(), persistent=False)
+        with torch.device("cpu"):
+            all_heads = torch.zeros(
+                self.dims.n_text_layer, self.dims.n_text_head, dtype=torch.bool
+            )
+            all_heads[self.dims.n_text_layer // 2 :] = True
+            all_heads = all_heads.to_sparse()
+        self.register_buffer("alignment_heads", all_heads, persistent=False)
 
     def set_alignment_heads(self, dump: bytes):
         array = np.frombuffer(
@@ -307,13 +318,27 @@ class Whisper(nn.Module):
     def num_languages(self):
         return self.dims.n_vocab - 51765 - int(self.is_multilingual)
 
-    def install_kv_cache_hooks(self, cache: Optional[dict] = None):
+    def install_kv_cache_hooks(
+        self, cache: Optional[dict] = None, max_length: Optional[int] = None
+    ):
         """
         The `MultiHeadAttention` module optionally accepts `kv_cache` which stores the key and value
         tensors calculated for the previous positions. This method returns a dictionary that stores
         all caches, and the necessary hooks for the key and value projection modules that save the
         intermediate tensors to be reused during later calculations.
 
+        The self-attention keys and values are written in place into buffers preallocated for
+        `max_length` positions, and the cache holds views of the filled part of each buffer, so
+        that the length of a view is the number of positions decoded so far.
+
+        Parameters
+        ----------
+        cache : dict
+            Initial contents of the cache
+        max_length : int
+            The number of positions to preallocate; defaults to `n_text_ctx`. The buffers grow
+            if more positions are decoded.
+
         Returns
         -------
         cache : Dict[nn.Module, torch.Tensor]
@@ -322,14 +347,34 @@ class Whisper(nn.Module):
             List of PyTorch RemovableHandle objects to stop the hooks to be called
         """
         cache = {**cache} if cache is not None else {}
+        max_length = min(max_length or self.dims.n_text_ctx, self.dims.n_text_ctx)
+        buffers = {}
         hooks = []
 
         def save_to_cache(module, _, output):
-            if module not in cache or output.shape[1] > self.dims.n_text_ctx:
-                # save as-is, for the first token or cross attention
+            if output.shape[1] > self.dims.n_text_ctx:
+                # save as-is for cross attention
                 cache[module] = output
-            else:
-                cache[module] = torch.cat([cache[module], output], dim=1).detach()
+                return output
+
+            output = output.detach()
+            length = cache[module].shape[1] if module in cache else 0
+            end = length + output.shape[1]
+            buffer = buffers.get(module)
+            if (
+                buffer is None
+                or buffer.shape[0] != output.shape[0]
+                or buffer.shape[1] < end
+            ):
+                buffer = output.new_empty(
+                    output.shape[0], max(max_length, end), output.shape[2]
+                )
+                if length > 0:
+                    buffer[:, :length] = cache[module]
+                buffers[module] = buffer
+
+            buffer[:, length:end] = output
+            cache[module] = buffer[:, :end]
             return cache[module]
 
         def install_hooks(layer: nn.Module):
@@ -342,4 +387,6 @@ class Whisper(nn.Module):
 
     detect_language = detect_language_function
     transcribe = transcribe_function
+    transcribe_batched = transcribe_batched_function
+    transcribe_iter = transcribe_iter_function
     decode = decode_function
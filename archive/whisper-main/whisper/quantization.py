@@ -0,0 +1,45 @@
+import torch
+from torch import nn
+from torch.ao.nn.quantized.dynamic import Linear as DynamicQuantizedLinear
+from torch.ao.quantization.observer import PerChannelMinMaxObserver
+
+
+def quantize_linear(linear: nn.Linear) -> DynamicQuantizedLinear:
+    """
+    A copy of `linear` with int8 weights, quantized symmetrically per output channel, whose
+    activations are quantized on the fly. A layer on the meta device gives an empty layer of
+    the same shape, whose weights are set by `load_state_dict`.
+    """
+    bias = linear.bias is not None
+    quantized = DynamicQuantizedLinear(
+        linear.in_features, linear.out_features, bias_=bias, dtype=torch.qint8
+    )
+    if linear.weight.is_meta:
+        return quantized
+
+    weight = linear.weight.detach().float().cpu()
+    observer = PerChannelMinMaxObserver(
+        ch_axis=0, dtype=torch.qint8, qscheme=torch.per_channel_symmetric
+    )
+    observer(weight)
+    scales, zero_points = observer.calculate_qparams()
+    weight = torch.quantize_per_channel(
+        weight, scales.double(), zero_points.long(), 0, torch.qint8
+    )
+    quantized.set_weight_bias(
+        weight, linear.bias.detach().float().cpu() if bias else None
+    )
+    return quantized
+
+
+def quantize_dynamic(model: nn.Module) -> nn.Module:
+    """
+    Replace every `nn.Linear` of `model` (including whisper's fp16-aware subclass, which
+    `torch.ao.quantization.quantize_dynamic` does not match) by a dynamically quantized int8
+    layer, in place. The quantized layers only run on CPU.
+    """
+    for module in list(model.modules()):
+        for name, child in list(module.named_children()):
+            if isinstance(child, nn.Linear):
+                setattr(module, name, quantize_linear(child))
+    return model
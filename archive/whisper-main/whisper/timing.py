@@ -1,8 +1,11 @@
 import itertools
+import math
+import os
 import subprocess
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import TYPE_CHECKING, List
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
 
 import numba
 import numpy as np
@@ -138,7 +141,132 @@ def dtw_cuda(x, BLOCK_SIZE=1024):
     return backtrace(trace.cpu().numpy())
 
 
-def dtw(x: torch.Tensor) -> np.ndarray:
+@numba.jit(nopython=True, nogil=True)
+def dtw_wavefront_kernel(x: np.ndarray, lower: np.ndarray, upper: np.ndarray):
+    """
+    Fill the DTW cost matrix one anti-diagonal i + j = d at a time, keeping only the last three
+    diagonals, and return the steps as `trace[d, i]`. The cells of a diagonal do not depend on
+    each other, and with float32 costs the chosen steps are the same as in `dtw_cpu`.
+
+    Row i is only searched between the columns `lower[i]` and `upper[i]`, which must be
+    non-decreasing and connected, as made by `normalize_band`.
+    """
+    N, M = x.shape
+    inf = np.float32(np.inf)
+    prev2 = np.full(N + 1, inf, dtype=np.float32)
+    prev1 = np.full(N + 1, inf, dtype=np.float32)
+    cur = np.full(N + 1, inf, dtype=np.float32)
+    trace = np.full((N + M + 1, N + 1), 2, dtype=np.int8)
+
+    prev2[0] = 0
+    # the range of rows written in each buffer, which is reset before it is reused
+    lo2, hi2, lo1, hi1, lo0, hi0 = 0, 0, 1, 0, 1, 0
+    # the first row whose band reaches the diagonal, and the last row whose band has started
+    first, last = 1, 0
+    for d in range(2, N + M + 1):
+        while first <= N and d - first - 1 > upper[first - 1]:
+            first += 1
+        while last < N and d - last - 2 >= lower[last]:
+            last += 1
+        lo = max(first, d - M)
+        hi = min(last, d - 1)
+
+        cur[lo0 : hi0 + 1] = inf
+        for i in range(lo, hi + 1):
+            c0 = prev2[i - 1]
+            c1 = prev1[i - 1]
+            c2 = prev1[i]
+
+            # same tie-breaking as dtw_cpu
+            if c0 < c1 and c0 < c2:
+                c, t = c0, 0
+            elif c1 < c0 and c1 < c2:
+                c, t = c1, 1
+            else:
+                c, t = c2, 2
+
+            cur[i] = x[i - 1, d - i - 1] + c
+            trace[d, i] = t
+
+        prev2, prev1, cur = prev1, cur, prev2
+        lo0, hi0, lo2, hi2, lo1, hi1 = lo2, hi2, lo1, hi1, lo, hi
+
+    return trace
+
+
+@numba.jit(nopython=True, nogil=True)
+def backtrace_skewed(trace: np.ndarray, N: int, M: int):
+    """`backtrace` for the trace of `dtw_wavefront_kernel`, indexed by (i + j, i)"""
+    i = N
+    j = M
+
+    result = []
+    while i > 0 or j > 0:
+        result.append((i - 1, j - 1))
+
+        if i == 0:
+            t = 2
+        elif j == 0:
+            t = 1
+        else:
+            t = trace[i + j, i]
+
+        if t == 0:
+            i -= 1
+            j -= 1
+        elif t == 1:
+            i -= 1
+        else:
+            j -= 1
+
+    result = np.array(result)
+    return result[::-1, :].T
+
+
+Band = Tuple[np.ndarray, np.ndarray]
+
+
+def normalize_band(lower: Sequence[int], upper: Sequence[int], n_columns: int) -> Band:
+    """
+    Turn per-row column limits (inclusive) into a band that always contains a warping path:
+    both limits are made non-decreasing and clipped to the matrix, the first row starts at
+    column 0, the last row ends at the last column, and each row reaches the next one.
+    """
+    lower = np.maximum.accumulate(np.asarray(lower, dtype=np.int64))
+    upper = np.maximum.accumulate(np.asarray(upper, dtype=np.int64))
+    lower = np.clip(lower, 0, n_columns - 1)
+    upper = np.clip(upper, 0, n_columns - 1)
+    lower[0] = 0
+    upper[-1] = n_columns - 1
+    lower = np.minimum(lower, upper)
+    upper[:-1] = np.maximum(upper[:-1], lower[1:] - 1)
+    return lower, upper
+
+
+def dtw_wavefront(x: np.ndarray, band: Optional[Band] = None) -> np.ndarray:
+    """
+    The CPU implementation used by `dtw`, which gives the same path as `dtw_cpu` for a float32
+    matrix. If `band` is given as the (lower, upper) column limits of each row, the search is
+    restricted to those cells (a Sakoe-Chiba band), which only costs time in proportion to them.
+    """
+    N, M = x.shape
+    if band is None:
+        lower = np.zeros(N, dtype=np.int64)
+        upper = np.full(N, M - 1, dtype=np.int64)
+    elif len(band[0]) != N or len(band[1]) != N:
+        raise ValueError(f"The band must have one entry per row, got {len(band[0])}")
+    else:
+        lower, upper = normalize_band(band[0], band[1], M)
+
+    x = np.ascontiguousarray(x, dtype=np.float32)
+    return backtrace_skewed(dtw_wavefront_kernel(x, lower, upper), N, M)
+
+
+def dtw(x: torch.Tensor, band: Optional[Band] = None) -> np.ndarray:
+    """
+    Find the monotonic path of the lowest total cost through `x`, as (row, column) indices.
+    The band only restricts the search on CPU; the CUDA kernel always searches the whole matrix.
+    """
     if x.is_cuda:
         try:
             return dtw_cuda(x)
@@ -148,7 +276,31 @@ def dtw(x: torch.Tensor) -> np.ndarray:
                 "falling back to a slower DTW implementation..."
             )
 
-    return dtw_cpu(x.double().cpu().numpy())
+    return dtw_wavefront(x.float().cpu().numpy(), band)
+
+
+def dtw_batch(
+    xs: List[torch.Tensor],
+    bands: Optional[List[Optional[Band]]] = None,
+    num_workers: Optional[int] = None,
+) -> List[np.ndarray]:
+    """
+    Run `dtw` on several matrices. On CPU they are aligned in a thread pool, since each search
+    is sequential along the diagonals but the numba kernel releases the GIL.
+    """
+    if bands is None:
+        bands = [None] * len(xs)
+
+    if any(x.is_cuda for x in xs):
+        return [dtw(x, band) for x, band in zip(xs, bands)]
+
+    matrices = [x.float().numpy() for x in xs]
+    num_workers = min(num_workers or os.cpu_count() or 1, len(xs))
+    if num_workers <= 1:
+        return [dtw_wavefront(x, band) for x, band in zip(matrices, bands)]
+
+    with ThreadPoolExecutor(num_workers) as executor:
+        return list(executor.map(dtw_wavefront, matrices, bands))
 
 
 @dataclass
@@ -160,60 +312,96 @@ class WordTiming:
     probability: float
 
 
-def find_alignment(
+def alignment_matrices(
     model: "Whisper",
     tokenizer: Tokenizer,
-    text_tokens: List[int],
-    mel: torch.Tensor,
-    num_frames: int,
+    text_tokens: List[List[int]],
+    audio_features: torch.Tensor,
+    num_frames: List[int],
     *,
     medfilt_width: int = 7,
     qk_scale: float = 1.0,
-) -> List[WordTiming]:
-    if len(text_tokens) == 0:
-        return []
-
+) -> List[Tuple[torch.Tensor, List[float]]]:
+    """
+    For each window, the (tokens x frames) matrix of the alignment heads' attention weights
+    searched by `dtw`, whose first row is <|notimestamps|>, and the probability of each text
+    token. All windows go through one teacher-forced decoder pass on their audio features,
+    and only the attention weights of the alignment heads are computed.
+    """
+    sequences = [
+        [*tokenizer.sot_sequence, tokenizer.no_timestamps, *tokens, tokenizer.eot]
+        for tokens in text_tokens
+    ]
+    # the attention is causal, so padding at the end does not change the other positions
+    length = max(map(len, sequences))
     tokens = torch.tensor(
         [
-            *tokenizer.sot_sequence,
-            tokenizer.no_timestamps,
-            *text_tokens,
-            tokenizer.eot,
+            sequence + [tokenizer.eot] * (length - len(sequence))
+            for sequence in sequences
+        ]
+    ).to(audio_features.device)
+
+    # install hooks on the cross attention layers with alignment heads, to get their queries and keys
+    alignment_heads = model.alignment_heads.indices().T.tolist()
+    layers = sorted({layer for layer, _ in alignment_heads})
+    queries, keys = {}, {}
+    hooks = []
+    for layer in layers:
+        cross_attn = model.decoder.blocks[layer].cross_attn
+        hooks += [
+            cross_attn.query.register_forward_hook(
+                lambda _, ins, outs, index=layer: queries.__setitem__(index, outs)
+            ),
+            cross_attn.key.register_forward_hook(
+                lambda _, ins, outs, index=layer: keys.__setitem__(index, outs)
+            ),
         ]
-    ).to(model.device)
-
-    # install hooks on the cross attention layers to retrieve the attention weights
-    QKs = [None] * model.dims.n_text_layer
-    hooks = [
-        block.cross_attn.register_forward_hook(
-            lambda _, ins, outs, index=i: QKs.__setitem__(index, outs[-1][0])
-        )
-        for i, block in enumerate(model.decoder.blocks)
-    ]
-
-    from .model import disable_sdpa
-
-    with torch.no_grad(), disable_sdpa():
-        logits = model(mel.unsqueeze(0), tokens.unsqueeze(0))[0]
-        sampled_logits = logits[len(tokenizer.sot_sequence) :, : tokenizer.eot]
-        token_probs = sampled_logits.softmax(dim=-1)
-        text_token_probs = token_probs[np.arange(len(text_tokens)), text_tokens]
-        text_token_probs = text_token_probs.tolist()
-
-    for hook in hooks:
-        hook.remove()
-
-    # heads * tokens * frames
-    weights = torch.stack([QKs[_l][_h] for _l, _h in model.alignment_heads.indices().T])
-    weights = weights[:, :, : num_frames // 2]
-    weights = (weights * qk_scale).softmax(dim=-1)
-    std, mean = torch.std_mean(weights, dim=-2, keepdim=True, unbiased=False)
-    weights = (weights - mean) / std
-    weights = median_filter(weights, medfilt_width)
 
-    matrix = weights.mean(axis=0)
-    matrix = matrix[len(tokenizer.sot_sequence) : -1]
-    text_indices, time_indices = dtw(-matrix)
+    try:
+        with torch.no_grad():
+            logits = model.decoder(tokens, audio_features)
+    finally:
+        for hook in hooks:
+            hook.remove()
+
+    # batch * heads * tokens * frames, computed as in `MultiHeadAttention.qkv_attention`
+    n_head = model.dims.n_text_head
+    scale = (model.dims.n_text_state // n_head) ** -0.25
+    weights = []
+    for layer, head in alignment_heads:
+        q = queries[layer].view(*tokens.shape, n_head, -1)[:, :, head]
+        k = keys[layer].view(*audio_features.shape[:2], n_head, -1)[:, :, head]
+        weights.append(((q * scale) @ (k * scale).transpose(-1, -2)).float())
+    weights = torch.stack(weights, dim=1)
+
+    results = []
+    for i, (sequence, frames) in enumerate(zip(sequences, num_frames)):
+        n_text = len(text_tokens[i])
+        sampled_logits = logits[i, len(tokenizer.sot_sequence) :, : tokenizer.eot]
+        token_probs = sampled_logits[:n_text].float().softmax(dim=-1)
+        text_token_probs = token_probs[np.arange(n_text), text_tokens[i]].tolist()
+
+        window_weights = weights[i, :, : len(sequence), : frames // 2]
+        window_weights = (window_weights * qk_scale).softmax(dim=-1)
+        std, mean = torch.std_mean(window_weights, dim=-2, keepdim=True, unbiased=False)
+        window_weights = (window_weights - mean) / std
+        window_weights = median_filter(window_weights, medfilt_width)
+
+        matrix = window_weights.mean(axis=0)
+        matrix = matrix[len(tokenizer.sot_sequence) : -1]
+        results.append((matrix, text_token_probs))
+
+    return results
+
+
+def word_timings(
+    tokenizer: Tokenizer,
+    text_tokens: List[int],
+    text_token_probs: List[float],
+    path: np.ndarray,
+) -> List[WordTiming]:
+    """Split the DTW path through the alignment matrix into the timing of each word"""
+    text_indices, time_indices = path
 
     words, word_tokens = tokenizer.split_to_word_tokens(text_tokens + [tokenizer.eot])
     if len(word_tokens) <= 1:
@@ -242,6 +430,112 @@ def find_alignment(
     ]
 
 
+def find_alignment(
+    model: "Whisper",
+    tokenizer: Tokenizer,
+    text_tokens: List[int],
+    mel: torch.Tensor,
+    num_frames: int,
+    *,
+    medfilt_width: int = 7,
+    qk_scale: float = 1.0,
+    band: Optional[Band] = None,
+    audio_features: Optional[torch.Tensor] = None,
+) -> List[WordTiming]:
+    if len(text_tokens) == 0:
+        return []
+
+    if audio_features is None:
+        with torch.no_grad():
+            audio_features = model.embed_audio(mel.unsqueeze(0))[0]
+
+    [(matrix, text_token_probs)] = alignment_matrices(
+        model,
+        tokenizer,
+        [text_tokens],
+        audio_features.unsqueeze(0),
+        [num_frames],
+        medfilt_width=medfilt_width,
+        qk_scale=qk_scale,
+    )
+    path = dtw(-matrix, band)
+    return word_timings(tokenizer, text_tokens, text_token_probs, path)
+
+
+def segment_text_tokens(segments: List[dict], tokenizer: Tokenizer) -> List[List[int]]:
+    return [
+        [token for token in segment["tokens"] if token < tokenizer.eot]
+        for segment in segments
+    ]
+
+
+def alignment_band(
+    segments: List[dict], tokenizer: Tokenizer, num_frames: int, margin: float
+) -> Band:
+    """
+    A Sakoe-Chiba band for the alignment of a window, which only lets the text tokens of each
+    segment be matched with the frames within `margin` seconds of the segment's timestamps
+    """
+    time_offset = segments[0]["seek"] * HOP_LENGTH / SAMPLE_RATE
+    lower, upper = [], []
+    for segment, tokens in zip(segments, segment_text_tokens(segments, tokenizer)):
+        start = (segment["start"] - time_offset - margin) * TOKENS_PER_SECOND
+        end = (segment["end"] - time_offset + margin) * TOKENS_PER_SECOND
+        lower.extend([math.floor(start)] * len(tokens))
+        upper.extend([math.ceil(end)] * len(tokens))
+
+    # <|notimestamps|> takes the frames before the first word
+    lower.insert(0, 0)
+    upper.insert(0, upper[0] if upper else 0)
+    return normalize_band(lower, upper, num_frames // 2)
+
+
+def find_alignments(
+    model: "Whisper",
+    tokenizer: Tokenizer,
+    windows: List[Tuple[List[dict], torch.Tensor, int]],
+    *,
+    band_margin: Optional[float] = None,
+    **kwargs,
+) -> List[List[WordTiming]]:
+    """
+    `find_alignment` for the segments of several windows, given as (segments, audio_features,
+    num_frames), where `audio_features` is the encoder output already computed for decoding.
+    The windows share one decoder pass, and their DTW searches are run together by `dtw_batch`.
+    With `band_margin`, each search is limited to a band of that many seconds around the
+    segment timestamps.
+    """
+    alignments = [[] for _ in windows]
+    indices, text_tokens = [], []
+    for index, (segments, _, _) in enumerate(windows):
+        tokens = itertools.chain.from_iterable(segment_text_tokens(segments, tokenizer))
+        if tokens := list(tokens):
+            indices.append(index)
+            text_tokens.append(tokens)
+    if len(indices) == 0:
+        return alignments
+
+    audio_features = torch.stack([windows[i][1] for i in indices])
+    num_frames = [windows[i][2] for i in indices]
+    matrices = alignment_matrices(
+        model, tokenizer, text_tokens, audio_features, num_frames, **kwargs
+    )
+
+    bands = [None] * len(indices)
+    if band_margin is not None:
+        bands = [
+            alignment_band(windows[i][0], tokenizer, windows[i][2], band_margin)
+            for i in indices
+        ]
+
+    paths = dtw_batch([-matrix for matrix, _ in matrices], bands)
+    for index, tokens, (_, text_token_probs), path in zip(
+        indices, text_tokens, matrices, paths
+    ):
+        alignments[index] = word_timings(tokenizer, tokens, text_token_probs, path)
+    return alignments
+
+
 def merge_punctuations(alignment: List[WordTiming], prepended: str, appended: str):
     # merge prepended punctuations
     i = len(alignment) - 2
@@ -281,23 +575,30 @@ def add_word_timestamps(
     segments: List[dict],
     model: "Whisper",
     tokenizer: Tokenizer,
-    mel: torch.Tensor,
+    mel: Optional[torch.Tensor] = None,
     num_frames: int,
     prepend_punctuations: str = "\"'“¿([{-",
     append_punctuations: str = "\"'.。,，!！?？:：”)]}、",
     last_speech_timestamp: float,
+    band_margin: Optional[float] = None,
+    audio_features: Optional[torch.Tensor] = None,
+    alignment: Optional[List[WordTiming]] = None,
     **kwargs,
 ):
     if len(segments) == 0:
         return
 
-    text_tokens_per_segment = [
-        [token for token in segment["tokens"] if token < tokenizer.eot]
-        for segment in segments
-    ]
+    text_tokens_per_segment = segment_text_tokens(segments, tokenizer)
+
+    if alignment is None:
+        if audio_features is None:
+            with torch.no_grad():
+                audio_features = model.embed_audio(mel.unsqueeze(0))[0]
+        windows = [(segments, audio_features, num_frames)]
+        alignment = find_alignments(
+            model, tokenizer, windows, band_margin=band_margin, **kwargs
+        )[0]
 
-    text_tokens = list(itertools.chain.from_iterable(text_tokens_per_segment))
-    alignment = find_alignment(model, tokenizer, text_tokens, mel, num_frames, **kwargs)
     word_durations = np.array([t.end - t.start for t in alignment])
     word_durations = word_durations[word_durations.nonzero()]
     median_duration = np.median(word_durations) if len(word_durations) > 0 else 0.0
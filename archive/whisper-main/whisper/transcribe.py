@@ -1,8 +1,23 @@
 import argparse
+import contextlib
+import itertools
 import os
+import queue
+import threading
+import time
 import traceback
 import warnings
-from typing import TYPE_CHECKING, List, Optional, Tuple, Union
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    ContextManager,
+    Generator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import numpy as np
 import torch
@@ -14,11 +29,12 @@ from .audio import (
     N_FRAMES,
     N_SAMPLES,
     SAMPLE_RATE,
+    LogMelStream,
     log_mel_spectrogram,
     pad_or_trim,
 )
 from .decoding import DecodingOptions, DecodingResult
-from .timing import add_word_timestamps
+from .timing import add_word_timestamps, find_alignments
 from .tokenizer import LANGUAGES, TO_LANGUAGE_CODE, get_tokenizer
 from .utils import (
     exact_div,
@@ -30,14 +46,107 @@ from .utils import (
     optional_int,
     str2bool,
 )
+from .vad import SpeechDetector, VadOptions
 
 if TYPE_CHECKING:
     from .model import Whisper
 
 
+def needs_fallback(
+    result: DecodingResult,
+    compression_ratio_threshold: Optional[float],
+    logprob_threshold: Optional[float],
+    no_speech_threshold: Optional[float],
+) -> bool:
+    """Whether the decoding should be retried at the next temperature"""
+    failed = False
+    if (
+        compression_ratio_threshold is not None
+        and result.compression_ratio > compression_ratio_threshold
+    ):
+        failed = True  # too repetitive
+    if logprob_threshold is not None and result.avg_logprob < logprob_threshold:
+        failed = True  # average log probability is too low
+    if (
+        no_speech_threshold is not None
+        and result.no_speech_prob > no_speech_threshold
+        and logprob_threshold is not None
+        and result.avg_logprob < logprob_threshold
+    ):
+        failed = False  # silence
+    return failed
+
+
+def should_skip(
+    result: DecodingResult,
+    logprob_threshold: Optional[float],
+    no_speech_threshold: Optional[float],
+) -> bool:
+    """Whether the window is considered silent and its output discarded"""
+    if no_speech_threshold is None:
+        return False
+    # no voice activity check
+    skip = result.no_speech_prob > no_speech_threshold
+    if logprob_threshold is not None and result.avg_logprob > logprob_threshold:
+        # don't skip if the logprob is high enough, despite the no_speech_prob
+        skip = False
+    return skip
+
+
+def make_speech_detector(vad: Union[bool, VadOptions]) -> Optional[SpeechDetector]:
+    """Create the voice activity detector for the `vad` argument of `transcribe()`"""
+    if isinstance(vad, VadOptions):
+        return SpeechDetector(vad)
+    return SpeechDetector() if vad else None
+
+
+@dataclass(frozen=True)
+class TranscriptionProgress:
+    """The progress of `transcribe()`, passed to its `progress` callback after each window"""
+
+    frames: int  # Mel frames of the audio processed so far, including the skipped ones
+    total_frames: Optional[int]  # None while the length of a stream is not known yet
+    segments: int  # segments emitted so far
+    elapsed: float  # seconds since the transcription started
+
+    @property
+    def fraction(self) -> Optional[float]:
+        if not self.total_frames:
+            return None
+        return min(self.frames / self.total_frames, 1.0)
+
+    @property
+    def realtime_factor(self) -> Optional[float]:
+        """Processing time per second of audio"""
+        if self.frames <= 0:
+            return None
+        return self.elapsed / (self.frames / FRAMES_PER_SECOND)
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Estimated seconds until the end, at the current real-time factor"""
+        if self.total_frames is None or self.realtime_factor is None:
+            return None
+        remaining = max(self.total_frames - self.frames, 0) / FRAMES_PER_SECOND
+        return remaining * self.realtime_factor
+
+
+def no_span(name: str, **attributes) -> ContextManager:
+    """The default `span` of `transcribe()`, which does nothing"""
+    return contextlib.nullcontext()
+
+
+def vad_report(skipped_frames: int, content_frames: int) -> dict:
+    """The amount of audio skipped by the voice activity detector, in seconds"""
+    return dict(
+        skipped=round(skipped_frames / FRAMES_PER_SECOND, 2),
+        duration=round(content_frames / FRAMES_PER_SECOND, 2),
+    )
+
+
 def transcribe(
     model: "Whisper",
-    audio: Union[str, np.ndarray, torch.Tensor],
+    audio: Union[str, np.ndarray, torch.Tensor, LogMelStream],
     *,
     verbose: Optional[bool] = None,
     temperature: Union[float, Tuple[float, ...]] = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
@@ -52,6 +161,11 @@ def transcribe(
     append_punctuations: str = "\"'.。,，!！?？:：”)]}、",
     clip_timestamps: Union[str, List[float]] = "0",
     hallucination_silence_threshold: Optional[float] = None,
+    alignment_band: Optional[float] = None,
+    vad: Union[bool, VadOptions] = False,
+    span: Callable[..., ContextManager] = no_span,
+    progress: Optional[Callable[[TranscriptionProgress], None]] = None,
+    on_segments: Optional[Callable[[List[dict]], None]] = None,
     **decode_options,
 ):
     """
@@ -62,8 +176,10 @@ def transcribe(
     model: Whisper
         The Whisper model instance
 
-    audio: Union[str, np.ndarray, torch.Tensor]
-        The path to the audio file to open, or the audio waveform
+    audio: Union[str, np.ndarray, torch.Tensor, LogMelStream]
+        The path to the audio file to open, the audio waveform, or a `LogMelStream` created
+        with `padding=N_SAMPLES`, which computes the Mel frames incrementally as the window
+        advances so that memory usage does not grow with the length of the audio
 
     verbose: bool
         Whether to display the text being decoded to the console. If True, displays all the details,
@@ -119,11 +235,39 @@ def transcribe(
         When word_timestamps is True, skip silent periods longer than this threshold (in seconds)
         when a possible hallucination is detected
 
+    alignment_band: Optional[float]
+        When word_timestamps is True, only match the words of each segment with the audio within
+        this many seconds of the segment's timestamps (a Sakoe-Chiba band), which makes the
+        alignment faster. None searches the whole window.
+
+    vad: Union[bool, VadOptions]
+        If True or a `VadOptions` instance, run an energy-based voice activity detector on the Mel
+        frames and move the start of each window past the leading silence, so that silent stretches
+        never reach the encoder. The skipped duration is reported as `result["vad"]`.
+
+    span: Callable[..., ContextManager]
+        Called as `span(name, **attributes)` around each stage of the transcription, e.g. to time
+        them: "mel" when computing Mel frames, "detect_language", "encode" once per window,
+        "decode" once per window and temperature tried (with the `seek` of the window and the
+        `temperature`), and "alignment" for the word-level timestamps of a window.
+
+    progress: Optional[Callable[[TranscriptionProgress], None]]
+        Called after each window with the number of frames processed and the total, the number
+        of segments emitted so far and the elapsed time, from which the real-time factor and the
+        remaining time are estimated; the last call reports the whole audio as processed.
+
+    on_segments: Optional[Callable[[List[dict]], None]]
+        Called with the segments of each window as soon as they are final, in order, e.g. to
+        write or display the transcript while the rest of the audio is being decoded. The
+        segments are the same dictionaries as in the returned "segments".
+
     Returns
     -------
     A dictionary containing the resulting text ("text") and segment-level details ("segments"), and
     the spoken language ("language"), which is detected when `decode_options["language"]` is None.
+    When `vad` is enabled, "vad" holds the skipped and total duration in seconds.
     """
+    start_time = time.perf_counter()
     dtype = torch.float16 if decode_options.get("fp16", True) else torch.float32
     if model.device == torch.device("cpu"):
         if torch.cuda.is_available():
@@ -135,9 +279,33 @@ def transcribe(
     if dtype == torch.float32:
         decode_options["fp16"] = False
 
-    # Pad 30-seconds of silence to the input audio, for slicing
-    mel = log_mel_spectrogram(audio, model.dims.n_mels, padding=N_SAMPLES)
-    content_frames = mel.shape[-1] - N_FRAMES
+    if isinstance(audio, LogMelStream):
+        if audio.n_mels != model.dims.n_mels or audio.padding != N_SAMPLES:
+            raise ValueError(
+                f"LogMelStream must use n_mels={model.dims.n_mels} and padding={N_SAMPLES}"
+            )
+        mel_stream = audio
+        mel = None
+    else:
+        mel_stream = None
+        # Pad 30-seconds of silence to the input audio, for slicing
+        with span("mel"):
+            mel = log_mel_spectrogram(audio, model.dims.n_mels, padding=N_SAMPLES)
+
+    def get_mel(start: int, end: int) -> torch.Tensor:
+        if mel_stream is None:
+            return mel[:, start:end]
+        with span("mel"):
+            return mel_stream.frames(start, end)
+
+    def count_content_frames(seek: int) -> int:
+        if mel_stream is None:
+            return mel.shape[-1] - N_FRAMES
+        # keep one window of lookahead; until the stream is exhausted this is a lower bound
+        with span("mel"):
+            return mel_stream.fill(seek + 2 * N_FRAMES) - N_FRAMES
+
+    content_frames = count_content_frames(0)
     content_duration = float(content_frames * HOP_LENGTH / SAMPLE_RATE)
 
     if decode_options.get("language", None) is None:
@@ -148,8 +316,10 @@ def transcribe(
                 print(
                     "Detecting language using up to the first 30 seconds. Use `--language` to specify the language"
                 )
-            mel_segment = pad_or_trim(mel, N_FRAMES).to(model.device).to(dtype)
-            _, probs = model.detect_language(mel_segment)
+            mel_segment = pad_or_trim(get_mel(0, N_FRAMES), N_FRAMES)
+            mel_segment = mel_segment.to(model.device).to(dtype)
+            with span("detect_language"):
+                _, probs = model.detect_language(mel_segment)
             decode_options["language"] = max(probs, key=probs.get)
             if verbose is not None:
                 print(
@@ -172,16 +342,20 @@ def transcribe(
     seek_points: List[int] = [round(ts * FRAMES_PER_SECOND) for ts in clip_timestamps]
     if len(seek_points) == 0:
         seek_points.append(0)
-    if len(seek_points) % 2 == 1:
+    open_ended_clip = len(seek_points) % 2 == 1
+    if open_ended_clip:
         seek_points.append(content_frames)
     seek_clips: List[Tuple[int, int]] = list(zip(seek_points[::2], seek_points[1::2]))
 
     punctuation = "\"'“¿([{-\"'.。,，!！?？:：”)]}、"
 
+    speech_detector = make_speech_detector(vad)
+    skipped_frames = 0
+
     if word_timestamps and task == "translate":
         warnings.warn("Word-level timestamps on translations may not be reliable.")
 
-    def decode_with_fallback(segment: torch.Tensor) -> DecodingResult:
+    def decode_with_fallback(audio_features: torch.Tensor) -> DecodingResult:
         temperatures = (
             [temperature] if isinstance(temperature, (int, float)) else temperature
         )
@@ -198,27 +372,15 @@ def transcribe(
                 kwargs.pop("best_of", None)
 
             options = DecodingOptions(**kwargs, temperature=t)
-            decode_result = model.decode(segment, options)
-
-            needs_fallback = False
-            if (
-                compression_ratio_threshold is not None
-                and decode_result.compression_ratio > compression_ratio_threshold
-            ):
-                needs_fallback = True  # too repetitive
-            if (
-                logprob_threshold is not None
-                and decode_result.avg_logprob < logprob_threshold
-            ):
-                needs_fallback = True  # average log probability is too low
-            if (
-                no_speech_threshold is not None
-                and decode_result.no_speech_prob > no_speech_threshold
-                and logprob_threshold is not None
-                and decode_result.avg_logprob < logprob_threshold
+            with span("decode", seek=seek, temperature=t):
+                decode_result = model.decode(audio_features, options)
+
+            if not needs_fallback(
+                decode_result,
+                compression_ratio_threshold,
+                logprob_threshold,
+                no_speech_threshold,
             ):
-                needs_fallback = False  # silence
-            if not needs_fallback:
                 break
 
         return decode_result
@@ -260,9 +422,26 @@ def transcribe(
             "no_speech_prob": result.no_speech_prob,
         }
 
+    reported_all = False  # whether a report already covered all of the audio
+
+    def report_progress(frames: int, done: bool = False):
+        nonlocal reported_all
+        if progress is not None and not (done and reported_all):
+            finished = done or mel_stream is None or mel_stream.finished
+            report = TranscriptionProgress(
+                frames=min(frames, content_frames),
+                total_frames=content_frames if finished else None,
+                segments=len(all_segments),
+                elapsed=time.perf_counter() - start_time,
+            )
+            reported_all = report.frames == report.total_frames
+            progress(report)
+
     # show the progress bar when verbose is False (if True, transcribed text will be printed)
     with tqdm.tqdm(
-        total=content_frames, unit="frames", disable=verbose is not False
+        total=content_frames if mel_stream is None else None,
+        unit="frames",
+        disable=verbose is not False,
     ) as pbar:
         last_speech_timestamp = 0.0
         # NOTE: This loop is obscurely flattened to make the diff readable.
@@ -270,6 +449,16 @@ def transcribe(
         # for seek_clip_start, seek_clip_end in seek_clips:
         #     while seek < seek_clip_end
         while clip_idx < len(seek_clips):
+            if mel_stream is not None:
+                mel_stream.release(seek)
+                content_frames = count_content_frames(
+                    max(seek, seek_clips[clip_idx][0])
+                )
+                content_duration = float(content_frames * HOP_LENGTH / SAMPLE_RATE)
+                if open_ended_clip:
+                    seek_clips[-1] = (seek_clips[-1][0], content_frames)
+                if mel_stream.finished:
+                    pbar.total = content_frames
             seek_clip_start, seek_clip_end = seek_clips[clip_idx]
             if seek < seek_clip_start:
                 seek = seek_clip_start
@@ -278,10 +467,20 @@ def transcribe(
                 if clip_idx < len(seek_clips):
                     seek = seek_clips[clip_idx][0]
                 continue
+            if speech_detector is not None:
+                window_end = min(seek + N_FRAMES, content_frames, seek_clip_end)
+                silence = speech_detector.leading_silence(get_mel(seek, window_end))
+                if silence > 0:
+                    # fast-forward over the silence without running the encoder
+                    seek += silence
+                    skipped_frames += silence
+                    pbar.update(silence)
+                    report_progress(seek)
+                    continue
             time_offset = float(seek * HOP_LENGTH / SAMPLE_RATE)
             window_end_time = float((seek + N_FRAMES) * HOP_LENGTH / SAMPLE_RATE)
             segment_size = min(N_FRAMES, content_frames - seek, seek_clip_end - seek)
-            mel_segment = mel[:, seek : seek + segment_size]
+            mel_segment = get_mel(seek, seek + segment_size)
             segment_duration = segment_size * HOP_LENGTH / SAMPLE_RATE
             mel_segment = pad_or_trim(mel_segment, N_FRAMES).to(model.device).to(dtype)
 
@@ -292,22 +491,16 @@ def transcribe(
             else:
                 decode_options["prompt"] = all_tokens[prompt_reset_since:]
 
-            result: DecodingResult = decode_with_fallback(mel_segment)
+            # encode once; the retries at higher temperatures reuse the audio features
+            with span("encode", seek=seek), torch.no_grad():
+                audio_features = model.embed_audio(mel_segment[None])[0]
+            result: DecodingResult = decode_with_fallback(audio_features)
             tokens = torch.tensor(result.tokens)
 
-            if no_speech_threshold is not None:
-                # no voice activity check
-                should_skip = result.no_speech_prob > no_speech_threshold
-                if (
-                    logprob_threshold is not None
-                    and result.avg_logprob > logprob_threshold
-                ):
-                    # don't skip if the logprob is high enough, despite the no_speech_prob
-                    should_skip = False
-
-                if should_skip:
-                    seek += segment_size  # fast-forward to the next segment boundary
-                    continue
+            if should_skip(result, logprob_threshold, no_speech_threshold):
+                seek += segment_size  # fast-forward to the next segment boundary
+                report_progress(seek)
+                continue
 
             previous_seek = seek
             current_segments = []
@@ -399,16 +592,18 @@ def transcribe(
                 seek += segment_size
 
             if word_timestamps:
-                add_word_timestamps(
-                    segments=current_segments,
-                    model=model,
-                    tokenizer=tokenizer,
-                    mel=mel_segment,
-                    num_frames=segment_size,
-                    prepend_punctuations=prepend_punctuations,
-                    append_punctuations=append_punctuations,
-                    last_speech_timestamp=last_speech_timestamp,
-                )
+                with span("alignment", seek=previous_seek):
+                    add_word_timestamps(
+                        segments=current_segments,
+                        model=model,
+                        tokenizer=tokenizer,
+                        audio_features=result.audio_features,
+                        num_frames=segment_size,
+                        prepend_punctuations=prepend_punctuations,
+                        append_punctuations=append_punctuations,
+                        last_speech_timestamp=last_speech_timestamp,
+                        band_margin=alignment_band,
+                    )
 
                 if not single_timestamp_ending:
                     last_word_end = get_end(current_segments)
@@ -499,6 +694,8 @@ def transcribe(
             all_tokens.extend(
                 [token for segment in current_segments for token in segment["tokens"]]
             )
+            if on_segments is not None and current_segments:
+                on_segments(all_segments[-len(current_segments) :])
 
             if not condition_on_previous_text or result.temperature > 0.5:
                 # do not feed the prompt tokens if a high temperature was used
@@ -506,12 +703,502 @@ def transcribe(
 
             # update progress bar
             pbar.update(min(content_frames, seek) - previous_seek)
+            report_progress(seek)
 
-    return dict(
+    report_progress(content_frames, done=True)
+    result = dict(
         text=tokenizer.decode(all_tokens[len(initial_prompt_tokens) :]),
         segments=all_segments,
         language=language,
     )
+    if speech_detector is not None:
+        result["vad"] = vad_report(skipped_frames, content_frames)
+    return result
+
+
+def transcribe_batched(
+    model: "Whisper",
+    audio: Union[str, np.ndarray, torch.Tensor, LogMelStream],
+    *,
+    batch_size: int = 8,
+    verbose: Optional[bool] = None,
+    temperature: Union[float, Tuple[float, ...]] = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+    compression_ratio_threshold: Optional[float] = 2.4,
+    logprob_threshold: Optional[float] = -1.0,
+    no_speech_threshold: Optional[float] = 0.6,
+    initial_prompt: Optional[str] = None,
+    word_timestamps: bool = False,
+    prepend_punctuations: str = "\"'“¿([{-",
+    append_punctuations: str = "\"'.。,，!！?？:：”)]}、",
+    clip_timestamps: Union[str, List[float]] = "0",
+    alignment_band: Optional[float] = None,
+    vad: Union[bool, VadOptions] = False,
+    span: Callable[..., ContextManager] = no_span,
+    progress: Optional[Callable[[TranscriptionProgress], None]] = None,
+    on_segments: Optional[Callable[[List[dict]], None]] = None,
+    **decode_options,
+):
+    """
+    Transcribe an audio file using Whisper, decoding several 30-second windows at once
+
+    Unlike `transcribe()`, where each window starts at the last timestamp predicted in the
+    previous one, the windows are laid out at fixed 30-second boundaries within each clip, so
+    that up to `batch_size` of them can go through the encoder and decoder together. The
+    previous text is not used as a prompt; `initial_prompt` is given to every window instead.
+    The audio features of a batch are computed once, and the temperature fallback is run again
+    only for the windows that failed, reusing their features.
+
+    Parameters
+    ----------
+    model: Whisper
+        The Whisper model instance
+
+    audio: Union[str, np.ndarray, torch.Tensor, LogMelStream]
+        The path to the audio file to open, the audio waveform, or a `LogMelStream` created
+        with `padding=N_SAMPLES`
+
+    batch_size: int
+        The number of 30-second windows decoded together
+
+    The remaining parameters have the same meaning as in `transcribe()`. With `vad`, each window
+    starts at the end of the silence that precedes it, instead of at a fixed boundary. With
+    `word_timestamps`, the word alignments of a batch are searched together. The stages given
+    to `span` are the same, with the number of `windows` of the batch instead of their `seek`,
+    and `progress` is called after each batch. `on_segments` is called once per window of the
+    batch.
+
+    Returns
+    -------
+    A dictionary containing the resulting text ("text") and segment-level details ("segments"), and
+    the spoken language ("language"), in the same format as `transcribe()`.
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be positive, got {batch_size}")
+    start_time = time.perf_counter()
+
+    dtype = torch.float16 if decode_options.get("fp16", True) else torch.float32
+    if model.device == torch.device("cpu"):
+        if torch.cuda.is_available():
+            warnings.warn("Performing inference on CPU when CUDA is available")
+        if dtype == torch.float16:
+            warnings.warn("FP16 is not supported on CPU; using FP32 instead")
+            dtype = torch.float32
+
+    if dtype == torch.float32:
+        decode_options["fp16"] = False
+
+    if isinstance(audio, LogMelStream):
+        if audio.n_mels != model.dims.n_mels or audio.padding != N_SAMPLES:
+            raise ValueError(
+                f"LogMelStream must use n_mels={model.dims.n_mels} and padding={N_SAMPLES}"
+            )
+        mel_stream = audio
+        mel = None
+    else:
+        mel_stream = None
+        with span("mel"):
+            mel = log_mel_spectrogram(audio, model.dims.n_mels, padding=N_SAMPLES)
+
+    def get_mel(start: int, end: int) -> torch.Tensor:
+        if mel_stream is None:
+            return mel[:, start:end]
+        with span("mel"):
+            return mel_stream.frames(start, end)
+
+    def count_content_frames(seek: int) -> int:
+        if mel_stream is None:
+            return mel.shape[-1] - N_FRAMES
+        with span("mel"):
+            return mel_stream.fill(seek + 2 * N_FRAMES) - N_FRAMES
+
+    content_frames = count_content_frames(0)
+
+    if decode_options.get("language", None) is None:
+        if not model.is_multilingual:
+            decode_options["language"] = "en"
+        else:
+            if verbose:
+                print(
+                    "Detecting language using up to the first 30 seconds. Use `--language` to specify the language"
+                )
+            mel_segment = pad_or_trim(get_mel(0, N_FRAMES), N_FRAMES)
+            mel_segment = mel_segment.to(model.device).to(dtype)
+            with span("detect_language"):
+                _, probs = model.detect_language(mel_segment)
+            decode_options["language"] = max(probs, key=probs.get)
+            if verbose is not None:
+                print(
+                    f"Detected language: {LANGUAGES[decode_options['language']].title()}"
+                )
+
+    language: str = decode_options["language"]
+    task: str = decode_options.get("task", "transcribe")
+    tokenizer = get_tokenizer(
+        model.is_multilingual,
+        num_languages=model.num_languages,
+        language=language,
+        task=task,
+    )
+
+    if isinstance(clip_timestamps, str):
+        clip_timestamps = [
+            float(ts) for ts in (clip_timestamps.split(",") if clip_timestamps else [])
+        ]
+    seek_points: List[int] = [round(ts * FRAMES_PER_SECOND) for ts in clip_timestamps]
+    if len(seek_points) == 0:
+        seek_points.append(0)
+    if len(seek_points) % 2 == 1:
+        seek_points.append(None)  # open-ended; runs to the end of the audio
+    seek_clips = list(zip(seek_points[::2], seek_points[1::2]))
+
+    if word_timestamps and task == "translate":
+        warnings.warn("Word-level timestamps on translations may not be reliable.")
+
+    initial_prompt_tokens = []
+    if initial_prompt is not None:
+        initial_prompt_tokens = tokenizer.encode(" " + initial_prompt.strip())
+    decode_options["prompt"] = initial_prompt_tokens
+
+    input_stride = exact_div(N_FRAMES, model.dims.n_audio_ctx)
+    time_precision = input_stride * HOP_LENGTH / SAMPLE_RATE
+    temperatures = (
+        [temperature] if isinstance(temperature, (int, float)) else temperature
+    )
+
+    speech_detector = make_speech_detector(vad)
+    vad_stats = dict(skipped_frames=0, content_frames=content_frames)
+
+    def iter_windows():
+        for clip_start, clip_end in seek_clips:
+            seek = clip_start
+            while True:
+                frames = count_content_frames(seek)
+                vad_stats["content_frames"] = frames
+                end = frames if clip_end is None else min(clip_end, frames)
+                if seek >= end:
+                    break
+                segment_size = min(N_FRAMES, end - seek)
+                if speech_detector is not None:
+                    mel_segment = get_mel(seek, seek + segment_size)
+                    silence = speech_detector.leading_silence(mel_segment)
+                    if silence > 0:
+                        # skip the silence without running the encoder
+                        seek += silence
+                        vad_stats["skipped_frames"] += silence
+                        continue
+                mel_segment = pad_or_trim(get_mel(seek, seek + segment_size), N_FRAMES)
+                if mel_stream is not None:
+                    mel_stream.release(seek + segment_size)
+                yield seek, segment_size, mel_segment
+                seek += segment_size
+
+    def decode_batch(mel_batch: torch.Tensor) -> List[DecodingResult]:
+        with span("encode", windows=len(mel_batch)), torch.no_grad():
+            audio_features = model.embed_audio(mel_batch.to(model.device).to(dtype))
+
+        results: List[Optional[DecodingResult]] = [None] * len(audio_features)
+        pending = list(range(len(audio_features)))
+        for t in temperatures:
+            kwargs = {**decode_options}
+            if t > 0:
+                # disable beam_size and patience when t > 0
+                kwargs.pop("beam_size", None)
+                kwargs.pop("patience", None)
+            else:
+                # disable best_of when t == 0
+                kwargs.pop("best_of", None)
+
+            options = DecodingOptions(**kwargs, temperature=t)
+            retry = []
+            with span("decode", windows=len(pending), temperature=t):
+                decoded = model.decode(audio_features[pending], options)
+            for i, result in zip(pending, decoded):
+                results[i] = result
+                if needs_fallback(
+                    result,
+                    compression_ratio_threshold,
+                    logprob_threshold,
+                    no_speech_threshold,
+                ):
+                    retry.append(i)
+            # only the failed windows are decoded again at the next temperature
+            pending = retry
+            if not pending:
+                break
+
+        return results
+
+    def window_segments(
+        seek: int, segment_size: int, result: DecodingResult
+    ) -> List[dict]:
+        tokens = torch.tensor(result.tokens)
+        time_offset = float(seek * HOP_LENGTH / SAMPLE_RATE)
+        segment_duration = segment_size * HOP_LENGTH / SAMPLE_RATE
+        spans = []
+
+        timestamp_tokens: torch.Tensor = tokens.ge(tokenizer.timestamp_begin)
+        consecutive = torch.where(timestamp_tokens[:-1] & timestamp_tokens[1:])[0]
+        consecutive.add_(1)
+        if len(consecutive) > 0:
+            slices = consecutive.tolist()
+            if slices[-1] < len(tokens):
+                # the window cannot be re-decoded from the last timestamp as in
+                # `transcribe()`, so the unfinished segment runs to the window end
+                slices.append(len(tokens))
+
+            last_slice = 0
+            for current_slice in slices:
+                sliced_tokens = tokens[last_slice:current_slice]
+                start = sliced_tokens[0].item() - tokenizer.timestamp_begin
+                start = time_offset + start * time_precision
+                if sliced_tokens[-1].item() >= tokenizer.timestamp_begin:
+                    end = sliced_tokens[-1].item() - tokenizer.timestamp_begin
+                    end = time_offset + end * time_precision
+                else:
+                    end = time_offset + segment_duration
+                spans.append((start, max(start, end), sliced_tokens))
+                last_slice = current_slice
+        else:
+            duration = segment_duration
+            timestamps = tokens[timestamp_tokens.nonzero().flatten()]
+            if (
+                len(timestamps) > 0
+                and timestamps[-1].item() != tokenizer.timestamp_begin
+            ):
+                # no consecutive timestamps but it has a timestamp; use the last one.
+                last_timestamp_pos = timestamps[-1].item() - tokenizer.timestamp_begin
+                duration = last_timestamp_pos * time_precision
+            spans.append((time_offset, time_offset + duration, tokens))
+
+        segments = []
+        for start, end, sliced_tokens in spans:
+            sliced_tokens = sliced_tokens.tolist()
+            text_tokens = [token for token in sliced_tokens if token < tokenizer.eot]
+            segments.append(
+                {
+                    "seek": seek,
+                    "start": start,
+                    "end": end,
+                    "text": tokenizer.decode(text_tokens),
+                    "tokens": sliced_tokens,
+                    "temperature": result.temperature,
+                    "avg_logprob": result.avg_logprob,
+                    "compression_ratio": result.compression_ratio,
+                    "no_speech_prob": result.no_speech_prob,
+                }
+            )
+        return segments
+
+    all_tokens = []
+    all_segments = []
+    last_speech_timestamp = 0.0
+    windows = iter_windows()
+
+    reported_all = False  # whether a report already covered all of the audio
+
+    def report_progress(frames: int, done: bool = False):
+        nonlocal reported_all
+        if progress is not None and not (done and reported_all):
+            finished = done or mel_stream is None or mel_stream.finished
+            total_frames = vad_stats["content_frames"]
+            report = TranscriptionProgress(
+                frames=min(frames, total_frames),
+                total_frames=total_frames if finished else None,
+                segments=len(all_segments),
+                elapsed=time.perf_counter() - start_time,
+            )
+            reported_all = report.frames == report.total_frames
+            progress(report)
+
+    with tqdm.tqdm(
+        total=content_frames if mel_stream is None else None,
+        unit="frames",
+        disable=verbose is not False,
+    ) as pbar:
+        reported_skip = 0
+        while batch := list(itertools.islice(windows, batch_size)):
+            mel_batch = torch.stack([mel_segment for _, _, mel_segment in batch])
+            results = decode_batch(mel_batch)
+            pbar.update(vad_stats["skipped_frames"] - reported_skip)
+            reported_skip = vad_stats["skipped_frames"]
+
+            decoded = []
+            for (seek, segment_size, _), result in zip(batch, results):
+                pbar.update(segment_size)
+                if should_skip(result, logprob_threshold, no_speech_threshold):
+                    continue
+
+                current_segments = window_segments(seek, segment_size, result)
+                features = result.audio_features
+                decoded.append((current_segments, features, segment_size))
+
+            if word_timestamps:
+                with span("alignment", windows=len(decoded)):
+                    alignments = find_alignments(
+                        model, tokenizer, decoded, band_margin=alignment_band
+                    )
+
+            for k, (current_segments, features, segment_size) in enumerate(decoded):
+                if word_timestamps:
+                    add_word_timestamps(
+                        segments=current_segments,
+                        model=model,
+                        tokenizer=tokenizer,
+                        audio_features=features,
+                        num_frames=segment_size,
+                        prepend_punctuations=prepend_punctuations,
+                        append_punctuations=append_punctuations,
+                        last_speech_timestamp=last_speech_timestamp,
+                        alignment=alignments[k],
+                    )
+                    last_word_end = get_end(current_segments)
+                    if last_word_end is not None:
+                        last_speech_timestamp = last_word_end
+
+                if verbose:
+                    for segment in current_segments:
+                        start, end, text = (
+                            segment["start"],
+                            segment["end"],
+                            segment["text"],
+                        )
+                        line = f"[{format_timestamp(start)} --> {format_timestamp(end)}] {text}"
+                        print(make_safe(line))
+
+                # if a segment is instantaneous or does not contain text, clear it
+                for segment in current_segments:
+                    if (
+                        segment["start"] == segment["end"]
+                        or segment["text"].strip() == ""
+                    ):
+                        segment["text"] = ""
+                        segment["tokens"] = []
+                        segment["words"] = []
+
+                all_segments.extend(
+                    [
+                        {"id": i, **segment}
+                        for i, segment in enumerate(
+                            current_segments, start=len(all_segments)
+                        )
+                    ]
+                )
+                all_tokens.extend(
+                    [
+                        token
+                        for segment in current_segments
+                        for token in segment["tokens"]
+                    ]
+                )
+                if on_segments is not None and current_segments:
+                    on_segments(all_segments[-len(current_segments) :])
+
+            last_seek, last_size, _ = batch[-1]
+            report_progress(last_seek + last_size)
+
+    report_progress(vad_stats["content_frames"], done=True)
+    result = dict(
+        text=tokenizer.decode(all_tokens),
+        segments=all_segments,
+        language=language,
+    )
+    if speech_detector is not None:
+        result["vad"] = vad_report(
+            vad_stats["skipped_frames"], vad_stats["content_frames"]
+        )
+    return result
+
+
+class TranscriptionClosed(Exception):
+    """Stops the transcription of `transcribe_iter()` once its generator has been closed"""
+
+
+def transcribe_iter(
+    model: "Whisper",
+    audio: Union[str, np.ndarray, torch.Tensor, LogMelStream],
+    *,
+    batch_size: int = 1,
+    **kwargs,
+) -> Generator[dict, None, dict]:
+    """
+    Transcribe an audio file like `transcribe()`, or like `transcribe_batched()` when
+    `batch_size` is greater than 1, yielding each segment as soon as its window is final
+
+    The transcription runs in a background thread, so that the consumer can write or display
+    the segments of a window while the next one is decoded. The result dictionary is the
+    return value of the generator, i.e. the `value` of its `StopIteration`. Closing the
+    generator early stops the transcription at the end of the current window, and waits
+    for it.
+
+    Parameters
+    ----------
+    model: Whisper
+        The Whisper model instance
+
+    audio: Union[str, np.ndarray, torch.Tensor, LogMelStream]
+        The audio, as in `transcribe()`
+
+    batch_size: int
+        The number of 30-second windows decoded together; 1 uses `transcribe()`
+
+    The remaining keyword arguments are passed to `transcribe()` or `transcribe_batched()`.
+    """
+    if "on_segments" in kwargs:
+        raise TypeError(
+            "transcribe_iter() yields the segments instead of calling on_segments"
+        )
+
+    segments: queue.Queue = queue.Queue()
+    closed = threading.Event()
+    finished = object()
+    outcome = {}
+    user_progress = kwargs.pop("progress", None)
+
+    def on_segments(new_segments: List[dict]):
+        if closed.is_set():
+            raise TranscriptionClosed()
+        for segment in new_segments:
+            segments.put(segment)
+
+    def progress(report: TranscriptionProgress):
+        # called after every window, including those without any segments
+        if closed.is_set():
+            raise TranscriptionClosed()
+        if user_progress is not None:
+            user_progress(report)
+
+    def run():
+        try:
+            if batch_size > 1:
+                outcome["result"] = transcribe_batched(
+                    model,
+                    audio,
+                    batch_size=batch_size,
+                    on_segments=on_segments,
+                    **kwargs,
+                )
+            else:
+                outcome["result"] = transcribe(
+                    model, audio, on_segments=on_segments, **kwargs
+                )
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            segments.put(finished)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        while (segment := segments.get()) is not finished:
+            yield segment
+    finally:
+        # when closed early, wait for the transcription to stop after the current window
+        closed.set()
+        thread.join()
+
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
 
 
 def cli():
@@ -563,7 +1250,9 @@ def cli():
     parser.add_argument("--max_words_per_line", type=optional_int, default=None, help="(requires --word_timestamps True, no effect with --max_line_width) the maximum number of words in a segment")
     parser.add_argument("--threads", type=optional_int, default=0, help="number of threads used by torch for CPU inference; supercedes MKL_NUM_THREADS/OMP_NUM_THREADS")
     parser.add_argument("--clip_timestamps", type=str, default="0", help="comma-separated list start,end,start,end,... timestamps (in seconds) of clips to process, where the last end timestamp defaults to the end of the file")
+    parser.add_argument("--vad", type=str2bool, default=False, help="skip silent stretches detected by an energy-based voice activity detector before they reach the encoder")
     parser.add_argument("--hallucination_silence_threshold", type=optional_float, help="(requires --word_timestamps True) skip silent periods longer than this threshold (in seconds) when a possible hallucination is detected")
+    parser.add_argument("--alignment_band", type=optional_float, default=None, help="(requires --word_timestamps True) only align the words of each segment within this many seconds of the segment timestamps, which is faster")
     # fmt: on
 
     args = parser.parse_args().__dict__
@@ -0,0 +1,81 @@
+from dataclasses import dataclass
+
+import torch
+import torch.nn.functional as F
+
+from .audio import FRAMES_PER_SECOND
+
+
+@dataclass(frozen=True)
+class VadOptions:
+    # a frame is speech if its level is this many dB above the estimated noise floor
+    threshold_db: float = 10.0
+
+    # only silences at least this long are skipped, so that short pauses stay in the window
+    min_silence_duration: float = 1.0
+
+    # seconds of audio kept before the detected speech onset
+    speech_pad: float = 0.2
+
+    # width of the moving average applied to the frame levels, in seconds
+    smoothing: float = 0.1
+
+
+class SpeechDetector:
+    """
+    An energy-based voice activity detector working on normalized log-Mel frames.
+
+    The noise floor is estimated from the quietest frames seen so far, so the detector can be
+    used on windows of a `LogMelStream` as they are computed, without looking at the whole audio.
+    """
+
+    def __init__(self, options: VadOptions = VadOptions()):
+        self.options = options
+        self.noise_floor = float("inf")
+        self.pad_frames = round(options.speech_pad * FRAMES_PER_SECOND)
+        self.min_silence_frames = round(
+            options.min_silence_duration * FRAMES_PER_SECOND
+        )
+        self.smoothing_frames = max(1, round(options.smoothing * FRAMES_PER_SECOND))
+
+    def frame_levels(self, mel: torch.Tensor) -> torch.Tensor:
+        """
+        The mean level of each frame in dB, smoothed over time
+
+        Parameters
+        ----------
+        mel: torch.Tensor, shape = (n_mels, n_frames)
+            Log-Mel frames normalized as in `log_mel_spectrogram`, i.e. (log10 + 4) / 4
+        """
+        # undo the normalization; one unit of log10 power is 10 dB
+        levels = (mel.float().mean(dim=0) * 4 - 4) * 10
+        width = min(self.smoothing_frames, levels.shape[-1])
+        if width > 1:
+            levels = F.avg_pool1d(
+                levels[None, None],
+                width,
+                stride=1,
+                padding=width // 2,
+                count_include_pad=False,
+            )[0, 0, : levels.shape[-1]]
+        return levels
+
+    def speech_mask(self, mel: torch.Tensor) -> torch.Tensor:
+        """Boolean tensor of shape (n_frames,) marking the frames that contain speech"""
+        levels = self.frame_levels(mel)
+        if levels.numel() > 0:
+            quietest = torch.quantile(levels, 0.1).item()
+            self.noise_floor = min(self.noise_floor, quietest)
+        return levels > self.noise_floor + self.options.threshold_db
+
+    def leading_silence(self, mel: torch.Tensor) -> int:
+        """
+        The number of frames at the start of `mel` that can be skipped, which is all of them if
+        no speech was found, and zero if the silence is shorter than `min_silence_duration`
+        """
+        mask = self.speech_mask(mel)
+        if not mask.any():
+            return mask.shape[-1]
+        onset = int(mask.int().argmax())
+        skip = onset - self.pad_frames
+        return skip if skip >= self.min_silence_frames else 0
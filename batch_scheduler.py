@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+バッチ処理スケジューラモジュール
+複数ファイルの文字起こしをワーカースレッドで並列に実行する
+次のファイルの音声デコードを現在のファイルの推論と並行して先行させ、
+結果はファイルリストの順番どおりに結果通知用のスレッドから通知する（結果の保存中も次のファイルの推論を進める）
+"""
+
+import os
+import queue
+import logging
+import threading
+
+import torch
+
+from transcriber import create_transcriber, replicas_fit
+
+# ロガーの設定（標準出力はCLIのJSON Linesに使うため、通知はログに出す）
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# スケジューラ起動前のtorchのスレッド数（ワーカー数に応じて調整した後に戻すため）
+_DEFAULT_TORCH_THREADS = torch.get_num_threads()
+
+
+def configure_torch_threads(num_workers):
+    """
+    ワーカー数×torchのスレッド数がCPUコア数を超えないように調整
+
+    Args:
+        num_workers (int): 同時に推論するワーカー数
+
+    Returns:
+        int: 設定したワーカーあたりのスレッド数
+    """
+    if num_workers <= 1:
+        threads = _DEFAULT_TORCH_THREADS
+    else:
+        threads = max(1, (os.cpu_count() or 1) // num_workers)
+    torch.set_num_threads(threads)
+    return threads
+
+
+class AudioPrefetcher:
+    """別スレッドでFFmpegのデコードを先行させ、波形チャンクをキューに溜めるクラス"""
+
+    _END = object()
+
+    def __init__(self, transcriber, file_path, max_chunks=4):
+        """
+        初期化（デコードスレッドを即座に開始）
+
+        Args:
+            transcriber (BaseTranscriber): stream_audioを提供するトランスクライバー
+            file_path (str): デコードするファイルのパス
+            max_chunks (int): 先読みしておくチャンク数の上限（メモリ使用量の上限）
+        """
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(transcriber, file_path), daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        """停止要求を確認しながらキューに追加"""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self, transcriber, file_path):
+        """デコードスレッドの本体"""
+        chunks = transcriber.stream_audio(file_path)
+        try:
+            for chunk in chunks:
+                if not self._put(chunk):
+                    break
+            else:
+                self._put(self._END)
+        except Exception as e:
+            self._put(e)
+        finally:
+            # 途中で停止した場合はFFmpegプロセスを終了させる
+            chunks.close()
+
+    def __iter__(self):
+        """デコード済みのチャンクを順に返す"""
+        while True:
+            item = self._queue.get()
+            if item is self._END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def close(self):
+        """デコードを中止"""
+        self._stop.set()
+
+
+class BatchScheduler:
+    """複数ファイルの文字起こしを並列に実行するスケジューラクラス"""
+
+    def __init__(self, file_list, model_name, language=None, num_workers=1, share_model=False,
+                 prefetch=True, cancel_check=None, on_progress=None, on_result=None, batch_size=1,
+                 cache=None, vad=False, quantize=False, profile_sink=None, on_segments=None):
+        """
+        初期化
+
+        Args:
+            file_list (list): 処理対象ファイルのリスト
+            model_name (str): Whisperモデル名
+            language (str, optional): 言語コード (None=自動検出)
+            num_workers (int): ワーカースロット数
+            share_model (bool): Trueの場合は1つのモデルを推論ロックで共有し、Falseの場合はスロットごとにモデルを複製する
+            prefetch (bool): 次のファイルの音声デコードを先行させるかどうか
+            cancel_check (function, optional): Trueを返すと処理を中断する関数
+            on_progress (function, optional): (index, status, progress) を受け取るファイル単位の進捗コールバック
+            on_result (function, optional): (index, file_path, result, error) を受け取る結果コールバック
+                （ワーカーとは別の1つのスレッドからリスト順に呼ばれる）
+            batch_size (int): ファイル内の30秒ウィンドウをまとめて推論する数 (1=逐次)
+            cache (TranscriptCache, optional): 文字起こし結果キャッシュ（ヒットした場合は推論を省略）
+            vad (bool): 音声区間検出で無音区間をスキップするかどうか
+            quantize (bool): CPUではLinear層を動的int8量子化したモデルを使うかどうか
+            profile_sink (MemorySink or JsonlSink, optional): 各段階の所要時間（スパン）の送り先
+            on_segments (function, optional): (index, segments) を受け取り、ウィンドウごとに確定したセグメントを
+                文字起こし中に受け取る関数（推論スレッドから呼ばれる。キャッシュから読み込んだファイルでは呼ばれない）
+        """
+        self.file_list = list(file_list)
+        self.model_name = model_name
+        self.language = language
+        self.num_workers = max(1, min(num_workers, len(self.file_list) or 1))
+        if not share_model and self.num_workers > 1 and not replicas_fit(model_name, self.num_workers, quantize):
+            # 複製がメモリ予算に収まらないとファイルごとに互いを追い出して再ロードすることになるため、
+            # 1つのモデルを共有する
+            logger.warning(f"モデル {model_name} を{self.num_workers}個複製するとメモリ予算を超えるため、1つのモデルを共有します")
+            share_model = True
+        self.share_model = share_model
+        self.prefetch = prefetch
+        self.cancel_check = cancel_check or (lambda: False)
+        self.on_progress = on_progress
+        self.on_result = on_result
+        self.batch_size = batch_size
+        self.cache = cache
+        self.vad = vad
+        self.quantize = quantize
+        self.profile_sink = profile_sink
+        self.on_segments = on_segments
+
+        self._lock = threading.Lock()
+        self._inference_lock = threading.Lock() if share_model else None
+        self._next_index = 0
+        self._next_emit = 0
+        self._prefetchers = {}
+        self._results = {}
+        # リスト順に揃った結果を結果通知用のスレッドに渡すキュー（Noneで終了）
+        self._ready = queue.Queue()
+
+    def _create_transcriber(self, index, slot):
+        """ファイルごとのトランスクライバーを作成"""
+        def callback(status, progress):
+            if self.on_progress:
+                self.on_progress(index, status, progress)
+
+        def on_segments(segments):
+            self.on_segments(index, segments)
+
+        return create_transcriber(
+            self.file_list[index],
+            model_name=self.model_name,
+            language=self.language,
+            callback=callback,
+            cancel_check=self.cancel_check,
+            inference_lock=self._inference_lock,
+            replica=0 if self.share_model else slot,
+            batch_size=self.batch_size,
+            vad=self.vad,
+            quantize=self.quantize,
+            profile_sink=self.profile_sink,
+            on_segments=on_segments if self.on_segments else None,
+        )
+
+    def _claim(self, slot):
+        """
+        次に処理するファイルを取得し、その次のファイルのデコードを先行させる
+
+        Returns:
+            tuple: (index, prefetcher) 処理するファイルがない場合はindexがNone
+        """
+        with self._lock:
+            if self.cancel_check() or self._next_index >= len(self.file_list):
+                return None, None
+            index = self._next_index
+            self._next_index += 1
+            prefetcher = self._prefetchers.pop(index, None)
+
+            # 推論中に次のファイルのFFmpegデコードを開始しておく
+            upcoming = self._next_index
+            if self.prefetch and upcoming < len(self.file_list) and upcoming not in self._prefetchers:
+                transcriber = self._create_transcriber(upcoming, slot)
+                if transcriber is not None and transcriber.streaming:
+                    self._prefetchers[upcoming] = AudioPrefetcher(transcriber, self.file_list[upcoming])
+            return index, prefetcher
+
+    def _cache_key(self, index):
+        """
+        キャッシュキーを作成（結果に影響する設定をすべて含める）
+
+        Returns:
+            str: キャッシュキー（キャッシュが無効な場合やファイルを読めない場合はNone）
+        """
+        if self.cache is None:
+            return None
+        options = {"batch_size": self.batch_size, "vad": self.vad, "quantize": self.quantize}
+        try:
+            return self.cache.make_key(
+                self.file_list[index],
+                self.model_name,
+                self.language,
+                options=options,
+            )
+        except OSError:
+            # ファイルを読めない場合は通常の処理でエラーを報告する
+            return None
+
+    def _finish(self, index, result, error):
+        """結果を記録し、リスト順に揃った分を結果通知用のスレッドに渡す"""
+        # 複数のワーカーが同時に通知しても順番が入れ替わらないようにする
+        with self._lock:
+            self._results[index] = (result, error)
+            while self._next_emit in self._results:
+                self._ready.put((self._next_emit,) + self._results[self._next_emit])
+                self._next_emit += 1
+
+    def _deliver(self):
+        """結果通知用のスレッドの本体（結果の保存などをワーカーの推論と並行して行う）"""
+        while True:
+            item = self._ready.get()
+            if item is None:
+                return
+            if self.on_result:
+                index, result, error = item
+                try:
+                    self.on_result(index, self.file_list[index], result, error)
+                except Exception as e:
+                    logger.exception(f"結果の処理中にエラーが発生しました: {self.file_list[index]} - {e}")
+
+    def _worker(self, slot):
+        """ワーカースロットの本体"""
+        # スロットのモデルは最初に推論するファイルでロードしてレジストリに固定し、run()の間使い続ける
+        # （他のスロットのロードで解放されてファイルごとに再ロードされるのを防ぐ）
+        owner = None
+        try:
+            while True:
+                index, prefetcher = self._claim(slot)
+                if index is None:
+                    return
+
+                file_path = self.file_list[index]
+                result, error = None, None
+                try:
+                    # 同じ内容・同じ設定で処理済みの場合はキャッシュから返す
+                    cache_key = self._cache_key(index)
+                    if cache_key is not None:
+                        result = self.cache.get(cache_key)
+                    if result is not None:
+                        if self.on_progress:
+                            self.on_progress(index, "キャッシュから読み込みました", 100)
+                    else:
+                        transcriber = self._create_transcriber(index, slot)
+                        if transcriber is None:
+                            file_extension = os.path.splitext(file_path)[1].lower()
+                            raise ValueError(f"サポートされていないファイル形式です - {file_extension}")
+                        if owner is None:
+                            transcriber.load_model(pin=True)
+                            owner = transcriber
+                        else:
+                            transcriber.model = owner.model
+                        result = transcriber.process_file(file_path, audio_chunks=prefetcher)
+                        if cache_key is not None:
+                            # 所要時間の集計はその回の処理にだけ当てはまるのでキャッシュしない
+                            self.cache.put(cache_key, {k: v for k, v in result.items() if k != "profile"})
+                except Exception as e:
+                    error = e
+                finally:
+                    if prefetcher is not None:
+                        prefetcher.close()
+                self._finish(index, result, error)
+        finally:
+            if owner is not None:
+                owner.release_model()
+
+    def run(self):
+        """
+        全ファイルを処理（完了まで待機）
+
+        Returns:
+            list: ファイルリスト順の (result, error) のリスト（キャンセル時は未処理分を含まない）
+        """
+        configure_torch_threads(self.num_workers)
+        deliverer = threading.Thread(target=self._deliver, daemon=True)
+        deliverer.start()
+        try:
+            threads = [
+                threading.Thread(target=self._worker, args=(slot,), daemon=True)
+                for slot in range(self.num_workers)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            # 使われなかった先読みを停止
+            with self._lock:
+                for prefetcher in self._prefetchers.values():
+                    prefetcher.close()
+                self._prefetchers.clear()
+            configure_torch_threads(1)
+            # 残りの結果を通知し終えるまで待つ
+            self._ready.put(None)
+            deliverer.join()
+
+        return [self._results[i] for i in sorted(self._results)]
+
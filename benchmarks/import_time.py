@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+起動時のインポート時間ベンチマーク
+`python -X importtime` で各エントリーポイントのインポート時間を計測し、
+GUIの起動経路でtorch/whisperが読み込まれていないかを確認する
+
+使用例:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --repeat 5 --budget-ms 800 --json import_time.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+
+# リポジトリのルート
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 計測するモジュールと、初回描画前に読み込まれてはいけない重いモジュール
+TARGETS = {
+    "main": ["torch", "whisper", "transcriber", "batch_scheduler"],
+    "ui.main_window": ["torch", "whisper", "transcriber", "batch_scheduler"],
+    "cli": ["tkinter", "PIL"],
+    "transcriber": ["tkinter", "PIL"],
+}
+
+
+def measure_import(module, repeat=3):
+    """
+    モジュールのインポート時間を計測
+
+    Args:
+        module (str): モジュール名
+        repeat (int): 計測回数（中央値を採用）
+
+    Returns:
+        dict: 累積時間(ms)、直接インポートしている重いモジュール、読み込まれたモジュール名の集合
+    """
+    totals = []
+    children = {}
+    loaded = set()
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"{module} のインポートに失敗しました:\n{completed.stderr[-2000:]}")
+
+        # 子モジュールは親より先に出力されるので、トップレベルの行が来るまで溜めておく
+        pending = {}
+        for line in completed.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            # import time: self [us] | cumulative | imported package
+            _, cumulative, name = line[len("import time:"):].split("|")
+            depth = (len(name) - len(name.lstrip())) // 2
+            name = name.strip()
+            loaded.add(name)
+            if depth == 1:
+                pending[name] = int(cumulative)
+            elif depth == 0:
+                if name == module:
+                    totals.append(int(cumulative) / 1000)
+                    for child, micros in pending.items():
+                        children[child] = max(children.get(child, 0), micros)
+                pending = {}
+
+    heaviest = sorted(children.items(), key=lambda item: item[1], reverse=True)[:10]
+    return {
+        "total_ms": statistics.median(totals),
+        "runs_ms": totals,
+        "heaviest": [(name, micros / 1000) for name, micros in heaviest],
+        "loaded": loaded,
+    }
+
+
+def main():
+    """ベンチマークのエントリーポイント"""
+    parser = argparse.ArgumentParser(description="エントリーポイントのインポート時間を計測します")
+    parser.add_argument("modules", nargs="*", default=list(TARGETS), help="計測するモジュール")
+    parser.add_argument("--repeat", type=int, default=3, help="モジュールごとの計測回数")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="GUIの起動経路（main, ui.main_window）のインポート時間の上限")
+    parser.add_argument("--json", dest="json_path", default=None, help="結果をJSONで保存するパス")
+    args = parser.parse_args()
+
+    failures = []
+    report = {}
+    for module in args.modules:
+        result = measure_import(module, repeat=args.repeat)
+        forbidden = [name for name in TARGETS.get(module, []) if name in result["loaded"]]
+        report[module] = {
+            "total_ms": result["total_ms"],
+            "runs_ms": result["runs_ms"],
+            "heaviest": result["heaviest"],
+            "forbidden_imports": forbidden,
+        }
+
+        print(f"{module}: {result['total_ms']:.1f} ms (中央値, {args.repeat}回)")
+        for name, millis in result["heaviest"]:
+            print(f"    {millis:8.1f} ms  {name}")
+        if forbidden:
+            failures.append(f"{module} が {', '.join(forbidden)} を読み込んでいます")
+        if args.budget_ms is not None and module in ("main", "ui.main_window") \
+                and result["total_ms"] > args.budget_ms:
+            failures.append(f"{module} のインポート時間 {result['total_ms']:.1f} ms が上限 {args.budget_ms:.1f} ms を超えています")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for failure in failures:
+        print(f"NG: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+コエモジ∞ - コマンドライン版
+GUI（tkinter/PIL）を読み込まずに文字起こしを実行する。cronやキューのワーカーなどヘッドレス環境向け
+
+進捗と結果は1行1イベントのJSONとして標準出力に出力する
+
+使用例:
+    python cli.py recordings/ "meetings/**/*.mp4" --model small --language ja --workers 2
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import threading
+
+from transcriber import (
+    AUDIO_EXTENSIONS,
+    VIDEO_EXTENSIONS,
+    TranscriptionCancelled,
+    model_registry,
+)
+from batch_scheduler import BatchScheduler
+from utils.config_manager import ConfigManager
+from utils.transcript_cache import TranscriptCache
+from utils.profiling import JsonlSink, write_summary
+from utils.transcript_writer import OUTPUT_FORMATS, TranscriptStream, parse_output_formats, write_transcripts
+
+# 終了コード
+EXIT_OK = 0              # 全ファイルの文字起こしに成功
+EXIT_FAILED = 1          # 1つ以上のファイルで失敗
+EXIT_USAGE = 2           # 引数の誤り（argparseと同じ）
+EXIT_NO_INPUT = 3        # 処理対象のファイルが見つからない
+EXIT_INTERRUPTED = 130   # Ctrl+C / SIGINTで中断
+
+SUPPORTED_EXTENSIONS = AUDIO_EXTENSIONS + VIDEO_EXTENSIONS
+
+
+class JsonLinesReporter:
+    """イベントを1行ずつJSONで出力するクラス（複数のワーカースレッドから呼ばれる）"""
+
+    def __init__(self, stream=None):
+        """
+        初期化
+
+        Args:
+            stream (file, optional): 出力先 (None=標準出力)
+        """
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        """
+        イベントを出力
+
+        Args:
+            event (str): イベント名
+            **fields: イベントの内容
+        """
+        line = json.dumps({"event": event, "time": round(time.time(), 3), **fields}, ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def collect_files(inputs, recursive=False):
+    """
+    ファイル・ディレクトリ・globパターンから処理対象ファイルを集める
+
+    Args:
+        inputs (list): ファイルパス、ディレクトリ、globパターンのリスト
+        recursive (bool): ディレクトリをサブディレクトリまで探索するかどうか
+
+    Returns:
+        tuple: (対応形式のファイルのリスト, 見つからなかった入力のリスト)
+    """
+    files = []
+    missing = []
+
+    def is_supported(path):
+        return os.path.isfile(path) and os.path.splitext(path)[1].lower() in SUPPORTED_EXTENSIONS
+
+    for item in inputs:
+        if os.path.isdir(item):
+            if recursive:
+                found = [os.path.join(root, name) for root, _, names in os.walk(item) for name in names]
+            else:
+                found = [os.path.join(item, name) for name in os.listdir(item)]
+            matches = sorted(path for path in found if is_supported(path))
+        elif os.path.exists(item):
+            # 明示的に指定されたファイルは形式に関係なく渡し、非対応の場合はエラーとして報告する
+            matches = [item] if os.path.isfile(item) else []
+        elif glob.has_magic(item):
+            matches = sorted(path for path in glob.glob(item, recursive=True) if is_supported(path))
+        else:
+            matches = []
+
+        if not matches:
+            missing.append(item)
+        files.extend(matches)
+
+    # 重複を除く（最初に現れた順番を保つ）
+    unique = []
+    seen = set()
+    for path in files:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique, missing
+
+
+def _output_formats(value):
+    """--output-formatの値を出力形式のリストに変換（argparse用）"""
+    try:
+        return parse_output_formats(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def parse_args(argv, config):
+    """
+    コマンドライン引数を解析
+
+    Args:
+        argv (list): コマンドライン引数
+        config (dict): デフォルト値に使う設定
+
+    Returns:
+        argparse.Namespace: 解析結果
+    """
+    parser = argparse.ArgumentParser(
+        description="コエモジ∞の文字起こしをGUIなしで実行します。進捗はJSON Linesで標準出力に出力します。",
+    )
+    parser.add_argument("inputs", nargs="+", help="音声・動画ファイル、ディレクトリ、またはglobパターン")
+    parser.add_argument("--recursive", "-r", action="store_true", help="ディレクトリをサブディレクトリまで探索する")
+    parser.add_argument("--model", "-m", default=config.get("model", "tiny"), help="Whisperモデル名")
+    parser.add_argument("--language", "-l", default=config.get("language", "ja"),
+                        help="言語コード（空文字列で自動検出）")
+    parser.add_argument("--output-dir", "-o", default=None,
+                        help="出力ディレクトリ（省略時は設定ファイルの出力ディレクトリ）")
+    parser.add_argument("--output-format", "-f", type=_output_formats,
+                        default=config.get("output_format", "txt"),
+                        help=f"出力形式（カンマ区切りで複数指定可: {', '.join(OUTPUT_FORMATS)}）")
+    parser.add_argument("--workers", "-j", type=int, default=config.get("batch_workers", 1),
+                        help="同時に処理するファイル数")
+    parser.add_argument("--share-model", action=argparse.BooleanOptionalAction,
+                        default=config.get("share_model", False),
+                        help="並列処理時に1つのモデルを共有する")
+    parser.add_argument("--batch-size", type=int, default=config.get("decode_batch_size", 1),
+                        help="まとめて推論する30秒区間の数 (1=逐次)")
+    parser.add_argument("--vad", action=argparse.BooleanOptionalAction, default=config.get("vad_enabled", False),
+                        help="音声区間検出で無音区間をスキップする")
+    parser.add_argument("--int8", action=argparse.BooleanOptionalAction, default=config.get("cpu_int8_enabled", False),
+                        help="CPUではLinear層を動的int8量子化したモデルで推論する")
+    parser.add_argument("--no-cache", action="store_true", help="文字起こし結果キャッシュを使わない")
+    parser.add_argument("--profile-log", default=config.get("profile_log_path", ""),
+                        help="各段階の所要時間（スパン）をJSONLで追記するファイル")
+    parser.add_argument("--config", default="config.json", help="設定ファイルのパス（デフォルト値の読み込み元）")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1 or args.batch_size < 1:
+        parser.error("--workers と --batch-size には1以上の整数を指定してください")
+    return args
+
+
+def _config_path(argv):
+    """--config の値だけを先に取り出す（他の引数のデフォルト値を設定ファイルから決めるため）"""
+    pre_parser = argparse.ArgumentParser(add_help=False)
+    pre_parser.add_argument("--config", default="config.json")
+    known, _ = pre_parser.parse_known_args(argv)
+    return known.config
+
+
+def main(argv=None):
+    """
+    CLIのエントリーポイント
+
+    Args:
+        argv (list, optional): コマンドライン引数 (None=sys.argv)
+
+    Returns:
+        int: 終了コード
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    config_manager = ConfigManager(_config_path(argv))
+    # 2回目のCtrl+Cで処理の完了を待たずに終了する場合も、溜まっている履歴や統計情報を必ず書き込む
+    closers = []
+    try:
+        return _run(argv, config_manager, closers)
+    finally:
+        for close in reversed(closers):
+            close()
+        config_manager.close()
+
+
+def _run(argv, config_manager, closers):
+    """
+    文字起こしを実行
+
+    Args:
+        argv (list): コマンドライン引数
+        config_manager (ConfigManager): 設定と履歴の管理
+        closers (list): 終了時に呼ぶ関数（開いたキャッシュなどの後始末を追加していく）
+
+    Returns:
+        int: 終了コード
+    """
+    config = config_manager.get_config()
+    args = parse_args(argv, config)
+
+    reporter = JsonLinesReporter()
+    files, missing = collect_files(args.inputs, recursive=args.recursive)
+    for item in missing:
+        reporter.emit("missing", input=item)
+    if not files:
+        reporter.emit("done", total=0, succeeded=0, failed=0, cancelled=0, elapsed=0.0)
+        return EXIT_NO_INPUT
+
+    output_dir = args.output_dir or config_manager.get_output_directory()
+    language = args.language or None
+    model_registry.set_memory_budget(config.get("model_memory_budget_mb", 4096))
+
+    cache = None
+    if not args.no_cache and config.get("transcript_cache_enabled", True):
+        cache = TranscriptCache(config["transcript_cache_directory"], config.get("transcript_cache_max_mb", 512))
+        closers.append(cache.close)
+
+    counts = {"succeeded": 0, "failed": 0, "cancelled": 0}
+    cancel_event = threading.Event()
+
+    def on_progress(index, status, progress):
+        reporter.emit("progress", index=index, file=files[index], status=status, progress=progress)
+
+    # 文字起こし中のファイルごとの書きかけの出力ファイル
+    streams = {}
+    stream_lock = threading.Lock()
+
+    def on_segments(index, segments):
+        with stream_lock:
+            if index not in streams:
+                try:
+                    streams[index] = TranscriptStream(files[index], output_dir, args.model, language,
+                                                      args.output_format)
+                except OSError:
+                    # 完了時にまとめて保存する
+                    streams[index] = None
+            stream = streams[index]
+            if stream is not None:
+                try:
+                    stream.write(segments)
+                except OSError:
+                    stream.close(keep=True)
+                    streams[index] = None
+
+    def on_result(index, file_path, result, error):
+        with stream_lock:
+            stream = streams.pop(index, None)
+        if error is not None and stream is not None:
+            # キャンセルされた場合は書きかけのファイルを削除し、エラーの場合はそこまでの結果として残す
+            stream.close(keep=not isinstance(error, TranscriptionCancelled))
+        if isinstance(error, TranscriptionCancelled):
+            counts["cancelled"] += 1
+            reporter.emit("result", index=index, file=file_path, status="cancelled")
+            return
+        if error is None:
+            try:
+                profile = result.get("profile")
+                result = {k: v for k, v in result.items() if k != "profile"}
+                if stream is not None:
+                    output_files = stream.finish(result)
+                else:
+                    output_files = write_transcripts(result, file_path, output_dir, args.model, language,
+                                                     args.output_format)
+                # 最初の形式のファイルを代表として履歴と集計に使う
+                output_file = next(iter(output_files.values()))
+                if profile is not None:
+                    write_summary(profile, output_file)
+                content_hash = cache.fingerprint(file_path) if cache is not None else None
+                config_manager.add_to_history(file_path, output_file, model=args.model, language=language,
+                                              content_hash=content_hash, text=result.get("text"),
+                                              segments=result.get("segments"))
+            except Exception as e:
+                if stream is not None:
+                    stream.close(keep=True)
+                error = Exception(f"保存中にエラーが発生しました - {e}")
+        if error is not None:
+            counts["failed"] += 1
+            reporter.emit("result", index=index, file=file_path, status="error", error=str(error))
+            return
+        counts["succeeded"] += 1
+        reporter.emit("result", index=index, file=file_path, status="ok", output=output_file,
+                      outputs=output_files, language=result.get("language"), segments=len(result.get("segments", [])))
+
+    profile_sink = None
+    if args.profile_log:
+        profile_sink = JsonlSink(args.profile_log)
+        closers.append(profile_sink.close)
+
+    scheduler = BatchScheduler(
+        files,
+        model_name=args.model,
+        language=language,
+        num_workers=args.workers,
+        share_model=args.share_model,
+        batch_size=args.batch_size,
+        vad=args.vad,
+        quantize=args.int8,
+        profile_sink=profile_sink,
+        cache=cache,
+        cancel_check=cancel_event.is_set,
+        on_progress=on_progress,
+        on_result=on_result,
+        on_segments=on_segments,
+    )
+
+    reporter.emit("start", total=len(files), model=args.model, language=language,
+                  output_dir=os.path.abspath(output_dir), workers=scheduler.num_workers,
+                  share_model=scheduler.share_model)
+    start_time = time.perf_counter()
+
+    # Ctrl+Cを受け取れるようにメインスレッドでは待機だけを行う
+    worker = threading.Thread(target=scheduler.run, daemon=True)
+    worker.start()
+    while worker.is_alive():
+        try:
+            worker.join(timeout=0.5)
+        except KeyboardInterrupt:
+            if cancel_event.is_set():
+                # 2回目のCtrl+Cで処理の完了を待たずに終了
+                return EXIT_INTERRUPTED
+            cancel_event.set()
+            reporter.emit("cancelling")
+
+    # キャンセルで処理されなかったファイル
+    counts["cancelled"] += len(files) - sum(counts.values())
+    fields = dict(total=len(files), elapsed=round(time.perf_counter() - start_time, 3), **counts)
+    if cache is not None:
+        fields["cache_hit_rate"] = cache.stats()["hit_rate"]
+    reporter.emit("done", **fields)
+
+    if cancel_event.is_set():
+        return EXIT_INTERRUPTED
+    if counts["failed"] or missing:
+        return EXIT_FAILED
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,7 +10,6 @@ import os
 import sys
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from PIL import Image, ImageTk
 import threading
 import json
 import datetime
@@ -18,10 +17,11 @@ import tempfile
 import ctypes
 
 # 自作モジュールのインポート
-from transcriber import VideoTranscriber
+# transcriber（torch/whisper）はウィンドウ表示後にMainWindowがバックグラウンドで読み込む
 from ui.main_window import MainWindow
 from ui.settings_window import SettingsWindow
 from utils.config_manager import ConfigManager
+from utils.icon_cache import icon_cache
 
 # モダンなカラーパレット定義
 COLORS = {
@@ -39,13 +39,13 @@ COLORS = {
 }
 
 def create_app_icon():
-    """アプリケーションアイコンを作成"""
+    """
+    アプリケーションアイコンを作成（ロゴ画像が変わっていなければキャッシュ済みのICOを使う）
+    
+    Returns:
+        str: ICOファイルのパス（作成できなかった場合はNone）
+    """
     try:
-        # アイコンファイルの保存先
-        icon_path = os.path.join("resources", "app_icon.ico")
-        
-        # アイコンがすでに存在する場合でも、高品質なアイコンを確保するために再作成する
-        
         # ロゴ画像の候補
         logo_paths = [
             os.path.join("resources", "koemoji-infinity-logo.png"),  # 高解像度を優先
@@ -63,62 +63,9 @@ def create_app_icon():
         if not logo_path:
             print("ロゴ画像が見つかりませんでした")
             return None
-            
-        # PNGからICOを作成
-        from PIL import Image, ImageEnhance
-        img = Image.open(logo_path)
-        
-        # 背景が透明でない場合は透明な背景を作成
-        if img.mode != 'RGBA':
-            img = img.convert('RGBA')
-            
-        # コントラストとシャープネスを少し上げて鮮明にする
-        enhancer = ImageEnhance.Contrast(img)
-        img = enhancer.enhance(1.2)  # コントラストを20%上げる
-        
-        enhancer = ImageEnhance.Sharpness(img)
-        img = enhancer.enhance(1.5)  # シャープネスを50%上げる
-        
-        # 複数サイズのアイコンを作成（Windows推奨サイズ）
-        sizes = [(16, 16), (24, 24), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)]
-        icon_images = []
         
-        for size in sizes:
-            # アイコン用の新しい正方形画像を作成 (透明背景)
-            square_img = Image.new('RGBA', size, (0, 0, 0, 0))
-            
-            # 小さいサイズほどアンチエイリアスを調整
-            if size[0] <= 32:
-                # 元画像を一度大きめにリサイズしてからシャープネスを上げる (小さいアイコン向け)
-                temp_size = (size[0] * 3, size[1] * 3)
-                temp_img = img.resize(temp_size, Image.LANCZOS)
-                
-                # シャープネスを上げる
-                enhancer = ImageEnhance.Sharpness(temp_img)
-                temp_img = enhancer.enhance(2.0)  # 小さいアイコンは特にシャープに
-                
-                # 最終サイズにリサイズ
-                resized_img = temp_img.resize(size, Image.LANCZOS)
-            else:
-                # 大きめのアイコンは直接リサイズ
-                resized_img = img.resize(size, Image.LANCZOS)
-            
-            # 中央に配置
-            paste_x = (size[0] - resized_img.width) // 2
-            paste_y = (size[1] - resized_img.height) // 2
-            square_img.paste(resized_img, (paste_x, paste_y), resized_img)
-            
-            # 透明度をさらに確実にする
-            r, g, b, a = square_img.split()
-            square_img = Image.merge("RGBA", (r, g, b, a))
-            
-            icon_images.append(square_img)
-        
-        # 複数サイズを含むICOとして保存
-        icon_images[0].save(icon_path, format='ICO', sizes=[(img.size[0], img.size[1]) for img in icon_images], quality=100)
-        print(f"超高品質アプリケーションアイコンを作成しました: {icon_path}")
-        
-        return icon_path
+        # 元画像のハッシュと更新日時をキーにキャッシュされたICOを使う（なければ作成）
+        return icon_cache.get_app_icon(logo_path)
     except Exception as e:
         print(f"アイコン作成エラー: {e}")
         return None
@@ -217,12 +164,11 @@ def main():
             except Exception as e:
                 print(f"iconbitmapエラー: {e}")
         
-        # 方法2: Tkinterの標準的な方法
+        # 方法2: Tkinterの標準的な方法（MainWindowでも同じPhotoImageを再利用する）
         logo_path = "resources/koemoji-infinity-logo-48x48 px.png"
         if os.path.exists(logo_path):
             try:
-                icon_img = Image.open(logo_path)
-                icon_photo = ImageTk.PhotoImage(icon_img)
+                icon_photo = icon_cache.get_photo(logo_path)
                 root.iconphoto(True, icon_photo)
                 # サブウィンドウでアイコンを再利用するためにプロパティとして保存
                 root.iconphoto_master = icon_photo
@@ -235,10 +181,8 @@ def main():
                     # 代替ロゴを使用
                     alt_logo_path = "resources/koemoji-infinity-logo.png"
                     if os.path.exists(alt_logo_path):
-                        icon_img = Image.open(alt_logo_path)
                         # 適切なサイズにリサイズ
-                        icon_img = icon_img.resize((48, 48), Image.LANCZOS)
-                        icon_photo = ImageTk.PhotoImage(icon_img)
+                        icon_photo = icon_cache.get_photo(alt_logo_path, size=(48, 48))
                         root.iconphoto(True, icon_photo)
                         root.iconphoto_master = icon_photo
                         print(f"代替アイコンを設定しました: {alt_logo_path}")
@@ -252,6 +196,9 @@ def main():
     
     # アプリケーションの実行
     root.mainloop()
+    
+    # 溜まっている履歴を書き込む
+    config_manager.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -8,13 +8,14 @@
 """
 
 import os
-import tempfile
 import subprocess
 import sys
-import datetime
+import time
+import tempfile
+import contextlib
 
-# Whisperモジュールのパスを追加
-whisper_path = os.path.join(os.path.dirname(__file__), "whisper-main")
+# Whisperモジュールのパスを追加（同梱版のWhisperをインストール版より優先する）
+whisper_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive", "whisper-main")
 if whisper_path not in sys.path:
     sys.path.insert(0, whisper_path)
 
@@ -23,14 +24,104 @@ FFMPEG_PATH = "ffmpeg"  # デフォルトはコマンド名のみ
 # Windowsの場合はFFmpegの絶対パスを指定することもできます
 # FFMPEG_PATH = r"C:\ffmpeg\bin\ffmpeg.exe"  # 必要に応じてコメントを外して正しいパスを設定
 
+import numpy as np
 import whisper
 import torch
 from tqdm import tqdm
 
+from utils.model_registry import ModelRegistry
+from utils.profiling import Profiler
+from utils.transcript_writer import format_time
+
+
+def _load_whisper_model(model_name, device, dtype):
+    """
+    レジストリ用のモデルロード関数
+
+    Args:
+        model_name (str): Whisperモデル名
+        device (str): デバイス名
+        dtype (str): モデルのデータ型 (float32, float16, int8)
+            int8の場合はLinear層を動的int8量子化したCPU用モデルをロードする
+            （量子化済みのモデルはディスクにキャッシュされ、2回目以降は量子化をやり直さない）
+
+    Returns:
+        whisper.model.Whisper: ロードしたモデル
+    """
+    if dtype == "int8":
+        return whisper.load_model(model_name, device="cpu", quantize=True)
+    model = whisper.load_model(model_name, device=device)
+    if dtype == "float16":
+        model = model.half()
+    return model
+
+
+# プロセス全体で共有するモデルレジストリ
+model_registry = ModelRegistry(loader=_load_whisper_model)
+
+# 対応するファイル拡張子
+AUDIO_EXTENSIONS = ['.mp3', '.wav', '.flac', '.ogg']
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm']
+
+
+def _device_and_dtype(quantize=False):
+    """
+    推論に使うデバイスとモデルのデータ型を決定
+    
+    Args:
+        quantize (bool): CPUではLinear層を動的int8量子化したモデルを使うかどうか（GPUでは無視）
+        
+    Returns:
+        tuple: (デバイス名, データ型)
+    """
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    return device, "int8" if quantize and device == "cpu" else "float32"
+
+
+def replicas_fit(model_name, replicas, quantize=False):
+    """
+    並列処理用にモデルをreplicas個複製してもレジストリのメモリ予算に収まるかを確認
+    
+    Args:
+        model_name (str): Whisperモデル名
+        replicas (int): 複製する数
+        quantize (bool): 量子化したモデルを使うかどうか
+        
+    Returns:
+        bool: 収まる場合はTrue
+    """
+    device, dtype = _device_and_dtype(quantize)
+    return model_registry.fits(model_name, device=device, dtype=dtype, replicas=replicas)
+
+
+class TranscriptionCancelled(Exception):
+    """文字起こしがキャンセルされたことを示す例外"""
+
+
+def create_transcriber(file_path, **kwargs):
+    """
+    ファイルの種類に応じたトランスクライバーを作成
+    
+    Args:
+        file_path (str): 処理対象ファイルのパス
+        **kwargs: トランスクライバーのコンストラクタ引数
+        
+    Returns:
+        BaseTranscriber: トランスクライバー (非対応の形式の場合はNone)
+    """
+    file_extension = os.path.splitext(file_path)[1].lower()
+    if file_extension in VIDEO_EXTENSIONS:
+        return VideoTranscriber(**kwargs)
+    if file_extension in AUDIO_EXTENSIONS:
+        return AudioTranscriber(**kwargs)
+    return None
+
 class BaseTranscriber:
     """文字起こしの基本クラス"""
     
-    def __init__(self, model_name="small", language=None, callback=None):
+    def __init__(self, model_name="small", language=None, callback=None, streaming=True,
+                 cancel_check=None, inference_lock=None, replica=0, batch_size=1, vad=False,
+                 quantize=False, profile_sink=None, on_segments=None):
         """
         初期化
         
@@ -38,56 +129,248 @@ class BaseTranscriber:
             model_name (str): Whisperモデル名 (tiny, base, small, medium, large)
             language (str, optional): 言語コード (None=自動検出)
             callback (function, optional): 進捗報告用コールバック関数
+            streaming (bool): Trueの場合、音声全体をメモリに展開せずに少しずつデコードしながら文字起こしする
+            cancel_check (function, optional): Trueを返すと処理を中断する関数（ストリーミング時はウィンドウ単位で確認）
+            inference_lock (threading.Lock, optional): モデルを複数スレッドで共有する場合の推論ロック
+            replica (int): レジストリから借用するモデルの複製番号
+            batch_size (int): 2以上の場合、30秒ウィンドウをこの数ずつまとめてエンコード・デコードする
+                （前のウィンドウのテキストをプロンプトに使わない代わりに推論のスループットが上がる）
+            vad (bool): Trueの場合、音声区間検出で無音区間をエンコーダーに渡す前にスキップする
+            quantize (bool): Trueの場合、CPUではLinear層を動的int8量子化したモデルで推論する（GPUでは無視）
+            profile_sink (MemorySink or JsonlSink, optional): 各段階の所要時間（スパン）の送り先
+            on_segments (function, optional): 30秒ウィンドウごとに確定したセグメントのリストを受け取る関数
+                （推論スレッドから呼ばれる）
         """
         self.model_name = model_name
         self.language = language
         self.callback = callback
+        self.streaming = streaming
+        self.cancel_check = cancel_check
+        self.inference_lock = inference_lock
+        self.replica = replica
+        self.batch_size = max(1, batch_size)
+        self.vad = vad
         self.model = None
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device, self.dtype = _device_and_dtype(quantize)
+        self.quantize = self.dtype == "int8"
+        # 段階ごとの所要時間（結果の"profile"に集計を入れる）
+        self.profiler = Profiler(sink=profile_sink)
+        self.on_segments = on_segments
+    
+    def _check_cancel(self):
+        """キャンセルが要求されていれば例外を送出"""
+        if self.cancel_check and self.cancel_check():
+            raise TranscriptionCancelled("文字起こしがキャンセルされました")
+    
+    def _cancellable(self, chunks):
+        """
+        チャンクを取り出すたびにキャンセルを確認するイテレータでラップ
+        
+        Args:
+            chunks (iterator): 波形チャンクのイテレータ
+            
+        Yields:
+            numpy.ndarray: 波形チャンク
+        """
+        chunks = iter(chunks)
+        while True:
+            # FFmpegの出力（または先読み）を待った時間を音声抽出として記録
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            if chunk is None:
+                return
+            self.profiler.add("extract", time.perf_counter() - start, samples=len(chunk))
+            self._check_cancel()
+            yield chunk
+        
+    def load_model(self, pin=False):
+        """
+        Whisperモデルをロード（ロード済みの場合はレジストリから借用）
         
-    def load_model(self):
-        """Whisperモデルをロード"""
+        Args:
+            pin (bool): Trueの場合はrelease_modelを呼ぶまでレジストリから解放されないように固定する
+        """
         if self.callback:
             self.callback(status="モデルをロード中...", progress=0)
         
         try:
-            self.model = whisper.load_model(self.model_name, device=self.device)
+            with self.profiler.span("load_model", model=self.model_name, dtype=self.dtype):
+                self.model = model_registry.get(self.model_name, device=self.device, dtype=self.dtype,
+                                                replica=self.replica, pin=pin)
             
             if self.callback:
                 self.callback(status="モデルのロード完了", progress=10)
         except Exception as e:
             raise Exception(f"モデルのロードに失敗しました: {e}")
     
-    def transcribe_audio(self, audio_path):
+    def release_model(self):
+        """load_model(pin=True)で固定したモデルの固定を外す"""
+        if self.model is not None:
+            model_registry.unpin(self.model_name, device=self.device, dtype=self.dtype, replica=self.replica)
+    
+    def _ffmpeg_command(self, file_path):
         """
-        音声ファイルを文字起こし
+        16kHzモノラルのs16le PCMを標準出力に書き出すFFmpegコマンドを作成
         
         Args:
-            audio_path (str): 音声ファイルのパス
+            file_path (str): 音声・動画ファイルのパス
             
         Returns:
-            dict: 文字起こし結果
+            list: コマンド引数のリスト
+        """
+        return [FFMPEG_PATH, "-nostdin", "-threads", "0", "-i", file_path,
+                "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(whisper.audio.SAMPLE_RATE), "-"]
+    
+    def stream_audio(self, file_path, chunk_samples=whisper.audio.N_SAMPLES):
+        """
+        FFmpegの出力を少しずつ読み込み、float32の波形チャンクを順に返す
+        
+        Args:
+            file_path (str): 音声・動画ファイルのパス
+            chunk_samples (int): 1チャンクあたりのサンプル数
+            
+        Yields:
+            numpy.ndarray: float32の波形チャンク
+        """
+        try:
+            # エラー出力でパイプが詰まらないよう一時ファイルに逃がす
+            with tempfile.TemporaryFile() as stderr:
+                process = subprocess.Popen(self._ffmpeg_command(file_path), stdout=subprocess.PIPE, stderr=stderr)
+                try:
+                    while True:
+                        data = process.stdout.read(chunk_samples * 2)
+                        if not data:
+                            break
+                        data = data[:len(data) - len(data) % 2]
+                        yield np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+                finally:
+                    # 途中で中断された場合はFFmpegを終了させる
+                    if process.poll() is None:
+                        process.kill()
+                    process.stdout.close()
+                    returncode = process.wait()
+                
+                if returncode != 0:
+                    stderr.seek(0)
+                    raise Exception(f"音声のデコードに失敗しました: {stderr.read().decode(errors='replace').strip()}")
+        except FileNotFoundError:
+            raise Exception("FFmpegが見つかりません。FFmpegをインストールして環境変数に追加してください。")
+    
+    def decode_audio(self, file_path):
+        """
+        FFmpegでファイルを16kHzモノラルのPCMに一度だけデコードする
+        一時WAVファイルを経由せず、標準出力から直接メモリに読み込む
+        
+        Args:
+            file_path (str): 音声・動画ファイルのパス
+            
+        Returns:
+            numpy.ndarray: int16のPCMサンプル列
+        """
+        try:
+            # FFmpegコマンドを実行（s16leの生PCMを標準出力へ）
+            process = subprocess.run(
+                self._ffmpeg_command(file_path),
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+        except subprocess.CalledProcessError as e:
+            raise Exception(f"音声のデコードに失敗しました: {e.stderr.decode(errors='replace').strip()}")
+        except FileNotFoundError:
+            raise Exception("FFmpegが見つかりません。FFmpegをインストールして環境変数に追加してください。")
+        
+        # bytesをコピーせずにint16配列として参照
+        return np.frombuffer(process.stdout, dtype=np.int16)
+    
+    def _report_progress(self, source_name, progress):
         """
+        transcribe()の進捗（ウィンドウごと）を40〜90%の範囲に換算してコールバックに渡す
+        
+        Args:
+            source_name (str): ステータス表示用のファイル名
+            progress (whisper.transcribe.TranscriptionProgress): 処理済みフレーム数・セグメント数・経過時間
+        """
+        if not self.callback:
+            return
+        
+        position = format_time(progress.frames / whisper.audio.FRAMES_PER_SECOND)
+        if progress.total_frames is not None:
+            position += f" / {format_time(progress.total_frames / whisper.audio.FRAMES_PER_SECOND)}"
+        status = f"文字起こし中: {source_name} {position}（{progress.segments}セグメント"
+        if progress.realtime_factor:
+            status += f"、{1 / progress.realtime_factor:.1f}倍速"
+        if progress.eta is not None:
+            status += f"、残り約{format_time(progress.eta)}"
+        status += "）"
+        
+        fraction = progress.fraction
+        self.callback(status=status, progress=40 + 50 * fraction if fraction is not None else 40)
+    
+    def transcribe_audio(self, audio, source_name=None):
+        """
+        音声を文字起こし
+        
+        Args:
+            audio (str, numpy.ndarray or iterator): 音声ファイルのパス、decode_audioで得たint16のPCM、
+                またはstream_audioで得た波形チャンクのイテレータ
+            source_name (str, optional): ステータス表示用のファイル名
+            
+        Returns:
+            dict: 文字起こし結果（"profile"に段階ごとの所要時間の集計を含む）
+        """
+        if source_name is None:
+            source_name = os.path.basename(audio) if isinstance(audio, str) else "音声データ"
         if self.callback:
-            self.callback(status=f"文字起こし中: {os.path.basename(audio_path)}", progress=40)
+            self.callback(status=f"文字起こし中: {source_name}", progress=40)
         
         # モデルがロードされていない場合はロード
         if self.model is None:
             self.load_model()
         
+        # int16のPCMはWhisperが期待するfloat32の波形に変換
+        if isinstance(audio, np.ndarray) and audio.dtype == np.int16:
+            audio = audio.astype(np.float32) / 32768.0
+        # 波形チャンクのイテレータはウィンドウの進行に合わせてメルスペクトログラムを計算する
+        elif not isinstance(audio, (str, np.ndarray, torch.Tensor)):
+            audio = whisper.audio.LogMelStream(
+                self._cancellable(audio), n_mels=self.model.dims.n_mels, padding=whisper.audio.N_SAMPLES
+            )
+        
         # 文字起こしオプション
         options = {}
         if self.language:
             options["language"] = self.language
+        if self.vad:
+            options["vad"] = True
+        # メルスペクトログラム、ウィンドウごとのエンコード・デコード、アライメントの所要時間を記録
+        options["span"] = self.profiler.span
+        # ウィンドウごとの進捗（処理済みの時間、セグメント数、速度、残り時間）
+        options["progress"] = lambda progress: self._report_progress(source_name, progress)
+        # 確定したセグメントを順に渡す（出力ファイルへの追記や結果ウィンドウへの表示用）
+        if self.on_segments:
+            options["on_segments"] = self.on_segments
         
         try:
-            # 文字起こし実行
-            result = self.model.transcribe(audio_path, **options)
+            # 文字起こし実行（モデル共有時は推論ロックで排他）
+            with self.inference_lock or contextlib.nullcontext():
+                self._check_cancel()
+                with self.profiler.span("transcribe", batch_size=self.batch_size):
+                    if self.batch_size > 1:
+                        result = self.model.transcribe_batched(audio, batch_size=self.batch_size, **options)
+                    else:
+                        result = self.model.transcribe(audio, **options)
+            result["profile"] = self.profiler.summary()
             
             if self.callback:
-                self.callback(status="文字起こし完了", progress=90)
+                status = "文字起こし完了"
+                if "vad" in result:
+                    status += f"（無音 {result['vad']['skipped']:.1f}秒をスキップ）"
+                self.callback(status=status, progress=90)
                 
             return result
+        except TranscriptionCancelled:
+            raise
         except Exception as e:
             raise Exception(f"文字起こしに失敗しました: {e}")
 
@@ -102,62 +385,44 @@ class VideoTranscriber(BaseTranscriber):
             video_path (str): 動画ファイルのパス
             
         Returns:
-            str: 抽出した音声ファイルのパス
+            numpy.ndarray: 抽出した16kHzモノラルのint16 PCM
         """
         if self.callback:
             self.callback(status=f"音声を抽出中: {os.path.basename(video_path)}", progress=20)
         
-        # 一時ファイルを作成
-        temp_dir = tempfile.gettempdir()
-        # ファイル名から無効な文字を削除し、安全なファイル名を生成
-        base_name = os.path.splitext(os.path.basename(video_path))[0]
-        # 無効な文字を置換
-        safe_name = "".join([c if c.isalnum() or c in ['-', '_', '.'] else '_' for c in base_name])
-        # 一意のファイル名を生成するために現在時刻を追加
-        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        audio_path = os.path.join(temp_dir, f"{safe_name}_{timestamp}.wav")
-        
-        # FFmpegを使用して音声を抽出
         try:
-            # FFmpegコマンドを実行
-            subprocess.run(
-                [FFMPEG_PATH, "-i", video_path, "-ar", "16000", "-ac", "1", "-c:a", "pcm_s16le", "-y", audio_path],
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-        except subprocess.CalledProcessError as e:
+            with self.profiler.span("extract"):
+                audio = self.decode_audio(video_path)
+        except Exception as e:
             raise Exception(f"音声抽出に失敗しました: {e}")
-        except FileNotFoundError:
-            raise Exception("FFmpegが見つかりません。FFmpegをインストールして環境変数に追加してください。")
         
         if self.callback:
             self.callback(status="音声抽出完了", progress=30)
             
-        return audio_path
+        return audio
     
-    def process_video(self, video_path):
+    def process_video(self, video_path, audio_chunks=None):
         """
         動画ファイルを処理して文字起こしを行う
         
         Args:
             video_path (str): 動画ファイルのパス
+            audio_chunks (iterator, optional): 先行してデコード済みの波形チャンク（ストリーミング時のみ使用）
             
         Returns:
             dict: 文字起こし結果
         """
+        self.profiler.context["file"] = os.path.basename(video_path)
         try:
-            # 音声抽出
-            audio_path = self.extract_audio(video_path)
+            if self.streaming:
+                # デコードしながら文字起こし（音声全体をメモリに保持しない）
+                audio = audio_chunks if audio_chunks is not None else self.stream_audio(video_path)
+            else:
+                # 音声抽出
+                audio = self.extract_audio(video_path)
             
             # 文字起こし
-            result = self.transcribe_audio(audio_path)
-            
-            # 一時ファイルを削除
-            try:
-                os.remove(audio_path)
-            except:
-                pass
+            result = self.transcribe_audio(audio, source_name=os.path.basename(video_path))
             
             if self.callback:
                 self.callback(status="処理完了", progress=100)
@@ -169,73 +434,59 @@ class VideoTranscriber(BaseTranscriber):
                 self.callback(status=f"エラー: {str(e)}", progress=-1)
             raise
 
+    def process_file(self, video_path, audio_chunks=None):
+        """動画ファイルを処理（create_transcriberの戻り値を共通に扱うための別名）"""
+        return self.process_video(video_path, audio_chunks=audio_chunks)
+
 class AudioTranscriber(BaseTranscriber):
     """音声ファイルから直接文字起こしを行うクラス"""
     
     def preprocess_audio(self, audio_path):
         """
-        音声ファイルを前処理（必要に応じてフォーマット変換）
+        音声ファイルを前処理（16kHzモノラルのPCMにデコード）
         
         Args:
             audio_path (str): 音声ファイルのパス
             
         Returns:
-            str: 処理済み音声ファイルのパス
+            numpy.ndarray: 処理済みの16kHzモノラルのint16 PCM
         """
         if self.callback:
             self.callback(status=f"音声ファイルを処理中: {os.path.basename(audio_path)}", progress=20)
         
-        # 一時ファイルを作成
-        temp_dir = tempfile.gettempdir()
-        # ファイル名から無効な文字を削除し、安全なファイル名を生成
-        base_name = os.path.splitext(os.path.basename(audio_path))[0]
-        # 無効な文字を置換
-        safe_name = "".join([c if c.isalnum() or c in ['-', '_', '.'] else '_' for c in base_name])
-        # 一意のファイル名を生成するために現在時刻を追加
-        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        processed_audio_path = os.path.join(temp_dir, f"{safe_name}_{timestamp}.wav")
-        
-        # FFmpegを使用して音声を変換（サンプリングレートとチャンネル数を調整）
         try:
-            # FFmpegコマンドを実行
-            subprocess.run(
-                [FFMPEG_PATH, "-i", audio_path, "-ar", "16000", "-ac", "1", "-c:a", "pcm_s16le", "-y", processed_audio_path],
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-        except subprocess.CalledProcessError as e:
+            with self.profiler.span("extract"):
+                audio = self.decode_audio(audio_path)
+        except Exception as e:
             raise Exception(f"音声処理に失敗しました: {e}")
-        except FileNotFoundError:
-            raise Exception("FFmpegが見つかりません。FFmpegをインストールして環境変数に追加してください。")
         
         if self.callback:
             self.callback(status="音声処理完了", progress=30)
             
-        return processed_audio_path
+        return audio
     
-    def process_audio(self, audio_path):
+    def process_audio(self, audio_path, audio_chunks=None):
         """
         音声ファイルを処理して文字起こしを行う
         
         Args:
             audio_path (str): 音声ファイルのパス
+            audio_chunks (iterator, optional): 先行してデコード済みの波形チャンク（ストリーミング時のみ使用）
             
         Returns:
             dict: 文字起こし結果
         """
+        self.profiler.context["file"] = os.path.basename(audio_path)
         try:
-            # 音声前処理
-            processed_audio_path = self.preprocess_audio(audio_path)
+            if self.streaming:
+                # デコードしながら文字起こし（音声全体をメモリに保持しない）
+                audio = audio_chunks if audio_chunks is not None else self.stream_audio(audio_path)
+            else:
+                # 音声前処理
+                audio = self.preprocess_audio(audio_path)
             
             # 文字起こし
-            result = self.transcribe_audio(processed_audio_path)
-            
-            # 一時ファイルを削除
-            try:
-                os.remove(processed_audio_path)
-            except:
-                pass
+            result = self.transcribe_audio(audio, source_name=os.path.basename(audio_path))
             
             if self.callback:
                 self.callback(status="処理完了", progress=100)
@@ -245,4 +496,8 @@ class AudioTranscriber(BaseTranscriber):
         except Exception as e:
             if self.callback:
                 self.callback(status=f"エラー: {str(e)}", progress=-1)
-            raise 
\ No newline at end of file
+            raise
+    
+    def process_file(self, audio_path, audio_chunks=None):
+        """音声ファイルを処理（create_transcriberの戻り値を共通に扱うための別名）"""
+        return self.process_audio(audio_path, audio_chunks=audio_chunks)
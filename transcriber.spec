@@ -4,11 +4,12 @@ block_cipher = None
 
 a = Analysis(
     ['main.py'],
-    pathex=[],
+    pathex=['archive/whisper-main'],
     binaries=[],
     datas=[
         ('resources', 'resources'),
         ('config.json', '.'),
+        ('archive/whisper-main/whisper/assets', 'whisper/assets'),
     ],
     hiddenimports=[],
     hookspath=[],
@@ -9,13 +9,16 @@
 import os
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from PIL import Image, ImageTk
 import threading
-import datetime
+import time
 
-from transcriber import VideoTranscriber, AudioTranscriber
 from ui.settings_window import SettingsWindow
 from ui.result_window import ResultWindow
+from ui.search_window import SearchResultsWindow
+from utils.transcript_cache import TranscriptCache
+from utils.transcript_writer import write_transcripts, TranscriptStream
+from utils.profiling import JsonlSink, write_summary
+from utils.icon_cache import icon_cache
 
 # モダンなカラーパレット定義
 COLORS = {
@@ -47,6 +50,50 @@ ICONS = {
     "cancel": "\u2715",             # ✕ キャンセルアイコン
 }
 
+# 進捗表示を更新する最短間隔（ミリ秒）
+PROGRESS_INTERVAL_MS = 100
+
+
+class CoalescingChannel:
+    """ワーカースレッドからの更新を最新の1件にまとめ、Tkのイベントループへ間引いて渡すクラス"""
+    
+    def __init__(self, root, handler, interval_ms=PROGRESS_INTERVAL_MS):
+        """
+        初期化
+        
+        Args:
+            root (tk.Tk): ルートウィンドウ
+            handler (function): メインスレッドで最新の値を受け取る関数
+            interval_ms (int): handlerを呼び出す最短間隔（ミリ秒）
+        """
+        self.root = root
+        self.handler = handler
+        self.interval_ms = interval_ms
+        self._lock = threading.Lock()
+        self._latest = None
+        self._scheduled = False
+    
+    def put(self, *args):
+        """
+        値を送る（どのスレッドからでも呼べる）
+        
+        反映待ちの値があれば上書きし、root.afterの予約は1件だけにする
+        """
+        with self._lock:
+            self._latest = args
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.root.after(self.interval_ms, self._flush)
+    
+    def _flush(self):
+        """最新の値をhandlerに渡す（メインスレッドから呼び出される）"""
+        with self._lock:
+            args = self._latest
+            self._scheduled = False
+        self.handler(*args)
+
+
 class MainWindow:
     """アプリケーションのメインウィンドウクラス"""
     
@@ -63,6 +110,10 @@ class MainWindow:
         self.files = []  # 処理対象ファイルリスト
         self.is_processing = False  # 処理中フラグ
         self.cancel_flag = False  # キャンセルフラグ
+        # ワーカースレッドからの進捗をまとめてGUIに反映する
+        self.progress_channel = CoalescingChannel(root, self._update_progress_gui)
+        # 全文検索の結果ウィンドウ（次の検索でも使い回す）
+        self.search_window = None
         
         # ウィンドウの設定
         self.root.title("コエモジ∞")
@@ -93,9 +144,47 @@ class MainWindow:
         
         # 初期ステータス表示
         self._update_status("ファイルを追加して文字起こしを開始してください")
+        
+        # 文字起こしエンジン（torch/whisper）は起動を速くするため初回描画の後にバックグラウンドで読み込む
+        self.engine_ready = threading.Event()
+        self.engine_error = None
+        self.root.after(100, self._start_engine_loading)
+    
+    def _start_engine_loading(self):
+        """文字起こしエンジンの読み込みスレッドを開始"""
+        self._update_engine_status("文字起こしエンジン: 読み込み中...")
+        thread = threading.Thread(target=self._load_engine)
+        thread.daemon = True
+        thread.start()
+    
+    def _load_engine(self):
+        """torch/whisperを含む文字起こしエンジンのモジュールを読み込む（バックグラウンドスレッド）"""
+        start_time = time.perf_counter()
+        try:
+            import transcriber  # noqa: F401
+            import batch_scheduler  # noqa: F401
+            elapsed = time.perf_counter() - start_time
+            print(f"文字起こしエンジンを読み込みました ({elapsed:.2f}秒)")
+            message = "文字起こしエンジン: 準備完了"
+        except Exception as e:
+            self.engine_error = e
+            print(f"文字起こしエンジンの読み込みに失敗しました: {e}")
+            message = "文字起こしエンジン: 読み込み失敗"
+        finally:
+            self.engine_ready.set()
+        self.root.after(0, lambda: self._update_engine_status(message))
+    
+    def _update_engine_status(self, message):
+        """
+        文字起こしエンジンの状態を表示
+        
+        Args:
+            message (str): 表示するメッセージ
+        """
+        self.engine_label.config(text=message)
     
     def _load_images(self):
-        """アイコン画像を読み込む"""
+        """アイコン画像を読み込む（加工済みの画像とPhotoImageはアイコンキャッシュから再利用する）"""
         # 画像を保持するための辞書
         self.images = {}
         
@@ -104,19 +193,14 @@ class MainWindow:
             logo_path = os.path.join("resources", "koemoji-infinity-logo-48x48 px.png")
             try:
                 if os.path.exists(logo_path):
-                    logo_img = Image.open(logo_path)
-                    logo_img = logo_img.convert("RGBA")
-                    self.images["logo"] = ImageTk.PhotoImage(logo_img)
+                    self.images["logo"] = icon_cache.get_photo(logo_path)
                     print(f"MainWindow: ロゴ画像を読み込みました: {logo_path}")
                 else:
                     # 代替ロゴの試行
                     alt_logo_path = os.path.join("resources", "koemoji-infinity-logo.png")
                     if os.path.exists(alt_logo_path):
-                        logo_img = Image.open(alt_logo_path)
-                        logo_img = logo_img.convert("RGBA")
                         # 適切なサイズにリサイズ
-                        logo_img = logo_img.resize((48, 48), Image.LANCZOS)
-                        self.images["logo"] = ImageTk.PhotoImage(logo_img)
+                        self.images["logo"] = icon_cache.get_photo(alt_logo_path, size=(48, 48))
                         print(f"MainWindow: 代替ロゴ画像を読み込みました: {alt_logo_path}")
                     else:
                         print("MainWindow: ロゴ画像が見つかりませんでした")
@@ -126,77 +210,24 @@ class MainWindow:
                 try:
                     touka_logo_path = os.path.join("resources", "koemoji-infinity-logo-touka.png")
                     if os.path.exists(touka_logo_path):
-                        logo_img = Image.open(touka_logo_path)
-                        logo_img = logo_img.convert("RGBA")
                         # 適切なサイズにリサイズ
-                        logo_img = logo_img.resize((48, 48), Image.LANCZOS)
-                        self.images["logo"] = ImageTk.PhotoImage(logo_img)
+                        self.images["logo"] = icon_cache.get_photo(touka_logo_path, size=(48, 48))
                         print(f"MainWindow: 透過ロゴ画像を使用します: {touka_logo_path}")
                 except Exception as e2:
                     print(f"MainWindow: 代替ロゴの読み込みにも失敗しました: {e2}")
                     self.images["logo"] = None
             
-            # キャンセルボタン用画像 - モード変換とリサイズを追加
-            cancel_img = Image.open(os.path.join("resources", "stop.png"))
-            # 元の画像をそのままRGBAに変換し、透明度は保持
-            cancel_img = cancel_img.convert("RGBA")
-            # キャンセル画像のサイズを確認してリサイズ
-            if cancel_img.width != 24 or cancel_img.height != 24:
-                cancel_img = cancel_img.resize((24, 24), Image.LANCZOS)
-            self.images["cancel"] = ImageTk.PhotoImage(cancel_img)
-            
-            # 無効状態用の別バージョンのキャンセルアイコンを作成
-            cancel_disabled_img = Image.open(os.path.join("resources", "stop.png"))
-            cancel_disabled_img = cancel_disabled_img.convert("RGBA")
-            # 画像を明るく加工して無効状態を表現（ピクセルごとに明るさを調整）
-            data = cancel_disabled_img.getdata()
-            new_data = []
-            for item in data:
-                # RGBを明るくし、アルファは保持
-                new_data.append((
-                    min(255, item[0] + 100),
-                    min(255, item[1] + 100),
-                    min(255, item[2] + 100),
-                    item[3]
-                ))
-            cancel_disabled_img.putdata(new_data)
-            if cancel_disabled_img.width != 24 or cancel_disabled_img.height != 24:
-                cancel_disabled_img = cancel_disabled_img.resize((24, 24), Image.LANCZOS)
-            self.images["cancel_disabled"] = ImageTk.PhotoImage(cancel_disabled_img)
-            
-            # 開始ボタン用画像 - モード変換とリサイズを追加
-            start_img = Image.open(os.path.join("resources", "play.png"))
-            start_img = start_img.convert("RGBA")
-            # 開始画像のサイズを確認してリサイズ
-            if start_img.width != 24 or start_img.height != 24:
-                start_img = start_img.resize((24, 24), Image.LANCZOS)
-            self.images["start"] = ImageTk.PhotoImage(start_img)
-            
-            # 追加ボタン用画像 - モード変換とリサイズを追加
-            add_img = Image.open(os.path.join("resources", "plus.png"))
-            add_img = add_img.convert("RGBA")
-            if add_img.width != 24 or add_img.height != 24:
-                add_img = add_img.resize((24, 24), Image.LANCZOS)
-            self.images["add"] = ImageTk.PhotoImage(add_img)
-            
-            # 設定ボタン用画像 - モード変換とリサイズを追加
-            settings_img = Image.open(os.path.join("resources", "settings.png"))
-            settings_img = settings_img.convert("RGBA")
-            if settings_img.width != 24 or settings_img.height != 24:
-                settings_img = settings_img.resize((24, 24), Image.LANCZOS)
-            self.images["settings"] = ImageTk.PhotoImage(settings_img)
-            
-            # 削除ボタン用画像 - モード変換とリサイズを追加
-            delete_img = Image.open(os.path.join("resources", "cancel.png"))
-            delete_img = delete_img.convert("RGBA")
-            if delete_img.width != 24 or delete_img.height != 24:
-                delete_img = delete_img.resize((24, 24), Image.LANCZOS)
-            self.images["delete"] = ImageTk.PhotoImage(delete_img)
-            
-            # デバッグ用に画像サイズを出力
-            print(f"ロゴ画像サイズ: {logo_img.width}x{logo_img.height}")
-            print(f"キャンセル画像サイズ: {cancel_img.width}x{cancel_img.height}")
-            print(f"開始画像サイズ: {start_img.width}x{start_img.height}")
+            # ボタン用画像（24x24にリサイズ）
+            button_size = (24, 24)
+            self.images["cancel"] = icon_cache.get_photo(os.path.join("resources", "stop.png"), size=button_size)
+            # 無効状態用に明るく加工したキャンセルアイコン
+            self.images["cancel_disabled"] = icon_cache.get_photo(
+                os.path.join("resources", "stop.png"), size=button_size, disabled=True
+            )
+            self.images["start"] = icon_cache.get_photo(os.path.join("resources", "play.png"), size=button_size)
+            self.images["add"] = icon_cache.get_photo(os.path.join("resources", "plus.png"), size=button_size)
+            self.images["settings"] = icon_cache.get_photo(os.path.join("resources", "settings.png"), size=button_size)
+            self.images["delete"] = icon_cache.get_photo(os.path.join("resources", "cancel.png"), size=button_size)
         
         except Exception as e:
             print(f"画像の読み込みに失敗しました: {e}")
@@ -301,6 +332,36 @@ class MainWindow:
             activeforeground=COLORS["text_primary"]
         )
         settings_button.pack(side=tk.RIGHT, padx=5)
+        
+        # 保存済みの文字起こしの全文検索
+        search_frame = ttk.Frame(header_frame, style="TFrame")
+        search_frame.pack(side=tk.RIGHT, padx=(10, 5))
+        
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(
+            search_frame, 
+            textvariable=self.search_var,
+            width=20,
+            font=("游ゴシック", 12)
+        )
+        search_entry.pack(side=tk.LEFT)
+        search_entry.bind("<Return>", lambda event: self._search_transcripts())
+        
+        search_button = tk.Button(
+            search_frame, 
+            text="検索",
+            command=self._search_transcripts,
+            bg=COLORS["bg_secondary"],
+            fg=COLORS["text_primary"],
+            font=("游ゴシック", 12),
+            relief="flat",
+            borderwidth=0,
+            padx=8,
+            pady=2,
+            activebackground=COLORS["border"],
+            activeforeground=COLORS["text_primary"]
+        )
+        search_button.pack(side=tk.LEFT, padx=(5, 0))
     
     def _create_files_card(self):
         """ファイルカードエリアを作成"""
@@ -469,6 +530,14 @@ class MainWindow:
         )
         self.status_label.pack(side=tk.LEFT, anchor=tk.W)
         
+        # 文字起こしエンジンの状態ラベル
+        self.engine_label = ttk.Label(
+            status_frame, 
+            text="", 
+            style="Status.TLabel"
+        )
+        self.engine_label.pack(side=tk.RIGHT, anchor=tk.E)
+        
         # プログレスフレーム
         progress_frame = ttk.Frame(self.main_frame, style="TFrame")
         progress_frame.pack(fill=tk.X, pady=(5, 0))
@@ -583,78 +652,187 @@ class MainWindow:
             output_dir (str): 出力ディレクトリ
         """
         total_files = len(file_list)
+        config = self.config_manager.get_config()
         
-        # 進捗更新用のコールバック関数
-        def update_progress(status, progress):
-            self._update_progress(status, progress)
+        # 文字起こしエンジンの読み込みが終わっていなければ待つ
+        if not self.engine_ready.is_set():
+            self._update_progress("文字起こしエンジンを読み込み中...", 0)
+            self.engine_ready.wait()
+        if self.engine_error is not None:
+            self._update_progress(f"エラー: 文字起こしエンジンを読み込めませんでした - {self.engine_error}", 0)
+            self.is_processing = False
+            self.root.after(0, self._update_buttons_state)
+            return
+        from transcriber import model_registry, TranscriptionCancelled
+        from batch_scheduler import BatchScheduler
+        
+        # モデルレジストリのメモリ予算を反映（設定変更で不要になったモデルを解放）
+        model_registry.set_memory_budget(config.get("model_memory_budget_mb", 4096))
+        
+        # ファイルごとの進捗率（全体の進捗はこれらの平均）
+        file_progress = [0.0] * total_files
+        progress_lock = threading.Lock()
+        
+        # 進捗更新用のコールバック関数（ワーカースレッドから呼ばれる）
+        def update_progress(index, status, progress):
+            file_name = os.path.basename(file_list[index])
+            with progress_lock:
+                if progress >= 0:
+                    file_progress[index] = progress
+                overall = sum(file_progress) / total_files
+            self._update_progress(f"{file_name} ({index+1}/{total_files}): {status}", overall)
+        
+        # 文字起こし中のファイルごとの書きかけの出力ファイルと結果ウィンドウ
+        streams = {}
+        live_windows = {}
+        stream_lock = threading.Lock()
+        
+        # 確定したセグメント受け取り用のコールバック関数（30秒ウィンドウごとに推論スレッドから呼ばれる）
+        def handle_segments(index, segments):
+            with stream_lock:
+                stream = streams.get(index)
+                if stream is None and index not in streams:
+                    try:
+                        stream = TranscriptStream(file_list[index], output_dir, model, language,
+                                                  self.config_manager.get_output_format())
+                    except Exception as e:
+                        # 書きかけのファイルを作れなくても、完了時にまとめて保存する
+                        print(f"エラー: {os.path.basename(file_list[index])} の出力ファイルを作成できませんでした - {str(e)}")
+                        stream = None
+                    streams[index] = stream
+                if stream is not None:
+                    try:
+                        stream.write(segments)
+                    except Exception as e:
+                        print(f"エラー: {os.path.basename(file_list[index])} の書き込み中にエラーが発生しました - {str(e)}")
+                        stream.close(keep=True)
+                        streams[index] = None
+            self.root.after(0, lambda: show_segments(index, segments))
+        
+        # 確定したセグメントを結果ウィンドウに追加（メインスレッドで実行）
+        def show_segments(index, segments):
+            window = live_windows.get(index)
+            if window is None:
+                text = "".join(segment["text"] for segment in segments)
+                live_windows[index] = ResultWindow(self.root, text, os.path.basename(file_list[index]), live=True)
+            else:
+                window.append_segments(segments)
+        
+        # 文字起こしの完了時に結果ウィンドウを開く（途中経過を表示中のウィンドウがあれば最終結果に置き換える。
+        # エラーやキャンセルの場合はtranscriptがNoneで、途中経過をそのまま残す）
+        def show_result(index, transcript):
+            window = live_windows.pop(index, None)
+            if window is None:
+                if transcript:
+                    ResultWindow(self.root, transcript, os.path.basename(file_list[index]))
+            else:
+                window.finish(transcript)
         
-        for i, file_path in enumerate(file_list):
-            if self.cancel_flag:
-                self._update_progress_gui("文字起こしがキャンセルされました", 0)
-                break
-            
+        # 結果受け取り用のコールバック関数（推論と並行して、結果通知用のスレッドからファイルリストの順番どおりに呼ばれる）
+        def handle_result(index, file_path, result, error):
             file_name = os.path.basename(file_path)
-            file_extension = os.path.splitext(file_path)[1].lower()
+            with progress_lock:
+                file_progress[index] = 100
+                overall = sum(file_progress) / total_files
             
-            # 全体の進捗率を計算（ファイル単位）
-            base_progress = (i / total_files) * 100
+            with stream_lock:
+                stream = streams.pop(index, None)
             
-            try:
-                # ファイル処理のステータス更新
-                self._update_progress(f"処理中: {file_name} ({i+1}/{total_files})", base_progress)
-                
-                # ファイルの種類に応じたトランスクライバーを作成
-                audio_extensions = ['.mp3', '.wav', '.flac', '.ogg']
-                video_extensions = ['.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm']
-                
-                transcript = None
-                result_file = None
-                
-                # 動画ファイルの場合
-                if file_extension in video_extensions:
-                    transcriber = VideoTranscriber(model_name=model, language=language, callback=update_progress)
-                    result = transcriber.process_video(file_path)
-                    # 処理結果を保存
-                    transcript, result_file = self._save_result(result, file_path, output_dir, model, language)
-                
-                # 音声ファイルの場合
-                elif file_extension in audio_extensions:
-                    transcriber = AudioTranscriber(model_name=model, language=language, callback=update_progress)
-                    result = transcriber.process_audio(file_path)
-                    # 処理結果を保存
-                    transcript, result_file = self._save_result(result, file_path, output_dir, model, language)
-                
-                # サポートされていないファイル形式
-                else:
-                    self._update_progress(f"エラー: サポートされていないファイル形式です - {file_extension}", base_progress)
-                    continue
-                
-                # キャンセルされた場合
-                if self.cancel_flag:
-                    self._update_progress_gui("文字起こしがキャンセルされました", 0)
-                    break
-                
-                # 文字起こし結果を表示
-                if transcript:
-                    self.root.after(0, lambda t=transcript, n=file_name: ResultWindow(self.root, t, n))
+            # キャンセルされた場合（書きかけのファイルは削除する）
+            if isinstance(error, TranscriptionCancelled):
+                if stream is not None:
+                    stream.close(keep=False)
+                self.root.after(0, lambda: show_result(index, None))
+                return
             
+            if error is not None:
+                # エラーが発生した場合（書きかけのファイルはそこまでの結果として残す）
+                if stream is not None:
+                    stream.close(keep=True)
+                self.root.after(0, lambda: show_result(index, None))
+                error_message = f"エラー: {file_name} の処理中にエラーが発生しました - {str(error)}"
+                self._update_progress(error_message, overall)
+                print(error_message)
+                return
+            
+            try:
+                # 処理結果を保存
+                transcript, result_file = self._save_result(result, file_path, output_dir, model, language, stream)
             except Exception as e:
-                # エラーが発生した場合
-                error_message = f"エラー: {file_name} の処理中にエラーが発生しました - {str(e)}"
-                self._update_progress(error_message, base_progress)
+                if stream is not None:
+                    stream.close(keep=True)
+                self.root.after(0, lambda: show_result(index, None))
+                error_message = f"エラー: {file_name} の保存中にエラーが発生しました - {str(e)}"
+                self._update_progress(error_message, overall)
                 print(error_message)
+                return
+            
+            # 履歴と全文検索索引に追加（内容のハッシュはキャッシュが計算済みのものを使う）
+            content_hash = cache.fingerprint(file_path) if cache is not None else None
+            self.config_manager.add_to_history(file_path, result_file, model=model, language=language,
+                                               content_hash=content_hash, text=transcript,
+                                               segments=result.get("segments"))
+            
+            # 文字起こし結果を表示
+            self.root.after(0, lambda: show_result(index, transcript))
+        
+        # 文字起こし結果キャッシュ
+        cache = None
+        if config.get("transcript_cache_enabled", True):
+            cache = TranscriptCache(config["transcript_cache_directory"], config.get("transcript_cache_max_mb", 512))
+        
+        # 各段階の所要時間（スパン）の追記先
+        profile_sink = None
+        if config.get("profile_log_path"):
+            profile_sink = JsonlSink(config["profile_log_path"])
+        
+        scheduler = BatchScheduler(
+            file_list,
+            model_name=model,
+            language=language,
+            num_workers=config.get("batch_workers", 1),
+            share_model=config.get("share_model", False),
+            batch_size=config.get("decode_batch_size", 1),
+            vad=config.get("vad_enabled", False),
+            quantize=config.get("cpu_int8_enabled", False),
+            profile_sink=profile_sink,
+            cache=cache,
+            cancel_check=lambda: self.cancel_flag,
+            on_progress=update_progress,
+            on_result=handle_result,
+            on_segments=handle_segments
+        )
+        try:
+            scheduler.run()
+        finally:
+            if profile_sink is not None:
+                profile_sink.close()
+            if cache is not None:
+                cache.close()
+            self.config_manager.flush_history()
         
         # 全ファイルの処理完了
-        if not self.cancel_flag:
-            self._update_progress_gui("文字起こしが完了しました", 100)
+        if self.cancel_flag:
+            self._update_progress("文字起こしがキャンセルされました", 0)
+        else:
+            self._update_progress("文字起こしが完了しました", 100)
+        
+        # モデルレジストリの統計を出力
+        stats = model_registry.stats()
+        print(f"モデルレジストリ: ヒット {stats['hits']} / ミス {stats['misses']}, "
+              f"ロード時間合計 {stats['total_load_seconds']:.2f}秒")
+        if cache is not None:
+            cache_stats = cache.stats()
+            print(f"文字起こしキャッシュ: ヒット率 {cache_stats['hit_rate'] * 100:.1f}% "
+                  f"({cache_stats['entries']}件, {cache_stats['size_bytes'] / (1024 * 1024):.1f}MB)")
         
         # 処理完了
         self.is_processing = False
-        self._update_buttons_state()
+        self.root.after(0, self._update_buttons_state)
     
-    def _save_result(self, result, file_path, output_dir, model, language):
+    def _save_result(self, result, file_path, output_dir, model, language, stream=None):
         """
-        文字起こし結果をファイルに保存
+        文字起こし結果を設定されたすべての出力形式で保存（所要時間の集計があれば隣に.profile.jsonとして保存）
         
         Args:
             result (dict): 文字起こし結果
@@ -662,52 +840,51 @@ class MainWindow:
             output_dir (str): 出力ディレクトリ
             model (str): 使用したモデル
             language (str): 言語設定
+            stream (TranscriptStream, optional): 文字起こし中に書き込んだ出力ファイル（あれば完成させる）
             
         Returns:
-            tuple: (テキスト, ファイルパス)
+            tuple: (テキスト, 最初の出力形式のファイルパス)
         """
-        # 出力ディレクトリが存在しない場合は作成
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # ファイル名の準備
-        base_name = os.path.splitext(os.path.basename(file_path))[0]
-        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        output_file = os.path.join(output_dir, f"{base_name}_{timestamp}.txt")
-        
-        # 結果をファイルに書き込み
-        with open(output_file, "w", encoding="utf-8") as f:
-            # 見出し情報を書き込み
-            f.write(f"# 文字起こし: {os.path.basename(file_path)}\n")
-            f.write(f"# 日時: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"# モデル: {model}\n")
-            f.write(f"# 言語: {language if language else '自動検出'}\n\n")
-            
-            # テキスト全体を書き込み
-            f.write(result["text"])
-            
-            # セグメント情報がある場合は詳細も書き込み
-            if "segments" in result and result["segments"]:
-                f.write("\n\n## 詳細タイムスタンプ\n\n")
-                for segment in result["segments"]:
-                    start_time = self._format_time(segment["start"])
-                    end_time = self._format_time(segment["end"])
-                    f.write(f"[{start_time} --> {end_time}] {segment['text']}\n")
+        output_formats = self.config_manager.get_output_format()
+        profile = result.get("profile")
+        result = {k: v for k, v in result.items() if k != "profile"}
+        if stream is not None:
+            output_files = stream.finish(result)
+        else:
+            output_files = write_transcripts(result, file_path, output_dir, model, language, output_formats)
+        output_file = next(iter(output_files.values()))
+        if profile is not None:
+            write_summary(profile, output_file)
         
         return result["text"], output_file
     
-    def _format_time(self, seconds):
+    def _search_transcripts(self):
+        """保存済みの文字起こしをセグメント単位で全文検索し、関連度の高い順に表示"""
+        query = self.search_var.get().strip()
+        if not query:
+            return
+        
+        start = time.perf_counter()
+        hits = self.config_manager.history.search(query)
+        elapsed = time.perf_counter() - start
+        
+        if self.search_window is None or not self.search_window.exists():
+            self.search_window = SearchResultsWindow(self.root, self._open_search_hit)
+        self.search_window.show(query, hits, elapsed)
+    
+    def _open_search_hit(self, hit):
         """
-        秒数を時:分:秒形式にフォーマット
+        検索結果の文字起こしを開き、該当する時刻の位置を表示
         
         Args:
-            seconds (float): 秒数
-            
-        Returns:
-            str: フォーマットされた時間文字列
+            hit (dict): HistoryStore.searchの検索結果
         """
-        m, s = divmod(int(seconds), 60)
-        h, m = divmod(m, 60)
-        return f"{h:02d}:{m:02d}:{s:02d}"
+        history = self.config_manager.history
+        entry = history.get(hit["history_id"])
+        if entry is None:
+            return
+        ResultWindow(self.root, entry["text"] or "", os.path.basename(entry["source_path"]),
+                     segments=history.get_segments(hit["history_id"]), jump_to=hit["start"])
     
     def _update_progress(self, status, progress):
         """
@@ -717,8 +894,8 @@ class MainWindow:
             status (str): ステータスメッセージ
             progress (float): 進捗率(0-100)
         """
-        # GUIの更新はメインスレッドで実行
-        self.root.after(0, lambda: self._update_progress_gui(status, progress))
+        # GUIの更新はメインスレッドで実行（連続した更新は最新の1件にまとめる）
+        self.progress_channel.put(status, progress)
     
     def _update_progress_gui(self, status, progress):
         """
@@ -27,10 +27,14 @@ COLORS = {
     "border": "#E0E0E0",            # 標準ボーダー色（薄いグレー）
 }
 
+# 説明文
+RESULT_INFO = "以下に文字起こし結果を表示しています。テキストをコピーしたり、ファイルに保存できます。"
+LIVE_INFO = "文字起こし中です。確定した部分から順に表示しています。"
+
 class ResultWindow:
     """文字起こし結果表示ウィンドウクラス"""
     
-    def __init__(self, parent, transcript, title):
+    def __init__(self, parent, transcript, title, segments=None, jump_to=None, live=False):
         """
         結果ウィンドウを初期化
         
@@ -38,7 +42,11 @@ class ResultWindow:
             parent (tk.Tk): 親ウィンドウ
             transcript (str): 文字起こしの結果
             title (str): 結果ウィンドウのタイトル
+            segments (list, optional): 文字起こし結果のセグメント（start、end、textを持つ辞書）のリスト
+            jump_to (float, optional): この時刻（秒）のセグメントを強調表示してスクロールする
+            live (bool): Trueの場合は文字起こし中の結果として開き、append_segmentsで確定したセグメントを追加していく
         """
+        self.live = live
         # ウィンドウの設定
         self.window = tk.Toplevel(parent)
         self.window.title(f"コエモジ∞ - 文字起こし結果 - {title}")
@@ -60,6 +68,10 @@ class ResultWindow:
         
         # メインレイアウト作成
         self._create_main_layout(transcript, title)
+        
+        # 検索結果から開いた場合は該当する位置を表示
+        if segments and jump_to is not None:
+            self._jump_to(segments, jump_to)
     
     def _setup_styles(self):
         """スタイルを設定"""
@@ -121,13 +133,13 @@ class ResultWindow:
         file_label.pack(anchor=tk.W, pady=(5, 0))
         
         # 説明
-        info_label = ttk.Label(
+        self.info_label = ttk.Label(
             header_frame, 
-            text="以下に文字起こし結果を表示しています。テキストをコピーしたり、ファイルに保存できます。", 
+            text=LIVE_INFO if self.live else RESULT_INFO, 
             style="Info.TLabel",
             wraplength=680
         )
-        info_label.pack(anchor=tk.W, pady=(5, 0))
+        self.info_label.pack(anchor=tk.W, pady=(5, 0))
     
     def _create_text_card(self, parent, transcript):
         """テキスト表示カードを作成"""
@@ -175,6 +187,77 @@ class ResultWindow:
         # 結果テキストの挿入
         self.text_widget.insert(tk.END, transcript)
     
+    def exists(self):
+        """
+        ウィンドウが閉じられていないかを確認
+        
+        Returns:
+            bool: 開いている場合はTrue
+        """
+        try:
+            return bool(self.window.winfo_exists())
+        except tk.TclError:
+            return False
+    
+    def append_segments(self, segments):
+        """
+        文字起こし中に確定したセグメントを末尾に追加（メインスレッドから呼び出す）
+        
+        Args:
+            segments (list): セグメントのリスト
+        """
+        if not self.exists():
+            return
+        # 末尾を表示している場合だけ追加した位置まで自動でスクロールする
+        at_end = self.text_widget.yview()[1] >= 1.0
+        self.text_widget.insert(tk.END, "".join(segment["text"] for segment in segments))
+        if at_end:
+            self.text_widget.see(tk.END)
+    
+    def finish(self, transcript=None):
+        """
+        文字起こしの完了時に最終的な結果を表示（メインスレッドから呼び出す）
+        
+        Args:
+            transcript (str, optional): 文字起こしの結果（Noneの場合は表示中の途中経過をそのまま残す）
+        """
+        if not self.exists():
+            return
+        self.live = False
+        self.info_label.config(text=RESULT_INFO)
+        if transcript is not None and self.text_widget.get("1.0", "end-1c") != transcript:
+            view = self.text_widget.yview()[0]
+            self.text_widget.delete("1.0", tk.END)
+            self.text_widget.insert(tk.END, transcript)
+            self.text_widget.yview_moveto(view)
+    
+    def _jump_to(self, segments, seconds):
+        """
+        指定した時刻のセグメントを強調表示してスクロール
+        
+        Args:
+            segments (list): セグメントのリスト
+            seconds (float): 時刻（秒）
+        """
+        # 時刻が最も近いセグメントと、本文の中でのおおよその位置（それより前のセグメントの文字数）
+        index = min(range(len(segments)), key=lambda i: abs(segments[i]["start"] - seconds))
+        text = segments[index]["text"].strip()
+        if not text:
+            return
+        offset = sum(len(segment["text"]) for segment in segments[:index])
+        
+        # 同じ文が何度も出てくる場合に備えて、おおよその位置の少し前から探す
+        position = self.text_widget.search(text, f"1.0+{max(0, offset - len(text))}c", tk.END)
+        if not position:
+            position = self.text_widget.search(text, "1.0", tk.END)
+        if not position:
+            return
+        
+        self.text_widget.tag_configure("search_hit", background=COLORS["warning"])
+        self.text_widget.tag_add("search_hit", position, f"{position}+{len(text)}c")
+        self.text_widget.mark_set(tk.INSERT, position)
+        self.text_widget.see(position)
+    
     def _create_button_area(self, parent):
         """ボタンエリアを作成"""
         button_frame = ttk.Frame(parent, style="TFrame")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+検索結果ウィンドウモジュール
+保存済みの文字起こしの全文検索結果を一覧表示するウィンドウを定義
+"""
+
+import os
+import tkinter as tk
+from tkinter import ttk
+
+from utils.transcript_writer import format_time
+
+# モダンなカラーパレット定義
+COLORS = {
+    "bg_primary": "#FAFAFA",        # 背景色（ほぼ白）
+    "bg_secondary": "#FFFFFF",      # 白背景
+    "accent": "#2196F3",            # アクセント色（青）
+    "text_primary": "#212121",      # 主要テキスト（黒に近いグレー）
+    "text_secondary": "#757575",    # 副次テキスト（ミディアムグレー）
+    "text_light": "#FFFFFF",        # 明るいテキスト（白）
+}
+
+class SearchResultsWindow:
+    """全文検索結果表示ウィンドウクラス"""
+
+    def __init__(self, parent, on_open):
+        """
+        検索結果ウィンドウを初期化
+
+        Args:
+            parent (tk.Tk): 親ウィンドウ
+            on_open (callable): 検索結果を開くときに呼ぶ関数（検索結果の辞書を受け取る）
+        """
+        self.on_open = on_open
+        self.hits = []
+
+        # ウィンドウの設定
+        self.window = tk.Toplevel(parent)
+        self.window.title("コエモジ∞ - 検索結果")
+        self.window.geometry("700x400")
+        self.window.minsize(400, 250)
+        self.window.configure(bg=COLORS["bg_primary"])
+
+        # 親ウィンドウと同じアイコンを使用
+        try:
+            self.window.iconphoto(True, parent.iconphoto_master)
+        except Exception:
+            pass
+
+        # メインコンテナ
+        main_frame = ttk.Frame(self.window, style="TFrame")
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=15)
+
+        # 件数と検索時間
+        self.summary_label = ttk.Label(main_frame, text="", style="TLabel")
+        self.summary_label.pack(anchor=tk.W, pady=(0, 10))
+
+        # 検索結果リスト
+        list_area = ttk.Frame(main_frame, style="TFrame")
+        list_area.pack(fill=tk.BOTH, expand=True)
+        self.listbox = tk.Listbox(
+            list_area,
+            selectmode=tk.BROWSE,
+            bg=COLORS["bg_secondary"],
+            fg=COLORS["text_primary"],
+            selectbackground=COLORS["accent"],
+            selectforeground=COLORS["text_light"],
+            font=("游ゴシック", 11),
+            borderwidth=0,
+            relief="flat",
+            highlightthickness=0
+        )
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar = ttk.Scrollbar(list_area, orient=tk.VERTICAL, command=self.listbox.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.listbox.config(yscrollcommand=scrollbar.set)
+
+        # ダブルクリックかEnterで結果ウィンドウを開く
+        self.listbox.bind("<Double-Button-1>", self._open_selected)
+        self.listbox.bind("<Return>", self._open_selected)
+
+        info_label = ttk.Label(
+            main_frame,
+            text="ダブルクリックすると、文字起こし結果の該当する位置を表示します。",
+            style="Status.TLabel"
+        )
+        info_label.pack(anchor=tk.W, pady=(10, 0))
+
+    def exists(self):
+        """
+        ウィンドウが閉じられていないかを確認
+
+        Returns:
+            bool: 開いている場合はTrue
+        """
+        try:
+            return bool(self.window.winfo_exists())
+        except tk.TclError:
+            return False
+
+    def show(self, query, hits, elapsed):
+        """
+        検索結果を表示（同じウィンドウを次の検索でも使い回す）
+
+        Args:
+            query (str): 検索語
+            hits (list): HistoryStore.searchの戻り値
+            elapsed (float): 検索にかかった秒数
+        """
+        self.hits = hits
+        self.summary_label.config(text=f"「{query}」の検索結果: {len(hits)}件（{elapsed * 1000:.0f}ミリ秒）")
+        self.listbox.delete(0, tk.END)
+        for hit in hits:
+            file_name = os.path.basename(hit["source_path"])
+            self.listbox.insert(tk.END, f"{format_time(hit['start'])}  {file_name}  {hit['text']}")
+        self.window.deiconify()
+        self.window.lift()
+
+    def _open_selected(self, event=None):
+        """選択した検索結果を開く"""
+        selection = self.listbox.curselection()
+        if selection:
+            self.on_open(self.hits[selection[0]])
@@ -10,6 +10,9 @@ import os
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
+from utils.transcript_cache import TranscriptCache
+from utils.transcript_writer import OUTPUT_FORMATS, parse_output_formats
+
 # モダンなカラーパレット定義
 COLORS = {
     "bg_primary": "#FAFAFA",        # 背景色（ほぼ白）
@@ -42,8 +45,8 @@ class SettingsWindow:
         # 設定ウィンドウを作成
         self.window = tk.Toplevel(parent)
         self.window.title("コエモジ∞ - 設定")
-        self.window.geometry("520x550")  # 高さを小さくする
-        self.window.minsize(450, 550)    # 最小サイズも調整
+        self.window.geometry("520x700")  # 並列処理・バッチ推論設定の分だけ高くする
+        self.window.minsize(450, 700)    # 最小サイズも調整
         self.window.transient(parent)
         self.window.grab_set()
         self.window.configure(bg=COLORS["bg_primary"])
@@ -134,16 +137,19 @@ class SettingsWindow:
         self.model_tab = ttk.Frame(self.tab_control, style="TFrame")
         self.language_tab = ttk.Frame(self.tab_control, style="TFrame")
         self.output_tab = ttk.Frame(self.tab_control, style="TFrame")
+        self.cache_tab = ttk.Frame(self.tab_control, style="TFrame")
         
         # タブをタブコントロールに追加
         self.tab_control.add(self.model_tab, text="モデル設定")
         self.tab_control.add(self.language_tab, text="言語設定")
         self.tab_control.add(self.output_tab, text="出力設定")
+        self.tab_control.add(self.cache_tab, text="キャッシュ")
         
         # 各タブにコンテンツを作成
         self._create_model_tab()
         self._create_language_tab()
         self._create_output_tab()
+        self._create_cache_tab()
         
         # アクションボタン
         self._create_action_buttons()
@@ -177,6 +183,59 @@ class SettingsWindow:
         
         # モデル選択変更時のイベント設定
         model_combo.bind("<<ComboboxSelected>>", self._update_model_description)
+        
+        # 同時処理数
+        workers_label = ttk.Label(content, text="同時に処理するファイル数:", style="TLabel")
+        workers_label.pack(anchor=tk.W, pady=(15, 5))
+        
+        self.workers_var = tk.IntVar()
+        workers_spin = ttk.Spinbox(content, from_=1, to=max(1, os.cpu_count() or 1), textvariable=self.workers_var, width=5)
+        workers_spin.pack(anchor=tk.W, pady=2)
+        
+        # モデル共有設定
+        self.share_model_var = tk.BooleanVar()
+        share_check = ttk.Checkbutton(content, text="並列処理時にモデルを共有する（メモリ節約）", variable=self.share_model_var)
+        share_check.pack(anchor=tk.W, pady=(5, 0))
+        
+        workers_desc = ttk.Label(
+            content,
+            text="2以上にすると複数ファイルを並列に処理します。モデルを共有しない場合はファイル数分のモデルがメモリに読み込まれます。",
+            wraplength=450,
+            justify=tk.LEFT,
+            style="Description.TLabel"
+        )
+        workers_desc.pack(fill=tk.X, pady=(5, 0))
+        
+        # バッチ推論
+        batch_label = ttk.Label(content, text="まとめて推論する30秒区間の数:", style="TLabel")
+        batch_label.pack(anchor=tk.W, pady=(15, 5))
+        
+        self.batch_size_var = tk.IntVar()
+        batch_spin = ttk.Spinbox(content, from_=1, to=32, textvariable=self.batch_size_var, width=5)
+        batch_spin.pack(anchor=tk.W, pady=2)
+        
+        batch_desc = ttk.Label(
+            content,
+            text="2以上にすると長い音声を複数の区間ずつまとめて処理し、高速化します。前の区間の文章を文脈として使わないため、区間の境目の精度が下がることがあります。",
+            wraplength=450,
+            justify=tk.LEFT,
+            style="Description.TLabel"
+        )
+        batch_desc.pack(fill=tk.X, pady=(5, 0))
+        
+        # int8量子化
+        self.quantize_var = tk.BooleanVar()
+        quantize_check = ttk.Checkbutton(content, text="CPUではint8量子化モデルで高速化する", variable=self.quantize_var)
+        quantize_check.pack(anchor=tk.W, pady=(15, 2))
+        
+        quantize_desc = ttk.Label(
+            content,
+            text="GPUがない環境で、モデルの重みを8ビット整数に変換して処理を高速化します。初回のみ変換に時間がかかり、変換済みのモデルは保存されます。精度がわずかに下がることがあります。",
+            wraplength=450,
+            justify=tk.LEFT,
+            style="Description.TLabel"
+        )
+        quantize_desc.pack(fill=tk.X, pady=(5, 0))
     
     def _create_language_tab(self):
         """言語設定タブの内容を作成"""
@@ -219,6 +278,20 @@ class SettingsWindow:
             style="Description.TLabel"
         )
         lang_desc.pack(fill=tk.X, pady=(5, 0))
+        
+        # 音声区間検出
+        self.vad_var = tk.BooleanVar()
+        vad_check = ttk.Checkbutton(content, text="無音区間をスキップして高速化する（VAD）", variable=self.vad_var)
+        vad_check.pack(anchor=tk.W, pady=(15, 2))
+        
+        vad_desc = ttk.Label(
+            content,
+            text="音量から発話のない区間を検出し、AIによる処理を省略します。無音の多い会議や講義の録音で効果があります。小さな声が無音と判定されることがあります。",
+            wraplength=450,
+            justify=tk.LEFT,
+            style="Description.TLabel"
+        )
+        vad_desc.pack(fill=tk.X, pady=(5, 0))
     
     def _create_output_tab(self):
         """出力設定タブの内容を作成"""
@@ -265,6 +338,106 @@ class SettingsWindow:
             style="Description.TLabel"
         )
         output_desc.pack(fill=tk.X, pady=(5, 0))
+        
+        # 出力形式
+        format_label = ttk.Label(content, text="出力形式:", style="TLabel")
+        format_label.pack(anchor=tk.W, pady=(15, 5))
+        
+        format_frame = ttk.Frame(content, style="TFrame")
+        format_frame.pack(anchor=tk.W, pady=2)
+        
+        self.format_vars = {}
+        for output_format in OUTPUT_FORMATS:
+            format_var = tk.BooleanVar()
+            format_check = ttk.Checkbutton(format_frame, text=output_format, variable=format_var)
+            format_check.pack(side=tk.LEFT, padx=(0, 10))
+            self.format_vars[output_format] = format_var
+        
+        format_desc = ttk.Label(
+            content,
+            text="選択したすべての形式のファイルを1回の書き込みでまとめて保存します。srt・vttは字幕、tsvは開始・終了時刻（ミリ秒）と本文の表です。",
+            wraplength=450,
+            justify=tk.LEFT,
+            style="Description.TLabel"
+        )
+        format_desc.pack(fill=tk.X, pady=(5, 0))
+    
+    def _create_cache_tab(self):
+        """キャッシュ設定タブの内容を作成"""
+        # コンテンツフレーム
+        content = ttk.Frame(self.cache_tab, style="TFrame")
+        content.pack(fill=tk.BOTH, expand=True, padx=15, pady=15)
+        
+        # キャッシュの有効・無効
+        self.cache_enabled_var = tk.BooleanVar()
+        cache_check = ttk.Checkbutton(content, text="文字起こし結果をキャッシュする", variable=self.cache_enabled_var)
+        cache_check.pack(anchor=tk.W, pady=(0, 5))
+        
+        # 容量上限
+        size_label = ttk.Label(content, text="キャッシュの容量上限 (MB):", style="TLabel")
+        size_label.pack(anchor=tk.W, pady=(15, 5))
+        
+        self.cache_size_var = tk.IntVar()
+        size_spin = ttk.Spinbox(content, from_=16, to=102400, increment=64, textvariable=self.cache_size_var, width=8)
+        size_spin.pack(anchor=tk.W, pady=2)
+        
+        cache_desc = ttk.Label(
+            content,
+            text="同じ内容のファイルを同じ設定で処理した場合、保存済みの結果を使って文字起こしを省略します。容量上限を超えると古い結果から削除されます。",
+            wraplength=450,
+            justify=tk.LEFT,
+            style="Description.TLabel"
+        )
+        cache_desc.pack(fill=tk.X, pady=(5, 0))
+        
+        # 統計情報
+        self.cache_stats_var = tk.StringVar()
+        stats_label = ttk.Label(content, textvariable=self.cache_stats_var, style="TLabel", justify=tk.LEFT)
+        stats_label.pack(anchor=tk.W, pady=(15, 5))
+        
+        # キャッシュ削除ボタン
+        clear_button = tk.Button(
+            content,
+            text="キャッシュを削除",
+            command=self._clear_cache,
+            bg=COLORS["bg_primary"],
+            fg=COLORS["text_primary"],
+            font=("游ゴシック", 9),
+            relief="solid",
+            borderwidth=1,
+            padx=8,
+            pady=2,
+            activebackground=COLORS["border"],
+            activeforeground=COLORS["text_primary"]
+        )
+        clear_button.pack(anchor=tk.W, pady=(5, 0))
+    
+    def _get_cache(self):
+        """設定のキャッシュディレクトリを開く"""
+        config = self.config_manager.get_config()
+        return TranscriptCache(config["transcript_cache_directory"], config.get("transcript_cache_max_mb", 512))
+    
+    def _update_cache_stats(self):
+        """キャッシュの統計情報を表示"""
+        try:
+            stats = self._get_cache().stats()
+        except Exception as e:
+            self.cache_stats_var.set(f"キャッシュの情報を取得できませんでした: {e}")
+            return
+        self.cache_stats_var.set(
+            f"保存件数: {stats['entries']}件 ({stats['size_bytes'] / (1024 * 1024):.1f}MB)\n"
+            f"ヒット率: {stats['hit_rate'] * 100:.1f}% (ヒット {stats['hits']} / ミス {stats['misses']})"
+        )
+    
+    def _clear_cache(self):
+        """キャッシュを削除"""
+        if not messagebox.askyesno("確認", "保存済みの文字起こし結果のキャッシュをすべて削除しますか？", parent=self.window):
+            return
+        try:
+            self._get_cache().clear()
+        except Exception as e:
+            messagebox.showerror("エラー", f"キャッシュの削除に失敗しました: {e}", parent=self.window)
+        self._update_cache_stats()
     
     def _create_action_buttons(self):
         """アクションボタンエリアを作成"""
@@ -326,7 +499,7 @@ class SettingsWindow:
         """ウィンドウを画面中央に配置"""
         # ウィンドウのサイズを取得
         window_width = 520
-        window_height = 550  # 高さを小さく変更
+        window_height = 700  # 並列処理・バッチ推論設定の分だけ高くする
         
         # 親ウィンドウの位置とサイズを取得
         parent_x = self.parent.winfo_rootx()
@@ -383,6 +556,12 @@ class SettingsWindow:
         self.model_var.set(model)
         self._update_model_description()
         
+        # 並列処理設定
+        self.workers_var.set(config.get("batch_workers", 1))
+        self.share_model_var.set(config.get("share_model", False))
+        self.batch_size_var.set(config.get("decode_batch_size", 1))
+        self.quantize_var.set(config.get("cpu_int8_enabled", False))
+        
         # 言語設定
         language_code = config.get("language", "")
         language_name = "自動検出"
@@ -394,10 +573,24 @@ class SettingsWindow:
                 break
         
         self.lang_var.set(language_name)
+        self.vad_var.set(config.get("vad_enabled", False))
         
         # 出力ディレクトリ
         output_dir = config.get("output_directory", "output")
         self.output_dir_var.set(output_dir)
+        
+        # 出力形式
+        try:
+            output_formats = parse_output_formats(config.get("output_format", "txt"))
+        except ValueError:
+            output_formats = ["txt"]
+        for output_format, format_var in self.format_vars.items():
+            format_var.set(output_format in output_formats)
+        
+        # キャッシュ設定
+        self.cache_enabled_var.set(config.get("transcript_cache_enabled", True))
+        self.cache_size_var.set(config.get("transcript_cache_max_mb", 512))
+        self._update_cache_stats()
     
     def _save_settings(self):
         """設定を保存"""
@@ -406,11 +599,30 @@ class SettingsWindow:
         language_name = self.lang_var.get()
         language_code = self.lang_options.get(language_name, "")
         output_dir = self.output_dir_var.get()
+        try:
+            batch_workers = max(1, int(self.workers_var.get()))
+        except (tk.TclError, ValueError):
+            messagebox.showerror("エラー", "同時に処理するファイル数には1以上の整数を指定してください。")
+            return
+        try:
+            decode_batch_size = max(1, int(self.batch_size_var.get()))
+        except (tk.TclError, ValueError):
+            messagebox.showerror("エラー", "まとめて推論する区間の数には1以上の整数を指定してください。")
+            return
+        try:
+            cache_max_mb = max(1, int(self.cache_size_var.get()))
+        except (tk.TclError, ValueError):
+            messagebox.showerror("エラー", "キャッシュの容量上限には1以上の整数を指定してください。")
+            return
         
         # 必須項目のチェック
         if not model:
             messagebox.showerror("エラー", "モデルサイズを選択してください。")
             return
+        output_formats = [output_format for output_format, format_var in self.format_vars.items() if format_var.get()]
+        if not output_formats:
+            messagebox.showerror("エラー", "出力形式を1つ以上選択してください。")
+            return
         
         # 出力ディレクトリが指定されていない場合はデフォルト値を設定
         if not output_dir:
@@ -420,7 +632,15 @@ class SettingsWindow:
         config = {
             "model": model,
             "language": language_code,
-            "output_directory": output_dir
+            "output_directory": output_dir,
+            "output_format": ",".join(output_formats),
+            "batch_workers": batch_workers,
+            "share_model": self.share_model_var.get(),
+            "decode_batch_size": decode_batch_size,
+            "cpu_int8_enabled": self.quantize_var.get(),
+            "vad_enabled": self.vad_var.get(),
+            "transcript_cache_enabled": self.cache_enabled_var.get(),
+            "transcript_cache_max_mb": cache_max_mb
         }
         
         # 設定を保存
@@ -8,15 +8,20 @@
 
 import os
 import json
-import datetime
 import logging
+import threading
+
+from utils.history_store import DEFAULT_DATABASE_NAME, DEFAULT_PAGE_SIZE, HistoryStore
 
 # ロガーの設定
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# 最後の変更からこの秒数だけ変更がなければ設定ファイルに書き込む
+SAVE_DELAY = 1.0
+
 class ConfigManager:
-    """設定管理クラス"""
+    """設定管理クラス（変更はメモリ上に反映し、まとめてバックグラウンドで保存する。スレッドセーフ）"""
     
     def __init__(self, config_file="config.json"):
         """
@@ -32,7 +37,23 @@ class ConfigManager:
         
         self.config_file = config_file
         logger.debug(f"設定ファイルのパス: {self.config_file}")
+        # 設定の読み書き用のロックと、ファイルへの書き込みを1つずつ行うためのロック
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._save_timer = None
         self.config = self._load_config()
+        # 履歴データベースは最初に使うときに開く（historyプロパティ）
+        self._history = None
+        self._migrate_history()
+        
+    @property
+    def history(self):
+        """履歴データベース（最初に参照したときに開く）"""
+        with self._lock:
+            if self._history is None:
+                self._history = HistoryStore(self.config["history_database_path"])
+            return self._history
         
     def _load_config(self):
         """
@@ -45,8 +66,18 @@ class ConfigManager:
         default_config = {
             "model": "tiny",
             "language": "ja",  # 日本語
-            "output_format": "txt",
-            "history": [],
+            "output_format": "txt",  # 出力形式（カンマ区切りで複数指定可: txt,json,srt,vtt,tsv）
+            "history_database_path": os.path.join(os.path.dirname(self.config_file), DEFAULT_DATABASE_NAME),
+            "model_memory_budget_mb": 4096,  # 常駐させるモデルの合計メモリ上限
+            "batch_workers": 1,  # 同時に処理するファイル数
+            "share_model": False,  # 並列処理時に1つのモデルを共有するかどうか
+            "decode_batch_size": 1,  # まとめて推論する30秒ウィンドウの数 (1=逐次)
+            "vad_enabled": False,  # 音声区間検出で無音区間をスキップするかどうか
+            "cpu_int8_enabled": False,  # CPUでLinear層を動的int8量子化したモデルを使うかどうか
+            "profile_log_path": "",  # 空でなければ各段階の所要時間（スパン）をJSONLで追記するファイル
+            "transcript_cache_enabled": True,  # 文字起こし結果をキャッシュするかどうか
+            "transcript_cache_max_mb": 512,  # キャッシュの容量上限
+            "transcript_cache_directory": os.path.join(os.path.dirname(self.config_file), "transcript_cache"),
             "output_directory": os.path.join(os.path.expanduser("~/Desktop"), "コエモジ∞_文字起こし結果")
         }
         
@@ -84,33 +115,91 @@ class ConfigManager:
         設定全体を取得
         
         Returns:
-            dict: 設定データ
+            dict: 設定データ（呼び出し時点のコピー）
+        """
+        with self._lock:
+            return dict(self.config)
+    
+    def _set(self, values):
+        """
+        設定をメモリ上で更新し、少し後にバックグラウンドで保存する
+        
+        Args:
+            values (dict): 更新する設定
+        """
+        with self._lock:
+            self.config.update(values)
+            self._mark_dirty_locked()
+    
+    def _mark_dirty_locked(self):
+        """未保存の変更があることを記録し、保存を予約し直す（ロック取得済みで呼び出す）"""
+        self._dirty = True
+        # 連続した変更は最後の変更からSAVE_DELAY秒後の1回の書き込みにまとめる
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+        self._save_timer = threading.Timer(SAVE_DELAY, self.flush)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+    
+    def flush(self):
+        """
+        未保存の変更があれば設定ファイルに書き込む
+        
+        Returns:
+            bool: 保存に成功したか、変更がなかった場合はTrue
         """
-        return self.config
+        with self._lock:
+            if not self._dirty:
+                return True
+        return self.save_config()
     
     def save_config(self):
-        """設定ファイルを保存"""
-        try:
-            # 設定ファイルのパスを確認
-            config_path = os.path.abspath(self.config_file)
-            logger.debug(f"設定を保存しています: {config_path}")
-            
-            # ディレクトリが存在することを確認
-            config_dir = os.path.dirname(config_path)
-            if config_dir and not os.path.exists(config_dir):
-                os.makedirs(config_dir)
-            
-            # 設定ファイルを保存
-            with open(config_path, "w", encoding="utf-8") as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=4)
+        """
+        設定ファイルを保存（一時ファイルに書いてfsyncしてから置き換えるため、途中で落ちても壊れない）
+        
+        Returns:
+            bool: 保存に成功した場合はTrue
+        """
+        # 設定ファイルのパスを確認
+        config_path = os.path.abspath(self.config_file)
+        temp_path = f"{config_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._write_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                data = json.dumps(self.config, ensure_ascii=False, indent=4)
+                self._dirty = False
             
-            logger.debug("設定の保存に成功しました")
-            return True
-        except Exception as e:
-            logger.error(f"設定の保存に失敗しました: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
-            return False
+            try:
+                logger.debug(f"設定を保存しています: {config_path}")
+                
+                # ディレクトリが存在することを確認
+                config_dir = os.path.dirname(config_path)
+                if config_dir and not os.path.exists(config_dir):
+                    os.makedirs(config_dir)
+                
+                # 設定ファイルを保存
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, config_path)
+                
+                logger.debug("設定の保存に成功しました")
+                return True
+            except Exception as e:
+                logger.error(f"設定の保存に失敗しました: {e}")
+                import traceback
+                logger.error(traceback.format_exc())
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+                # 次の変更か終了時に再試行する
+                with self._lock:
+                    self._dirty = True
+                return False
     
     def get_model(self):
         """
@@ -128,8 +217,7 @@ class ConfigManager:
         Args:
             model (str): モデル名
         """
-        self.config["model"] = model
-        self.save_config()
+        self._set({"model": model})
     
     def get_language(self):
         """
@@ -147,15 +235,14 @@ class ConfigManager:
         Args:
             language (str): 言語コード (None=自動検出)
         """
-        self.config["language"] = language
-        self.save_config()
+        self._set({"language": language})
     
     def get_output_format(self):
         """
         出力形式を取得
         
         Returns:
-            str: 出力形式
+            str: 出力形式（カンマ区切りで複数の場合あり）
         """
         return self.config.get("output_format", "txt")
     
@@ -166,8 +253,7 @@ class ConfigManager:
         Args:
             output_format (str): 出力形式
         """
-        self.config["output_format"] = output_format
-        self.save_config()
+        self._set({"output_format": output_format})
     
     def get_output_directory(self):
         """
@@ -195,44 +281,71 @@ class ConfigManager:
         Args:
             output_directory (str): 出力ディレクトリのパス
         """
-        self.config["output_directory"] = output_directory
+        self._set({"output_directory": output_directory})
+    
+    def _migrate_history(self):
+        """以前の設定ファイルに保存されていた履歴のリストを履歴データベースに移す"""
+        with self._lock:
+            history = self.config.pop("history", None)
+            if history is None:
+                return
+        
+        entries = [
+            {
+                "source_path": entry.get("file"),
+                "output_path": entry.get("output"),
+                "timestamp": entry.get("timestamp")
+            }
+            for entry in history
+            if isinstance(entry, dict) and entry.get("file")
+        ]
+        if entries:
+            self.history.add_many(entries)
+            logger.info(f"{len(entries)}件の履歴を履歴データベースに移しました")
+        # 次回の起動で同じ履歴を二重に移さないようにすぐに保存する
         self.save_config()
     
-    def add_to_history(self, file_path, output_path):
+    def add_to_history(self, file_path, output_path, model=None, language=None, content_hash=None, text=None,
+                       segments=None):
         """
-        履歴に追加
+        履歴に追加（設定ファイルは書き換えない）
         
         Args:
             file_path (str): 処理したファイルのパス
             output_path (str): 出力ファイルのパス
+            model (str, optional): 使用したモデル
+            language (str, optional): 言語コード
+            content_hash (str, optional): 処理したファイルの内容のハッシュ
+            text (str, optional): 文字起こし結果の本文
+            segments (list, optional): 全文検索索引に登録するセグメントのリスト
         """
-        history = self.config.get("history", [])
-        
-        # 履歴エントリを作成
-        entry = {
-            "file": file_path,
-            "output": output_path,
-            "timestamp": datetime.datetime.now().isoformat()
-        }
-        
-        # 履歴に追加
-        history.append(entry)
-        
-        # 履歴が長すぎる場合は古いものを削除
-        if len(history) > 100:
-            history = history[-100:]
-        
-        self.config["history"] = history
-        self.save_config()
+        self.history.add(file_path, output_path, model=model, language=language,
+                         content_hash=content_hash, text=text, segments=segments)
     
-    def get_history(self):
+    def get_history(self, limit=DEFAULT_PAGE_SIZE, before_id=None, **filters):
         """
-        履歴を取得
+        履歴を新しい順に1ページ分取得
+        
+        Args:
+            limit (int): 1ページの件数
+            before_id (int, optional): このidより古い履歴から取得（前のページの最後のid）
+            **filters: HistoryStore.queryの検索条件（start、end、source_path、textなど）
         
         Returns:
             list: 履歴リスト
         """
-        return self.config.get("history", [])
+        return self.history.query(limit=limit, before_id=before_id, **filters)
+    
+    def flush_history(self):
+        """溜まっている履歴を履歴データベースに書き込む"""
+        if self._history is not None:
+            self._history.flush()
+    
+    def close(self):
+        """未保存の設定を書き込み、履歴データベースを閉じる（終了時に呼び出す）"""
+        self.flush()
+        if self._history is not None:
+            self._history.close()
 
     def update_config(self, new_config):
         """
@@ -241,9 +354,5 @@ class ConfigManager:
         Args:
             new_config (dict): 更新する設定のディクショナリ
         """
-        # 既存の設定を更新
-        for key, value in new_config.items():
-            self.config[key] = value
-        
-        # 設定を保存
-        self.save_config() 
\ No newline at end of file
+        # 既存の設定を更新（保存はバックグラウンドで行う）
+        self._set(new_config) 
\ No newline at end of file
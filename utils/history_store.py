@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+文字起こし履歴モジュール
+処理したファイルの履歴を組み込みのSQLiteデータベースに保存し、期間・元ファイル・本文の一部で検索する
+セグメントごとの本文は全文検索索引（FTS5）にも登録し、どの文字起こしの何秒目で話されたかを検索できる
+"""
+
+import os
+import re
+import time
+import unicodedata
+import sqlite3
+import datetime
+import threading
+import logging
+
+# ロガーの設定
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# デフォルトのデータベースファイル名（設定ファイルと同じディレクトリに作る）
+DEFAULT_DATABASE_NAME = "history.sqlite3"
+
+# まとめて書き込むまでに溜める件数と最長の待ち時間（秒）
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+# 1ページに返すデフォルトの件数
+DEFAULT_PAGE_SIZE = 50
+
+# 全文検索で返すデフォルトの件数
+DEFAULT_SEARCH_LIMIT = 100
+
+# 保存する項目（idを除く）
+COLUMNS = ("timestamp", "source_path", "output_path", "model", "language", "content_hash", "text")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    source_path TEXT NOT NULL,
+    output_path TEXT,
+    model TEXT,
+    language TEXT,
+    content_hash TEXT,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS history_source_path ON history (source_path);
+CREATE INDEX IF NOT EXISTS history_timestamp ON history (timestamp);
+CREATE INDEX IF NOT EXISTS history_model ON history (model);
+CREATE INDEX IF NOT EXISTS history_content_hash ON history (content_hash);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    history_id INTEGER NOT NULL REFERENCES history (id),
+    start_time REAL NOT NULL,
+    end_time REAL NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_history_id ON segments (history_id);
+"""
+
+# セグメント本文の全文検索索引（本文はsegmentsテーブルにあるので索引だけを持つ）
+_FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(tokens, content='')"
+
+# 空白で単語が区切られない文字（かな・漢字）の連なり。2文字ずつ区切って索引に登録する
+_NGRAM_RUN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff々〆]+")
+_WORD = re.compile(r"\w+")
+
+
+def _split(text):
+    """
+    正規化した文字列を単語とかな・漢字の連なりに分ける
+
+    Args:
+        text (str): 文字列
+
+    Returns:
+        list: (文字列, かな・漢字の連なりならTrue) のリスト
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    parts = []
+    pos = 0
+    for match in _NGRAM_RUN.finditer(text):
+        parts.extend((word, False) for word in _WORD.findall(text[pos:match.start()]))
+        parts.append((match.group(), True))
+        pos = match.end()
+    parts.extend((word, False) for word in _WORD.findall(text[pos:]))
+    return parts
+
+
+def index_tokens(text):
+    """
+    全文検索索引に登録するトークン列を作成
+
+    かな・漢字の連なりは2文字ずつずらしたバイグラムと末尾の1文字に分ける（形態素解析なしで任意の部分文字列を検索できる）
+
+    Args:
+        text (str): セグメントの本文
+
+    Returns:
+        str: 空白区切りのトークン列
+    """
+    tokens = []
+    for part, ngram in _split(text):
+        if ngram:
+            tokens.extend(part[i:i + 2] for i in range(len(part) - 1))
+            tokens.append(part[-1])
+        else:
+            tokens.append(part)
+    return " ".join(tokens)
+
+
+def match_expression(query):
+    """
+    検索語をFTS5の検索式に変換
+
+    かな・漢字の連なりは連続したバイグラムのフレーズ（1文字の場合は前方一致）、それ以外は単語として、すべてを含むセグメントを探す
+
+    Args:
+        query (str): 検索語
+
+    Returns:
+        str: 検索式（検索できる文字がない場合は空文字列）
+    """
+    terms = []
+    for part, ngram in _split(query):
+        if not ngram:
+            terms.append(f'"{part}"')
+        elif len(part) == 1:
+            terms.append(f'"{part}"*')
+        else:
+            terms.append('"' + " ".join(part[i:i + 2] for i in range(len(part) - 1)) + '"')
+    return " AND ".join(terms)
+
+
+def _escape_like(value):
+    """LIKEの特殊文字（%、_、\\）をエスケープ"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class HistoryStore:
+    """件数の上限なしで文字起こし履歴を保存するクラス（スレッドセーフ）"""
+
+    def __init__(self, db_path, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        """
+        初期化
+
+        Args:
+            db_path (str): データベースファイルのパス
+            batch_size (int): この件数が溜まったらまとめて書き込む
+            flush_interval (float): 最も古い未書き込みの履歴がこの秒数を超えたら書き込む
+        """
+        self.db_path = db_path if db_path == ":memory:" else os.path.abspath(db_path)
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = []
+        self._pending_since = None
+        self.fts_enabled = False
+        self._conn = self._connect()
+
+    def _connect(self):
+        """データベースを開いてテーブルと索引を作成（開けない場合はメモリ上のデータベースを使う）"""
+        try:
+            if self.db_path != ":memory:":
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            # 書き込み中も読み出しを妨げず、コミットごとのfsyncを減らす
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"履歴データベースを開けませんでした: {self.db_path}: {e}")
+            logger.info("履歴はメモリ上にのみ保存します")
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+            conn.executescript(_SCHEMA)
+        try:
+            conn.execute(_FTS_SCHEMA)
+            self.fts_enabled = True
+        except sqlite3.Error as e:
+            # FTS5なしでビルドされたSQLiteでは本文の部分一致で検索する
+            logger.warning(f"全文検索索引を作成できませんでした（部分一致で検索します）: {e}")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def add(self, source_path, output_path=None, model=None, language=None, content_hash=None,
+            text=None, timestamp=None, segments=None):
+        """
+        履歴を追加（一定の件数か時間が溜まるまで書き込みを遅らせる）
+
+        Args:
+            source_path (str): 処理したファイルのパス
+            output_path (str, optional): 出力ファイルのパス
+            model (str, optional): 使用したモデル
+            language (str, optional): 言語コード
+            content_hash (str, optional): 処理したファイルの内容のハッシュ
+            text (str, optional): 文字起こし結果の本文
+            timestamp (str, optional): ISO 8601形式の処理日時（Noneの場合は現在時刻）
+            segments (list, optional): 全文検索索引に登録するセグメント（start、end、textを持つ辞書）のリスト
+        """
+        if timestamp is None:
+            timestamp = datetime.datetime.now().isoformat()
+        row = (timestamp, source_path, output_path, model, language, content_hash, text)
+        segments = [
+            (float(segment["start"]), float(segment["end"]), segment["text"].strip())
+            for segment in segments or []
+            if segment.get("text", "").strip()
+        ]
+        with self._lock:
+            self._pending.append((row, segments))
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            if (len(self._pending) >= self.batch_size
+                    or time.monotonic() - self._pending_since >= self.flush_interval):
+                self._flush_locked()
+
+    def add_many(self, entries):
+        """
+        複数の履歴を1つのトランザクションで追加
+
+        Args:
+            entries (list): addの引数と同じキーを持つ辞書のリスト
+        """
+        now = datetime.datetime.now().isoformat()
+        rows = [
+            ((entry.get("timestamp") or now,) + tuple(entry.get(column) for column in COLUMNS[1:]), [])
+            for entry in entries
+        ]
+        with self._lock:
+            self._pending.extend(rows)
+            self._flush_locked()
+
+    def flush(self):
+        """溜まっている履歴を書き込む"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        """溜まっている履歴を1つのトランザクションで書き込む（ロック取得済みで呼び出す）"""
+        if not self._pending or self._conn is None:
+            return
+        try:
+            with self._conn:
+                for row, segments in self._pending:
+                    cursor = self._conn.execute(
+                        f"INSERT INTO history ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                        row,
+                    )
+                    self._insert_segments_locked(cursor.lastrowid, segments)
+        except sqlite3.Error as e:
+            # 次の書き込みで再試行する
+            logger.warning(f"履歴を書き込めませんでした: {e}")
+            return
+        self._pending = []
+        self._pending_since = None
+
+    def _insert_segments_locked(self, history_id, segments):
+        """セグメントを保存して全文検索索引に登録（ロック取得済み・トランザクション内で呼び出す）"""
+        for start, end, text in segments:
+            cursor = self._conn.execute(
+                "INSERT INTO segments (history_id, start_time, end_time, text) VALUES (?, ?, ?, ?)",
+                (history_id, start, end, text),
+            )
+            if self.fts_enabled:
+                self._conn.execute(
+                    "INSERT INTO segments_fts (rowid, tokens) VALUES (?, ?)",
+                    (cursor.lastrowid, index_tokens(text)),
+                )
+
+    @staticmethod
+    def _where(start=None, end=None, source_path=None, model=None, content_hash=None, text=None):
+        """検索条件からWHERE句とパラメータを作成"""
+        clauses = []
+        params = []
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(start.isoformat() if hasattr(start, "isoformat") else start)
+        if end is not None:
+            clauses.append("timestamp < ?")
+            params.append(end.isoformat() if hasattr(end, "isoformat") else end)
+        if source_path is not None:
+            clauses.append("source_path = ?")
+            params.append(source_path)
+        if model is not None:
+            clauses.append("model = ?")
+            params.append(model)
+        if content_hash is not None:
+            clauses.append("content_hash = ?")
+            params.append(content_hash)
+        if text:
+            clauses.append("text LIKE ? ESCAPE '\\'")
+            params.append(f"%{_escape_like(text)}%")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def query(self, start=None, end=None, source_path=None, model=None, content_hash=None, text=None,
+              limit=DEFAULT_PAGE_SIZE, before_id=None):
+        """
+        履歴を新しい順に1ページ分検索
+
+        次のページは、前のページの最後のidをbefore_idに渡して取得する（全件を読み込まずにページ送りできる）
+
+        Args:
+            start (datetime or str, optional): この日時以降の履歴
+            end (datetime or str, optional): この日時より前の履歴
+            source_path (str, optional): 元ファイルのパス
+            model (str, optional): 使用したモデル
+            content_hash (str, optional): 元ファイルの内容のハッシュ
+            text (str, optional): 本文に含まれる文字列
+            limit (int): 1ページの件数
+            before_id (int, optional): このidより古い履歴から取得
+
+        Returns:
+            list: 履歴（id、COLUMNSの各項目を持つ辞書）のリスト
+        """
+        where, params = self._where(start, end, source_path, model, content_hash, text)
+        if before_id is not None:
+            where = f"{where} AND id < ?" if where else "WHERE id < ?"
+            params.append(before_id)
+        params.append(int(limit))
+        with self._lock:
+            self._flush_locked()
+            rows = self._conn.execute(
+                f"SELECT id, {', '.join(COLUMNS)} FROM history {where} ORDER BY id DESC LIMIT ?",
+                params,
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self, start=None, end=None, source_path=None, model=None, content_hash=None, text=None):
+        """
+        条件に合う履歴の件数を取得
+
+        Args:
+            start (datetime or str, optional): この日時以降の履歴
+            end (datetime or str, optional): この日時より前の履歴
+            source_path (str, optional): 元ファイルのパス
+            model (str, optional): 使用したモデル
+            content_hash (str, optional): 元ファイルの内容のハッシュ
+            text (str, optional): 本文に含まれる文字列
+
+        Returns:
+            int: 件数
+        """
+        where, params = self._where(start, end, source_path, model, content_hash, text)
+        with self._lock:
+            self._flush_locked()
+            return self._conn.execute(f"SELECT COUNT(*) FROM history {where}", params).fetchone()[0]
+
+    def get(self, history_id):
+        """
+        履歴を1件取得
+
+        Args:
+            history_id (int): 履歴のid
+
+        Returns:
+            dict: 履歴（存在しない場合はNone）
+        """
+        with self._lock:
+            self._flush_locked()
+            row = self._conn.execute(
+                f"SELECT id, {', '.join(COLUMNS)} FROM history WHERE id = ?", (history_id,)
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def get_segments(self, history_id):
+        """
+        履歴のセグメントを時刻順に取得
+
+        Args:
+            history_id (int): 履歴のid
+
+        Returns:
+            list: セグメント（start、end、textを持つ辞書）のリスト
+        """
+        with self._lock:
+            self._flush_locked()
+            rows = self._conn.execute(
+                "SELECT start_time, end_time, text FROM segments WHERE history_id = ? ORDER BY id",
+                (history_id,),
+            ).fetchall()
+        return [{"start": row[0], "end": row[1], "text": row[2]} for row in rows]
+
+    def search(self, query, limit=DEFAULT_SEARCH_LIMIT):
+        """
+        セグメントの本文を全文検索し、関連度の高い順に取得
+
+        Args:
+            query (str): 検索語
+            limit (int): 最大件数
+
+        Returns:
+            list: 検索結果（history_id、start、end、text、source_path、output_path、timestampを持つ辞書）のリスト
+        """
+        columns = ("s.history_id, s.start_time AS start, s.end_time AS end, s.text, "
+                   "h.source_path, h.output_path, h.timestamp")
+        expression = match_expression(query)
+        if not expression:
+            return []
+        with self._lock:
+            self._flush_locked()
+            if self.fts_enabled:
+                rows = self._conn.execute(
+                    f"SELECT {columns} FROM segments_fts "
+                    "JOIN segments s ON s.id = segments_fts.rowid JOIN history h ON h.id = s.history_id "
+                    "WHERE segments_fts MATCH ? ORDER BY segments_fts.rank LIMIT ?",
+                    (expression, int(limit)),
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    f"SELECT {columns} FROM segments s JOIN history h ON h.id = s.history_id "
+                    "WHERE s.text LIKE ? ESCAPE '\\' ORDER BY s.id DESC LIMIT ?",
+                    (f"%{_escape_like(query.strip())}%", int(limit)),
+                ).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        """溜まっている履歴を書き込んでデータベースを閉じる"""
+        with self._lock:
+            if self._conn is None:
+                return
+            self._flush_locked()
+            self._conn.close()
+            self._conn = None
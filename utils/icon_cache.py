@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+アイコン画像キャッシュモジュール
+元のPNGのハッシュと更新日時をキーに、加工済みのアイコン（ICO・リサイズ済みPNG）をディスクに保存し、
+デコード済みの画像はプロセス内で共有する
+"""
+
+import os
+import json
+import hashlib
+import threading
+import logging
+
+from PIL import Image, ImageEnhance, ImageTk
+
+# ロガーの設定
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# デフォルトのキャッシュディレクトリ
+DEFAULT_CACHE_DIR = os.path.join("resources", ".cache")
+
+# アプリケーションアイコンに含めるサイズ（Windows推奨サイズ）
+ICON_SIZES = [(16, 16), (24, 24), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)]
+
+# 加工処理が変わった場合に古いキャッシュを無効にするためのバージョン
+CACHE_VERSION = 1
+
+# 元画像の情報を保存するファイル名
+_MANIFEST_FILE = "manifest.json"
+
+
+def build_app_icon(img):
+    """
+    ロゴ画像から複数サイズのアイコン画像を作成
+
+    Args:
+        img (PIL.Image.Image): 元のロゴ画像
+
+    Returns:
+        list: サイズごとのPIL.Image.Imageのリスト
+    """
+    # 背景が透明でない場合は透明な背景を作成
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+
+    # コントラストとシャープネスを少し上げて鮮明にする
+    enhancer = ImageEnhance.Contrast(img)
+    img = enhancer.enhance(1.2)  # コントラストを20%上げる
+
+    enhancer = ImageEnhance.Sharpness(img)
+    img = enhancer.enhance(1.5)  # シャープネスを50%上げる
+
+    icon_images = []
+    for size in ICON_SIZES:
+        # アイコン用の新しい正方形画像を作成 (透明背景)
+        square_img = Image.new('RGBA', size, (0, 0, 0, 0))
+
+        # 小さいサイズほどアンチエイリアスを調整
+        if size[0] <= 32:
+            # 元画像を一度大きめにリサイズしてからシャープネスを上げる (小さいアイコン向け)
+            temp_size = (size[0] * 3, size[1] * 3)
+            temp_img = img.resize(temp_size, Image.LANCZOS)
+
+            # シャープネスを上げる
+            enhancer = ImageEnhance.Sharpness(temp_img)
+            temp_img = enhancer.enhance(2.0)  # 小さいアイコンは特にシャープに
+
+            # 最終サイズにリサイズ
+            resized_img = temp_img.resize(size, Image.LANCZOS)
+        else:
+            # 大きめのアイコンは直接リサイズ
+            resized_img = img.resize(size, Image.LANCZOS)
+
+        # 中央に配置
+        paste_x = (size[0] - resized_img.width) // 2
+        paste_y = (size[1] - resized_img.height) // 2
+        square_img.paste(resized_img, (paste_x, paste_y), resized_img)
+
+        icon_images.append(square_img)
+    return icon_images
+
+
+def brighten(img, amount=100):
+    """
+    画像を明るく加工（無効状態のボタン表示用、アルファは保持）
+
+    Args:
+        img (PIL.Image.Image): RGBA画像
+        amount (int): RGBに加える値
+
+    Returns:
+        PIL.Image.Image: 加工した画像
+    """
+    r, g, b, a = img.split()
+    r, g, b = (band.point(lambda value: min(255, value + amount)) for band in (r, g, b))
+    return Image.merge("RGBA", (r, g, b, a))
+
+
+class IconCache:
+    """加工済みアイコン画像のキャッシュクラス（スレッドセーフ）"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        """
+        初期化
+
+        Args:
+            cache_dir (str): 加工済み画像を保存するディレクトリ
+        """
+        self.cache_dir = os.path.abspath(cache_dir)
+        self._lock = threading.Lock()
+        # キャッシュキー -> デコード済みのPIL画像
+        self._images = {}
+        # キャッシュキー -> ImageTk.PhotoImage
+        self._photos = {}
+        self._manifest = self._load_manifest()
+
+    def _manifest_path(self):
+        """マニフェストファイルのパス"""
+        return os.path.join(self.cache_dir, _MANIFEST_FILE)
+
+    def _load_manifest(self):
+        """元画像のパス -> (サイズ, 更新日時, ハッシュ) を読み込む"""
+        try:
+            with open(self._manifest_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest_locked(self):
+        """マニフェストを保存（ロック取得済みで呼び出す）"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self._manifest_path(), "w", encoding="utf-8") as f:
+                json.dump(self._manifest, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            logger.warning(f"アイコンキャッシュのマニフェストを保存できませんでした: {e}")
+
+    def source_key(self, source_path):
+        """
+        元画像のキーを取得（サイズと更新日時が変わっていなければハッシュを再計算しない）
+
+        Args:
+            source_path (str): 元のPNGのパス
+
+        Returns:
+            str: 元画像の内容のハッシュ
+        """
+        path = os.path.abspath(source_path)
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._manifest.get(path)
+            if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                return entry["sha256"]
+
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        with self._lock:
+            self._manifest[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+            self._save_manifest_locked()
+        return digest
+
+    def _cache_key(self, source_path, variant):
+        """元画像のハッシュと加工内容からキャッシュキーを作成"""
+        return f"{self.source_key(source_path)[:20]}_{variant}_v{CACHE_VERSION}"
+
+    def _image_key(self, source_path, size, disabled):
+        """加工済み画像のキャッシュキーを作成"""
+        variant = f"{size[0]}x{size[1]}" if size else "orig"
+        if disabled:
+            variant += "_disabled"
+        return self._cache_key(source_path, variant)
+
+    def get_image(self, source_path, size=None, disabled=False):
+        """
+        加工済みの画像を取得（未作成の場合は作成してキャッシュ）
+
+        Args:
+            source_path (str): 元のPNGのパス
+            size (tuple, optional): リサイズ後のサイズ (None=元のサイズ)
+            disabled (bool): 無効状態用に明るく加工するかどうか
+
+        Returns:
+            PIL.Image.Image: RGBA画像
+        """
+        key = self._image_key(source_path, size, disabled)
+        with self._lock:
+            img = self._images.get(key)
+        if img is not None:
+            return img
+
+        cached_path = os.path.join(self.cache_dir, f"{key}.png")
+        try:
+            img = Image.open(cached_path)
+            img.load()
+        except (OSError, ValueError):
+            img = Image.open(source_path).convert("RGBA")
+            if disabled:
+                img = brighten(img)
+            if size and img.size != tuple(size):
+                img = img.resize(tuple(size), Image.LANCZOS)
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                img.save(cached_path, format="PNG")
+            except OSError as e:
+                logger.warning(f"アイコン画像をキャッシュできませんでした: {e}")
+
+        with self._lock:
+            self._images[key] = img
+        return img
+
+    def get_photo(self, source_path, size=None, disabled=False):
+        """
+        Tkinterで表示できる画像を取得（同じ画像は同じPhotoImageを返す）
+
+        Args:
+            source_path (str): 元のPNGのパス
+            size (tuple, optional): リサイズ後のサイズ (None=元のサイズ)
+            disabled (bool): 無効状態用に明るく加工するかどうか
+
+        Returns:
+            ImageTk.PhotoImage: 画像（Tkのルートウィンドウ作成後に呼び出す）
+        """
+        key = self._image_key(source_path, size, disabled)
+        with self._lock:
+            photo = self._photos.get(key)
+        if photo is None:
+            photo = ImageTk.PhotoImage(self.get_image(source_path, size=size, disabled=disabled))
+            with self._lock:
+                photo = self._photos.setdefault(key, photo)
+        return photo
+
+    def get_app_icon(self, source_path):
+        """
+        アプリケーションアイコン（複数サイズのICO）を取得（未作成の場合は作成してキャッシュ）
+
+        Args:
+            source_path (str): 元のロゴ画像のパス
+
+        Returns:
+            str: ICOファイルのパス
+        """
+        icon_path = os.path.join(self.cache_dir, f"{self._cache_key(source_path, 'app_icon')}.ico")
+        if os.path.exists(icon_path):
+            return icon_path
+
+        icon_images = build_app_icon(Image.open(source_path))
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # 書きかけのファイルを使わないように一時ファイルに書いてから置き換える
+        temp_path = f"{icon_path}.{os.getpid()}.tmp"
+        # 各サイズ用に加工した画像をそのまま格納する（最大サイズを基準に他のサイズを追加）
+        icon_images[-1].save(temp_path, format='ICO', sizes=[img.size for img in icon_images],
+                             append_images=icon_images[:-1])
+        os.replace(temp_path, icon_path)
+        logger.info(f"アプリケーションアイコンを作成しました: {icon_path}")
+        return icon_path
+
+
+# プロセス全体で共有するキャッシュ
+icon_cache = IconCache()
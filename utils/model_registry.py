@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+モデルレジストリモジュール
+ロード済みのWhisperモデルをプロセス全体で共有し、ファイルごとの再ロードを防ぐ
+"""
+
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+# ロガーの設定
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# デフォルトのメモリ予算（MB）
+DEFAULT_MEMORY_BUDGET_MB = 4096
+
+# 未ロードのモデルの必要メモリを見積もるためのパラメータ数（百万単位）
+MODEL_PARAMS_M = {
+    "tiny": 39,
+    "base": 74,
+    "small": 244,
+    "medium": 769,
+    "large": 1550,
+    "turbo": 809,
+}
+
+
+def estimate_model_bytes(model):
+    """
+    モデルが保持するパラメータとバッファのバイト数を見積もる
+
+    Args:
+        model: torch.nn.Module
+
+    Returns:
+        int: 推定バイト数
+    """
+    total = 0
+    try:
+        for tensor in list(model.parameters()) + list(model.buffers()):
+            total += tensor.numel() * tensor.element_size()
+        for module in model.modules():
+            # 動的量子化したLinear層の重みはパラメータに含まれないため別に数える
+            weight = getattr(module, "weight", None)
+            if callable(weight):
+                tensor = weight()
+                total += tensor.numel() * tensor.element_size()
+    except Exception:
+        # nn.Module以外のオブジェクトはサイズ不明として扱う
+        pass
+    return total
+
+
+class ModelRegistry:
+    """スレッドセーフなLRUモデルレジストリクラス"""
+
+    def __init__(self, loader, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, size_estimator=estimate_model_bytes):
+        """
+        初期化
+
+        Args:
+            loader (function): (model_name, device, dtype) を受け取りモデルを返すロード関数
+            memory_budget_mb (float): 常駐させるモデルの合計メモリ上限（MB）
+            size_estimator (function, optional): モデルのバイト数を見積もる関数
+        """
+        self._loader = loader
+        self._size_estimator = size_estimator
+        self._memory_budget = int(memory_budget_mb * 1024 * 1024)
+
+        # key -> (model, bytes) を最近使った順に保持
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        # 同じモデルの同時ロードを防ぐためのキーごとのロック
+        self._load_locks = {}
+        # key -> 使用中として固定している数（固定中のモデルは解放しない）
+        self._pins = {}
+
+        # 統計情報
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._load_times = {}
+
+    @staticmethod
+    def _make_key(model_name, device, dtype, replica=0):
+        """レジストリのキーを作成"""
+        key = (model_name, str(device), str(dtype))
+        # 複製モデルは別エントリとして保持する
+        return key if replica == 0 else key + (replica,)
+
+    def get(self, model_name, device="cpu", dtype="float32", replica=0, pin=False):
+        """
+        モデルを取得（未ロードの場合はロードしてキャッシュ）
+
+        Args:
+            model_name (str): Whisperモデル名
+            device (str): デバイス名
+            dtype (str): モデルのデータ型
+            replica (int): 並列処理で同時に推論するための複製番号 (0=共有モデル)
+            pin (bool): Trueの場合はunpinを呼ぶまで使用中として固定し、他のモデルのロードで解放されないようにする
+
+        Returns:
+            モデルオブジェクト
+        """
+        key = self._make_key(model_name, device, dtype, replica)
+
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                self._hits += 1
+                if pin:
+                    self._pins[key] = self._pins.get(key, 0) + 1
+                return entry[0]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            # 他のスレッドが先にロードを完了していないか再確認
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    self._models.move_to_end(key)
+                    self._hits += 1
+                    if pin:
+                        self._pins[key] = self._pins.get(key, 0) + 1
+                    return entry[0]
+                self._misses += 1
+                # 新しいモデルを読み込む前に予算を空けておく
+                self._evict_locked(reserve=self._estimate_reserve(key))
+
+            start_time = time.perf_counter()
+            model = self._loader(model_name, device, dtype)
+            elapsed = time.perf_counter() - start_time
+            size = self._size_estimator(model)
+            logger.info(f"モデルをロードしました: {key} ({elapsed:.2f}秒, {size / (1024 * 1024):.0f}MB)")
+
+            with self._lock:
+                self._models[key] = (model, size)
+                self._load_times.setdefault(key, []).append(elapsed)
+                if pin:
+                    self._pins[key] = self._pins.get(key, 0) + 1
+                self._evict_locked()
+                self._load_locks.pop(key, None)
+
+            return model
+
+    def unpin(self, model_name, device="cpu", dtype="float32", replica=0):
+        """
+        get(pin=True)で固定したモデルの固定を1つ外す（すべて外れると通常どおりLRUで解放される）
+
+        Args:
+            model_name (str): Whisperモデル名
+            device (str): デバイス名
+            dtype (str): モデルのデータ型
+            replica (int): 複製番号
+        """
+        key = self._make_key(model_name, device, dtype, replica)
+        with self._lock:
+            count = self._pins.get(key, 0) - 1
+            if count > 0:
+                self._pins[key] = count
+            else:
+                self._pins.pop(key, None)
+            self._evict_locked()
+
+    def fits(self, model_name, device="cpu", dtype="float32", replicas=1):
+        """
+        モデルをreplicas個同時に常駐させてもメモリ予算に収まるかを確認
+
+        Args:
+            model_name (str): Whisperモデル名
+            device (str): デバイス名
+            dtype (str): モデルのデータ型
+            replicas (int): 同時に常駐させる数
+
+        Returns:
+            bool: 収まる場合はTrue
+        """
+        with self._lock:
+            size = self._estimate_reserve(self._make_key(model_name, device, dtype))
+            return size * replicas <= self._memory_budget
+
+    def _estimate_reserve(self, key):
+        """これからロードするモデルの必要メモリを推定（ロック取得済みで呼び出す）"""
+        model_name, dtype = key[0], key[2]
+        for other_key, (_, size) in self._models.items():
+            # 同じモデルでもデータ型（int8とfloat32など）が違えばサイズが異なる
+            if (other_key[0], other_key[2]) == (model_name, dtype):
+                return size
+        params_m = MODEL_PARAMS_M.get(model_name.split(".")[0].split("-")[0], 0)
+        if dtype == "int8":
+            # 埋め込みなど量子化しない層が残るため1バイトより多めに見積もる
+            bytes_per_param = 2
+        else:
+            bytes_per_param = 2 if dtype == "float16" else 4
+        return params_m * 1000 * 1000 * bytes_per_param
+
+    def _evict_locked(self, reserve=0):
+        """
+        メモリ予算を超えた分を古い順に解放（ロック取得済みで呼び出す）
+
+        Args:
+            reserve (int): これからロードするモデル用に確保するバイト数
+        """
+        while self._models:
+            used = sum(size for _, size in self._models.values())
+            if used + reserve <= self._memory_budget:
+                break
+            # 直近のモデルは予算を超えていても必ず残す（これからロードする場合を除く）。
+            # 使用中として固定しているモデルはメモリを使い続けるため、解放せずに使用量には含める
+            newest = None if reserve else next(reversed(self._models))
+            key = next((key for key in self._models if key not in self._pins and key != newest), None)
+            if key is None:
+                break
+            del self._models[key]
+            self._evictions += 1
+            logger.info(f"モデルをレジストリから解放しました: {key}")
+
+    def set_memory_budget(self, memory_budget_mb):
+        """
+        メモリ予算を変更
+
+        Args:
+            memory_budget_mb (float): 常駐させるモデルの合計メモリ上限（MB）
+        """
+        with self._lock:
+            self._memory_budget = int(memory_budget_mb * 1024 * 1024)
+            self._evict_locked()
+
+    def evict(self, model_name=None):
+        """
+        モデルを解放
+
+        Args:
+            model_name (str, optional): 解放するモデル名 (None=全て、使用中として固定しているモデルは除く)
+        """
+        with self._lock:
+            for key in list(self._models.keys()):
+                if (model_name is None or key[0] == model_name) and key not in self._pins:
+                    del self._models[key]
+                    self._evictions += 1
+
+    def stats(self):
+        """
+        統計情報を取得
+
+        Returns:
+            dict: ヒット数、ミス数、ロード時間などの統計
+        """
+        with self._lock:
+            requests = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / requests if requests else 0.0,
+                "evictions": self._evictions,
+                "resident": [key for key in self._models.keys()],
+                "pinned": [key for key in self._pins.keys()],
+                "resident_bytes": sum(size for _, size in self._models.values()),
+                "memory_budget_bytes": self._memory_budget,
+                "load_seconds": {key: list(times) for key, times in self._load_times.items()},
+                "total_load_seconds": sum(sum(times) for times in self._load_times.values()),
+            }
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+プロファイリングモジュール
+文字起こしの各段階（モデルロード、音声抽出、メルスペクトログラム、ウィンドウごとのエンコード・デコード、
+フォールバック、アライメント）の所要時間をスパンとして記録し、差し替え可能な出力先（シンク）に送る
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+import contextlib
+
+# ロガーの設定
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# 文字起こし結果の隣に書き出す集計ファイルの拡張子
+SUMMARY_SUFFIX = ".profile.json"
+
+
+class MemorySink:
+    """スパンをメモリ上のリストに保持するシンク（テスト・デバッグ用、スレッドセーフ）"""
+
+    def __init__(self):
+        """初期化"""
+        self.events = []
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        """
+        スパンを記録
+
+        Args:
+            event (dict): スパンの内容
+        """
+        with self._lock:
+            self.events.append(event)
+
+    def close(self):
+        """何もしない（JsonlSinkと同じように扱うため）"""
+
+
+class JsonlSink:
+    """スパンを1行1件のJSONとしてファイルに追記するシンク（スレッドセーフ）"""
+
+    def __init__(self, path):
+        """
+        初期化
+
+        Args:
+            path (str): 追記するJSONLファイルのパス
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def emit(self, event):
+        """
+        スパンを1行追記（書き込めない場合は警告のみ）
+
+        Args:
+            event (dict): スパンの内容
+        """
+        line = json.dumps(event, ensure_ascii=False)
+        with self._lock:
+            try:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._file.write(line + "\n")
+                self._file.flush()
+            except OSError as e:
+                logger.warning(f"プロファイルを書き込めませんでした: {self.path}: {e}")
+
+    def close(self):
+        """ファイルを閉じる"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class Profiler:
+    """1ファイル分の文字起こしのスパンを記録し、シンクへの送出と段階ごとの集計を行うクラス"""
+
+    def __init__(self, sink=None, **context):
+        """
+        初期化
+
+        Args:
+            sink (MemorySink or JsonlSink, optional): スパンの送り先（Noneの場合は集計のみ）
+            **context: すべてのスパンに付ける属性（ファイル名など）
+        """
+        self.sink = sink
+        self.context = dict(context)
+        self._started = time.perf_counter()
+        self._stages = {}
+        self._temperatures = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        """実行中のスパンごとに、内側のスパンの合計秒数を積むスレッドごとのスタック"""
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        """
+        with文の区間を1つのスパンとして記録
+
+        Args:
+            name (str): 段階の名前
+            **attributes: スパンに付ける属性（ウィンドウの位置、温度など）
+        """
+        wall = time.time()
+        start = time.perf_counter()
+        stack = self._stack()
+        stack.append(0.0)
+        try:
+            yield
+        finally:
+            nested = stack.pop()
+            self._record(name, wall, time.perf_counter() - start, nested, attributes)
+
+    def add(self, name, seconds, **attributes):
+        """
+        別に計測した区間をスパンとして記録
+
+        Args:
+            name (str): 段階の名前
+            seconds (float): 所要時間（秒）
+            **attributes: スパンに付ける属性
+        """
+        self._record(name, time.time() - seconds, seconds, 0.0, attributes)
+
+    def _record(self, name, wall, seconds, nested, attributes):
+        """スパンを集計してシンクに送る"""
+        stack = self._stack()
+        if stack:
+            # 外側のスパンの自己時間から除く
+            stack[-1] += seconds
+
+        with self._lock:
+            stage = self._stages.setdefault(name, {"count": 0, "seconds": 0.0, "self_seconds": 0.0})
+            stage["count"] += 1
+            stage["seconds"] += seconds
+            stage["self_seconds"] += seconds - nested
+            if name == "decode" and "temperature" in attributes:
+                temperature = float(attributes["temperature"])
+                self._temperatures[temperature] = self._temperatures.get(temperature, 0) + 1
+
+        if self.sink is not None:
+            event = {"name": name, "start": round(wall, 6), "seconds": round(seconds, 6)}
+            event.update(self.context)
+            event.update(attributes)
+            try:
+                self.sink.emit(event)
+            except Exception as e:
+                logger.warning(f"プロファイルを送出できませんでした: {e}")
+
+    def summary(self):
+        """
+        段階ごとの集計を取得
+
+        Returns:
+            dict: 経過時間、段階ごとの回数・合計秒数・自己時間（内側の段階を除いた秒数）、
+                温度ごとのデコード回数と、最初の温度より高い温度でのやり直し（フォールバック）回数
+        """
+        with self._lock:
+            stages = {
+                name: {
+                    "count": stage["count"],
+                    "seconds": round(stage["seconds"], 3),
+                    "self_seconds": round(stage["self_seconds"], 3),
+                }
+                for name, stage in self._stages.items()
+            }
+            temperatures = dict(sorted(self._temperatures.items()))
+
+        lowest = min(temperatures) if temperatures else None
+        return {
+            **self.context,
+            "elapsed_seconds": round(time.perf_counter() - self._started, 3),
+            "stages": stages,
+            "decodes_per_temperature": {str(t): count for t, count in temperatures.items()},
+            "fallbacks": sum(count for t, count in temperatures.items() if t != lowest),
+        }
+
+
+def write_summary(summary, transcript_path):
+    """
+    集計を文字起こし結果ファイルの隣にJSONで保存
+
+    Args:
+        summary (dict): Profiler.summaryの戻り値
+        transcript_path (str): 文字起こし結果ファイルのパス
+
+    Returns:
+        str: 保存したファイルのパス
+    """
+    summary_path = os.path.splitext(transcript_path)[0] + SUMMARY_SUFFIX
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary_path
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+文字起こし結果キャッシュモジュール
+ファイル内容のハッシュと文字起こし条件をキーに、文字起こし結果をディスクに保存して再利用する
+"""
+
+import os
+import json
+import hashlib
+import threading
+import logging
+
+# ロガーの設定
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# デフォルトのキャッシュ容量上限（MB）
+DEFAULT_MAX_SIZE_MB = 512
+
+# キャッシュのフォーマットやキーの内容が変わった場合に古いエントリを無効にするためのバージョン
+CACHE_VERSION = 2
+
+# ファイルハッシュの読み込み単位
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+# 統計情報を保存するファイル名
+_STATS_FILE = "stats.json"
+
+# ファイルのパス -> (サイズ, 更新日時, ハッシュ) を保存するファイル名
+_FINGERPRINTS_FILE = "fingerprints.json"
+
+
+def file_fingerprint(file_path):
+    """
+    ファイル内容のハッシュを計算
+
+    Args:
+        file_path (str): ファイルのパス
+
+    Returns:
+        str: BLAKE2bの16進ダイジェスト
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as f:
+        while True:
+            block = f.read(_HASH_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """容量上限付きの文字起こし結果キャッシュクラス（スレッドセーフ）"""
+
+    def __init__(self, cache_dir, max_size_mb=DEFAULT_MAX_SIZE_MB):
+        """
+        初期化
+
+        Args:
+            cache_dir (str): キャッシュを保存するディレクトリ
+            max_size_mb (float): キャッシュの合計サイズ上限（MB）
+        """
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        # path -> [size, mtime_ns, ハッシュ]（実行をまたいで同じファイルを何度も読み直さないため、ディスクにも保存する）
+        self._fingerprints = self._load_fingerprints()
+        self._stats = self._load_stats()
+        # 保存していない統計情報の変更があるか（closeでまとめて保存する）
+        self._stats_dirty = False
+
+    def _stats_path(self):
+        """統計情報ファイルのパス"""
+        return os.path.join(self.cache_dir, _STATS_FILE)
+
+    def _fingerprints_path(self):
+        """ハッシュの記録ファイルのパス"""
+        return os.path.join(self.cache_dir, _FINGERPRINTS_FILE)
+
+    def _load_stats(self):
+        """保存済みの統計情報を読み込む"""
+        stats = {"hits": 0, "misses": 0}
+        try:
+            with open(self._stats_path(), "r", encoding="utf-8") as f:
+                stats.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        return stats
+
+    def _load_fingerprints(self):
+        """保存済みのハッシュを読み込む（存在しなくなったファイルの分は除く）"""
+        try:
+            with open(self._fingerprints_path(), "r", encoding="utf-8") as f:
+                fingerprints = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(fingerprints, dict):
+            return {}
+        return {path: entry for path, entry in fingerprints.items() if os.path.exists(path)}
+
+    def _write_json_locked(self, path, data):
+        """JSONファイルを一時ファイル経由で置き換える（ロック取得済みで呼び出す）"""
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"キャッシュの管理情報を保存できませんでした: {path} ({e})")
+            self._remove(temp_path)
+
+    def _save_stats_locked(self):
+        """統計情報を保存（ロック取得済みで呼び出す）"""
+        self._write_json_locked(self._stats_path(), self._stats)
+        self._stats_dirty = False
+
+    def close(self):
+        """まだ保存していない統計情報を保存"""
+        with self._lock:
+            if self._stats_dirty:
+                self._save_stats_locked()
+
+    def fingerprint(self, file_path):
+        """
+        ファイル内容のハッシュを取得（サイズと更新日時が同じ間は、次回以降の実行でも再計算しない）
+
+        Args:
+            file_path (str): ファイルのパス
+
+        Returns:
+            str: ハッシュ
+        """
+        stat = os.stat(file_path)
+        path = os.path.abspath(file_path)
+        with self._lock:
+            entry = self._fingerprints.get(path)
+        if entry is not None and entry[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return entry[2]
+
+        digest = file_fingerprint(file_path)
+        with self._lock:
+            self._fingerprints[path] = [stat.st_size, stat.st_mtime_ns, digest]
+            # ハッシュの計算はファイル全体を読むため、記録の保存はそれに比べて十分軽い
+            self._write_json_locked(self._fingerprints_path(), self._fingerprints)
+        return digest
+
+    def make_key(self, file_path, model_name, language=None, options=None):
+        """
+        キャッシュキーを作成
+
+        Args:
+            file_path (str): 処理対象ファイルのパス
+            model_name (str): Whisperモデル名
+            language (str, optional): 言語コード (None=自動検出)
+            options (dict, optional): 結果に影響するその他の文字起こしオプション
+
+        Returns:
+            str: キャッシュキー
+        """
+        payload = json.dumps({
+            "version": CACHE_VERSION,
+            "audio": self.fingerprint(file_path),
+            "model": model_name,
+            "language": language or None,
+            "options": options or {},
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        """エントリのファイルパス（1ディレクトリのファイル数を抑えるため先頭2文字で分ける）"""
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def contains(self, key):
+        """
+        エントリが存在するかを確認（統計には数えない）
+
+        Args:
+            key (str): キャッシュキー
+
+        Returns:
+            bool: 存在する場合はTrue
+        """
+        return os.path.exists(self._entry_path(key))
+
+    def get(self, key):
+        """
+        キャッシュから結果を取得
+
+        Args:
+            key (str): キャッシュキー
+
+        Returns:
+            dict: 文字起こし結果（存在しない場合はNone）
+        """
+        path = self._entry_path(key)
+        result = None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+            # 最近使ったエントリが追い出されないように更新日時を更新
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"壊れたキャッシュエントリを削除します: {path} ({e})")
+            self._remove(path)
+
+        with self._lock:
+            self._stats["hits" if result is not None else "misses"] += 1
+            self._stats_dirty = True
+        return result
+
+    def put(self, key, result):
+        """
+        結果をキャッシュに保存
+
+        Args:
+            key (str): キャッシュキー
+            result (dict): 文字起こし結果
+        """
+        path = self._entry_path(key)
+        # 書きかけのファイルを読まないように一時ファイルに書いてから置き換える
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"文字起こし結果をキャッシュできませんでした: {e}")
+            self._remove(temp_path)
+            return
+
+        with self._lock:
+            self._evict_locked()
+
+    def _entries(self):
+        """
+        全エントリを取得
+
+        Returns:
+            list: (パス, サイズ, 最終使用日時) のリスト
+        """
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(shard_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    @staticmethod
+    def _remove(path):
+        """ファイルを削除（存在しない場合は無視）"""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict_locked(self):
+        """容量上限を超えた分を最後に使った日時が古い順に削除（ロック取得済みで呼び出す）"""
+        entries = self._entries()
+        used = sum(size for _, size, _ in entries)
+        if used <= self.max_size:
+            return
+        evicted = 0
+        for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if used <= self.max_size:
+                break
+            self._remove(path)
+            used -= size
+            evicted += 1
+        self._stats["evictions"] = self._stats.get("evictions", 0) + evicted
+        self._save_stats_locked()
+        logger.info(f"キャッシュから{evicted}件のエントリを削除しました")
+
+    def set_max_size(self, max_size_mb):
+        """
+        容量上限を変更
+
+        Args:
+            max_size_mb (float): キャッシュの合計サイズ上限（MB）
+        """
+        with self._lock:
+            self.max_size = int(max_size_mb * 1024 * 1024)
+            self._evict_locked()
+
+    def clear(self):
+        """全エントリと統計情報を削除"""
+        with self._lock:
+            for path, _, _ in self._entries():
+                self._remove(path)
+            self._stats = {"hits": 0, "misses": 0}
+            self._save_stats_locked()
+            self._fingerprints.clear()
+            self._remove(self._fingerprints_path())
+
+    def stats(self):
+        """
+        統計情報を取得
+
+        Returns:
+            dict: エントリ数、合計サイズ、ヒット率などの統計
+        """
+        with self._lock:
+            entries = self._entries()
+            hits = self._stats.get("hits", 0)
+            misses = self._stats.get("misses", 0)
+            requests = hits + misses
+            return {
+                "entries": len(entries),
+                "size_bytes": sum(size for _, size, _ in entries),
+                "max_size_bytes": self.max_size,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / requests if requests else 0.0,
+                "evictions": self._stats.get("evictions", 0),
+            }
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+文字起こし結果出力モジュール
+文字起こし結果をファイルに保存する（GUIとCLIで共通）
+"""
+
+import os
+import json
+import time
+import shutil
+import datetime
+
+# 対応する出力形式（字幕・TSVの書式はwhisper.utilsのWriteSRT/WriteVTT/WriteTSVと同じ）
+OUTPUT_FORMATS = ("txt", "json", "srt", "vtt", "tsv")
+
+# 書きかけの出力ファイルの拡張子（完成したら外す）
+PARTIAL_SUFFIX = ".part"
+
+# 書きかけの出力ファイルをディスクに書き出す間隔（秒）
+FLUSH_INTERVAL = 5.0
+
+
+def parse_output_formats(value):
+    """
+    出力形式の指定をリストに変換
+
+    Args:
+        value (str or list): 出力形式、カンマ区切りの複数の出力形式、または出力形式のリスト
+
+    Returns:
+        list: 重複を除いた出力形式のリスト（指定順）
+    """
+    if isinstance(value, str):
+        value = value.split(",")
+    formats = []
+    for output_format in value:
+        output_format = output_format.strip().lower()
+        if not output_format:
+            continue
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"サポートされていない出力形式です - {output_format}")
+        if output_format not in formats:
+            formats.append(output_format)
+    if not formats:
+        raise ValueError("出力形式が指定されていません")
+    return formats
+
+
+def format_time(seconds):
+    """
+    秒数を時:分:秒形式にフォーマット
+
+    Args:
+        seconds (float): 秒数
+
+    Returns:
+        str: フォーマットされた時間文字列
+    """
+    m, s = divmod(int(seconds), 60)
+    h, m = divmod(m, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}"
+
+
+class Timestamp:
+    """1つの時刻を各形式の表記に変換するクラス（時・分・秒・ミリ秒への分解は1回だけ行う）"""
+
+    __slots__ = ("seconds", "milliseconds", "clock", "fraction")
+
+    def __init__(self, seconds):
+        """
+        初期化
+
+        Args:
+            seconds (float): 秒数
+        """
+        self.seconds = seconds
+        self.milliseconds = round(max(seconds, 0.0) * 1000.0)
+        s, self.fraction = divmod(self.milliseconds, 1000)
+        m, s = divmod(s, 60)
+        h, m = divmod(m, 60)
+        self.clock = f"{h:02d}:{m:02d}:{s:02d}"
+
+    def srt(self):
+        """SRT形式（時:分:秒,ミリ秒）"""
+        return f"{self.clock},{self.fraction:03d}"
+
+    def vtt(self):
+        """WebVTT形式（1時間未満は分:秒.ミリ秒）"""
+        clock = self.clock[3:] if self.clock.startswith("00:") else self.clock
+        return f"{clock}.{self.fraction:03d}"
+
+
+class _TxtStream:
+    """見出し・全文・詳細タイムスタンプのテキスト形式"""
+
+    # 見出しに全文を含むため、書きかけのファイルには詳細タイムスタンプだけを書き、見出しは完成時に付ける
+    buffered_header = True
+
+    def begin(self, f, result, source_name, now, model, language):
+        f.write(f"# 文字起こし: {source_name}\n")
+        f.write(f"# 日時: {now.strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write(f"# モデル: {model}\n")
+        f.write(f"# 言語: {language if language else '自動検出'}\n")
+        if "vad" in result:
+            f.write(f"# スキップした無音: {result['vad']['skipped']:.1f}秒 / {result['vad']['duration']:.1f}秒\n")
+        f.write("\n")
+
+        # テキスト全体を書き込み
+        f.write(result["text"])
+
+        # セグメント情報がある場合は詳細も書き込み
+        if result.get("segments"):
+            f.write("\n\n## 詳細タイムスタンプ\n\n")
+
+    def segment(self, f, number, start, end, segment):
+        f.write(f"[{format_time(start.seconds)} --> {format_time(end.seconds)}] {segment['text']}\n")
+
+
+class _SrtStream:
+    """SRT字幕"""
+
+    buffered_header = False
+
+    def begin(self, f, result, source_name, now, model, language):
+        pass
+
+    def segment(self, f, number, start, end, segment):
+        text = segment["text"].strip().replace("-->", "->")
+        f.write(f"{number}\n{start.srt()} --> {end.srt()}\n{text}\n\n")
+
+
+class _VttStream:
+    """WebVTT字幕"""
+
+    buffered_header = False
+
+    def begin(self, f, result, source_name, now, model, language):
+        f.write("WEBVTT\n\n")
+
+    def segment(self, f, number, start, end, segment):
+        text = segment["text"].strip().replace("-->", "->")
+        f.write(f"{start.vtt()} --> {end.vtt()}\n{text}\n\n")
+
+
+class _TsvStream:
+    """開始・終了時刻（整数ミリ秒）と本文のタブ区切り"""
+
+    buffered_header = False
+
+    def begin(self, f, result, source_name, now, model, language):
+        f.write("start\tend\ttext\n")
+
+    def segment(self, f, number, start, end, segment):
+        text = segment["text"].strip().replace("\t", " ")
+        f.write(f"{start.milliseconds}\t{end.milliseconds}\t{text}\n")
+
+
+# セグメントを1つずつ書き込む形式
+_SEGMENT_STREAMS = {
+    "txt": _TxtStream,
+    "srt": _SrtStream,
+    "vtt": _VttStream,
+    "tsv": _TsvStream,
+}
+
+
+def _output_paths(file_path, output_dir, output_formats, now):
+    """出力形式ごとの出力ファイルのパス（すべての形式で同じ日時を使う）"""
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    timestamp = now.strftime("%Y%m%d%H%M%S")
+    return {
+        output_format: os.path.join(output_dir, f"{base_name}_{timestamp}.{output_format}")
+        for output_format in output_formats
+    }
+
+
+def _write_json(path, result, source_name, now, model, language):
+    """文字起こし結果と処理条件をJSONで保存"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "file": source_name,
+            "date": now.isoformat(timespec="seconds"),
+            "model": model,
+            "language": language or None,
+            **result,
+        }, f, ensure_ascii=False, indent=2)
+
+
+class _SegmentWriter:
+    """セグメントを各形式のファイルに順に書き込むクラス（時刻の分解はセグメントごとに1回だけ行う）"""
+
+    def __init__(self, streams):
+        """
+        初期化
+
+        Args:
+            streams (list): (形式, ファイル) のリスト
+        """
+        self.streams = streams
+        self.count = 0
+        self.previous = None
+
+    def write(self, segments):
+        """
+        セグメントを書き込む
+
+        Args:
+            segments (list): セグメントのリスト
+        """
+        for segment in segments:
+            self.count += 1
+            # 前のセグメントの終了時刻と次の開始時刻は同じことが多いので使い回す
+            if self.previous is not None and self.previous.seconds == segment["start"]:
+                start = self.previous
+            else:
+                start = Timestamp(segment["start"])
+            end = self.previous = Timestamp(segment["end"])
+            for stream, f in self.streams:
+                stream.segment(f, self.count, start, end, segment)
+
+
+def write_transcripts(result, file_path, output_dir, model, language, output_formats=("txt",)):
+    """
+    文字起こし結果を複数の形式でまとめて保存
+
+    セグメントを1回だけ走査し、各セグメントの時刻を1回だけ分解して、すべての形式のファイルに順に書き込む
+
+    Args:
+        result (dict): 文字起こし結果
+        file_path (str): 処理したファイルのパス
+        output_dir (str): 出力ディレクトリ
+        model (str): 使用したモデル
+        language (str): 言語設定
+        output_formats (str or list): 出力形式（parse_output_formatsが受け付ける指定）
+
+    Returns:
+        dict: 出力形式 -> 出力ファイルのパス（指定順）
+    """
+    output_formats = parse_output_formats(output_formats)
+
+    # 出力ディレクトリが存在しない場合は作成
+    os.makedirs(output_dir, exist_ok=True)
+
+    now = datetime.datetime.now()
+    source_name = os.path.basename(file_path)
+    output_files = _output_paths(file_path, output_dir, output_formats, now)
+
+    if "json" in output_files:
+        _write_json(output_files["json"], result, source_name, now, model, language)
+
+    streams = []
+    try:
+        for output_format in output_formats:
+            if output_format in _SEGMENT_STREAMS:
+                stream = _SEGMENT_STREAMS[output_format]()
+                f = open(output_files[output_format], "w", encoding="utf-8")
+                streams.append((stream, f))
+                stream.begin(f, result, source_name, now, model, language)
+
+        if streams:
+            _SegmentWriter(streams).write(result.get("segments") or [])
+    finally:
+        for _, f in streams:
+            f.close()
+
+    return output_files
+
+
+class TranscriptStream:
+    """
+    確定したセグメントから順に出力ファイル（拡張子.part）へ追記し、文字起こしの完了時に完成させるクラス
+
+    長い音声の途中で落ちても、そこまでのセグメントは書きかけのファイルに残る
+    """
+
+    def __init__(self, file_path, output_dir, model, language, output_formats=("txt",),
+                 flush_interval=FLUSH_INTERVAL):
+        """
+        初期化（書きかけのファイルを作成）
+
+        Args:
+            file_path (str): 処理中のファイルのパス
+            output_dir (str): 出力ディレクトリ
+            model (str): 使用するモデル
+            language (str): 言語設定
+            output_formats (str or list): 出力形式（parse_output_formatsが受け付ける指定）
+            flush_interval (float): 書きかけのファイルをディスクに書き出す間隔（秒）
+        """
+        self.output_formats = parse_output_formats(output_formats)
+        self.model = model
+        self.language = language
+        self.flush_interval = flush_interval
+
+        # 出力ディレクトリが存在しない場合は作成
+        os.makedirs(output_dir, exist_ok=True)
+
+        self.now = datetime.datetime.now()
+        self.source_name = os.path.basename(file_path)
+        self.output_files = _output_paths(file_path, output_dir, self.output_formats, self.now)
+
+        self._streams = []
+        try:
+            for output_format in self.output_formats:
+                if output_format in _SEGMENT_STREAMS:
+                    stream = _SEGMENT_STREAMS[output_format]()
+                    f = open(self.output_files[output_format] + PARTIAL_SUFFIX, "w", encoding="utf-8")
+                    self._streams.append((output_format, stream, f))
+                    if not stream.buffered_header:
+                        stream.begin(f, None, self.source_name, self.now, model, language)
+        except Exception:
+            self.close(keep=False)
+            raise
+        self._writer = _SegmentWriter([(stream, f) for _, stream, f in self._streams])
+        self._flushed = time.monotonic()
+
+    def write(self, segments):
+        """
+        確定したセグメントを追記（flush_intervalごとにディスクに書き出す）
+
+        Args:
+            segments (list): セグメントのリスト
+        """
+        self._writer.write(segments)
+        if time.monotonic() - self._flushed >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """書きかけのファイルをディスクに書き出す"""
+        for _, _, f in self._streams:
+            f.flush()
+        self._flushed = time.monotonic()
+
+    def finish(self, result):
+        """
+        文字起こし結果で出力ファイルを完成させる（セグメントは書き直さない）
+
+        Args:
+            result (dict): 文字起こし結果
+
+        Returns:
+            dict: 出力形式 -> 出力ファイルのパス（指定順）
+        """
+        if "json" in self.output_files:
+            _write_json(self.output_files["json"], result, self.source_name, self.now, self.model,
+                        self.language)
+
+        for output_format, stream, f in self._streams:
+            f.close()
+            output_file = self.output_files[output_format]
+            partial_file = output_file + PARTIAL_SUFFIX
+            if stream.buffered_header:
+                # 見出しと全文の後に、書き込み済みの詳細タイムスタンプをそのままコピーする
+                with open(output_file, "w", encoding="utf-8") as out:
+                    stream.begin(out, result, self.source_name, self.now, self.model, self.language)
+                    with open(partial_file, "r", encoding="utf-8") as details:
+                        shutil.copyfileobj(details, out)
+                os.remove(partial_file)
+            else:
+                os.replace(partial_file, output_file)
+        self._streams = []
+
+        return dict(self.output_files)
+
+    def close(self, keep=True):
+        """
+        完成させずにファイルを閉じる（エラーやキャンセルで文字起こしが終わらなかった場合）
+
+        Args:
+            keep (bool): Trueの場合は書きかけのファイルを残し、Falseの場合は削除する
+        """
+        for output_format, _, f in self._streams:
+            f.close()
+            if not keep:
+                try:
+                    os.remove(self.output_files[output_format] + PARTIAL_SUFFIX)
+                except OSError:
+                    pass
+        self._streams = []